@@ -0,0 +1,315 @@
+"""Admission control for new calls: a concurrency ceiling, per-client rate limits and a fair wait queue."""
+import asyncio
+import itertools
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+
+class AdmissionRejected(Exception):
+    """Request can't be admitted; ``status`` is 429 (rate limited) or 503 (at capacity)"""
+
+    def __init__(self, status: int, retry_after: float, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.reason = reason
+
+
+class TokenBucketLimiter:
+    """Token bucket per client: ``rate`` tokens per second, holding at most ``burst``"""
+
+    def __init__(self, rate: float, burst: float, idle_ttl: float = 600):
+        self.rate = rate
+        self.burst = burst
+        self.idle_ttl = idle_ttl
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._next_prune = 0.0
+
+    def take(self, client: str, now: float) -> float:
+        """Spend a token. Returns 0 on success, else seconds until one is available
+
+        Not thread-safe; the caller serializes access.
+        """
+        if self.rate <= 0:
+            return 0.0
+        tokens, last = self._buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            return (1 - tokens) / self.rate
+        self._buckets[client] = (tokens - 1, now)
+        if now >= self._next_prune:
+            # A bucket idle this long is full again, so forgetting it changes nothing
+            self._buckets = {k: v for k, v in self._buckets.items() if v[1] > now - self.idle_ttl}
+            self._next_prune = now + 60
+        return 0.0
+
+
+class _Waiter:
+    __slots__ = ("client", "ticket", "event", "loop", "abandoned")
+
+    def __init__(self, client: str, event: Optional[asyncio.Event] = None, loop=None):
+        self.client = client
+        self.ticket: Optional[int] = None
+        # Set for waiters on an event loop (aadmit), woken thread-safely when granted
+        self.event = event
+        self.loop = loop
+        # The caller stopped waiting (its request was cancelled)
+        self.abandoned = False
+
+
+class AdmissionController:
+    """Decides whether a new call may be created now.
+
+    In-use slots are the live calls reported by ``live_count`` plus
+    reservations: calls admitted here whose call.started webhook hasn't
+    arrived yet (dropped after ``reservation_ttl`` seconds). With
+    ``max_concurrent`` slots in use, requests wait up to ``queue_timeout``
+    seconds in a queue of at most ``queue_size``. Freed slots go round-robin
+    across clients, so one busy client can't starve the rest. Each client
+    is also rate limited by a token bucket. ``max_concurrent`` or ``rate``
+    of 0 disables that check.
+    """
+
+    def __init__(
+        self,
+        live_count: Callable[[], int],
+        max_concurrent: int = 0,
+        rate: float = 0,
+        burst: float = 5,
+        queue_size: int = 50,
+        queue_timeout: float = 5,
+        reservation_ttl: float = 60,
+        retry_after: float = 5,
+        poll_interval: float = 0.5,
+    ):
+        self.live_count = live_count
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.reservation_ttl = reservation_ttl
+        self.retry_after = retry_after
+        # Slots freed on other workers (shared registry) are only seen by polling
+        self.poll_interval = poll_interval
+        self.limiter = TokenBucketLimiter(rate, burst)
+
+        self._cond = threading.Condition()
+        self._tickets = itertools.count(1)
+        self._reservations: Dict[int, Tuple[float, Optional[str]]] = {}
+        # Calls settled before they were attached (webhook beat the create response)
+        self._settled: Dict[str, float] = {}
+        self._waiting: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        self._queued = 0
+
+        self.admitted = 0
+        self.queued = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def admit(self, client: str) -> int:
+        """Wait for a slot and reserve it, returning a ticket.
+
+        Raises AdmissionRejected when rate limited, when the queue is full,
+        or when no slot frees up within ``queue_timeout``.
+        """
+        with self._cond:
+            ticket, waiter = self._start(client)
+            if ticket is not None:
+                return ticket
+            deadline = time.time() + self.queue_timeout
+            while True:
+                ticket = self._poll(waiter, deadline)
+                if ticket is not None:
+                    return ticket
+                self._cond.wait(min(deadline - time.time(), self.poll_interval))
+
+    async def aadmit(self, client: str, executor: Optional[Executor] = None) -> int:
+        """``admit`` for the event loop: waits without holding a thread.
+
+        Capacity checks call ``live_count`` under the lock; pass an
+        ``executor`` when that does I/O (a SQLite or Redis registry) so it
+        runs there instead of on the loop. If the caller is cancelled while
+        waiting, it leaves the queue, or gives back a slot already granted.
+        """
+        loop = asyncio.get_running_loop()
+
+        async def locked(fn, *args):
+            if executor is None:
+                return self._locked(fn, *args)
+            return await loop.run_in_executor(executor, self._locked, fn, *args)
+
+        waiter = _Waiter(client, asyncio.Event(), loop)
+        try:
+            ticket, _ = await locked(self._start, client, waiter)
+            if ticket is not None:
+                return ticket
+            deadline = time.time() + self.queue_timeout
+            while True:
+                ticket = await locked(self._poll, waiter, deadline)
+                if ticket is not None:
+                    return ticket
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), max(0, min(deadline - time.time(), self.poll_interval)))
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except asyncio.CancelledError:
+            # Don't wait for the cleanup; an in-flight _start or _poll sees the flag under the lock
+            if executor is None:
+                self._locked(self._abandon, waiter)
+            else:
+                loop.run_in_executor(executor, self._locked, self._abandon, waiter)
+            raise
+
+    def _locked(self, fn, *args):
+        with self._cond:
+            return fn(*args)
+
+    def check_rate(self, client: str):
+        """Spend one of the client's rate tokens without reserving a slot, or raise AdmissionRejected (429)"""
+        with self._cond:
+            wait = self.limiter.take(client, time.time())
+            if wait:
+                self.rate_limited += 1
+                raise AdmissionRejected(429, wait, "Too many call requests, slow down")
+
+    def _start(self, client: str, waiter: Optional[_Waiter] = None) -> Tuple[Optional[int], Optional[_Waiter]]:
+        # Caller holds the lock. Admit right away, reject, or queue a waiter
+        if waiter is not None and waiter.abandoned:
+            return None, None
+        now = time.time()
+        wait = self.limiter.take(client, now)
+        if wait:
+            self.rate_limited += 1
+            raise AdmissionRejected(429, wait, "Too many call requests, slow down")
+
+        if not self._queued and self._has_capacity(now):
+            self.admitted += 1
+            ticket = self._reserve(now)
+            if waiter is not None:
+                waiter.ticket = ticket
+            return ticket, None
+
+        if self._queued >= self.queue_size:
+            self.rejected += 1
+            raise AdmissionRejected(503, self.retry_after, "Call capacity reached and the wait queue is full")
+
+        if waiter is None:
+            waiter = _Waiter(client)
+        self._waiting.setdefault(client, deque()).append(waiter)
+        self._queued += 1
+        self.queued += 1
+        return None, waiter
+
+    def _poll(self, waiter: _Waiter, deadline: float) -> Optional[int]:
+        # Caller holds the lock. The waiter's ticket once granted, None to keep waiting
+        if waiter.abandoned:
+            return None
+        self._dispatch()
+        if waiter.ticket is not None:
+            self.admitted += 1
+            return waiter.ticket
+        if time.time() >= deadline:
+            self._discard(waiter)
+            self.timed_out += 1
+            raise AdmissionRejected(503, self.retry_after, "Call capacity reached, try again shortly")
+        return None
+
+    def attach(self, ticket: int, call_id: str):
+        """Record the call created under a ticket, so its call.started webhook can settle it"""
+        with self._cond:
+            if ticket not in self._reservations:
+                return
+            if self._settled.pop(call_id, None) is not None:
+                del self._reservations[ticket]
+                self._dispatch()
+                return
+            self._reservations[ticket] = (self._reservations[ticket][0], call_id)
+
+    def cancel(self, ticket: int):
+        """Give a reservation back (the call wasn't created, or is already counted as live)"""
+        with self._cond:
+            if self._reservations.pop(ticket, None) is not None:
+                self._dispatch()
+
+    def settle(self, call_id: str):
+        """A reserved call went live (now counted by ``live_count``) or ended; drop its reservation"""
+        now = time.time()
+        with self._cond:
+            for ticket, (_, reserved_call) in list(self._reservations.items()):
+                if reserved_call == call_id:
+                    del self._reservations[ticket]
+                    self._dispatch()
+                    return
+            self._settled = {k: v for k, v in self._settled.items() if v > now}
+            self._settled[call_id] = now + self.reservation_ttl
+
+    def released(self):
+        """A slot freed up (a call ended); hand it to the queue"""
+        with self._cond:
+            self._dispatch()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "reserved": len(self._reservations),
+                "waiting": self._queued,
+                "admitted": self.admitted,
+                "queued": self.queued,
+                "rate_limited": self.rate_limited,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def _has_capacity(self, now: float) -> bool:
+        # Caller holds the lock
+        if self.max_concurrent <= 0:
+            return True
+        expired = [ticket for ticket, (expires_at, _) in self._reservations.items() if expires_at <= now]
+        for ticket in expired:
+            del self._reservations[ticket]
+        return self.live_count() + len(self._reservations) < self.max_concurrent
+
+    def _reserve(self, now: float) -> int:
+        ticket = next(self._tickets)
+        self._reservations[ticket] = (now + self.reservation_ttl, None)
+        return ticket
+
+    def _dispatch(self):
+        # Caller holds the lock. Hand free slots out one client at a time, in rotation
+        granted = False
+        now = time.time()
+        while self._waiting and self._has_capacity(now):
+            client, waiters = self._waiting.popitem(last=False)
+            waiter = waiters.popleft()
+            waiter.ticket = self._reserve(now)
+            self._queued -= 1
+            granted = True
+            if waiter.loop is not None:
+                waiter.loop.call_soon_threadsafe(waiter.event.set)
+            if waiters:
+                self._waiting[client] = waiters
+        if granted:
+            self._cond.notify_all()
+
+    def _abandon(self, waiter: _Waiter):
+        # Caller holds the lock
+        waiter.abandoned = True
+        if waiter.ticket is None:
+            self._discard(waiter)
+        elif self._reservations.pop(waiter.ticket, None) is not None:
+            self._dispatch()
+
+    def _discard(self, waiter: _Waiter):
+        waiters = self._waiting.get(waiter.client)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued -= 1
+            if not waiters:
+                del self._waiting[waiter.client]
@@ -3,17 +3,32 @@ import sys
 import re
 from datetime import datetime, timedelta, timezone
 import argparse
+import asyncio
+import time
 from dotenv import load_dotenv
-from transcript_analyzer import TranscriptAnalyzer
+from transcript_analyzer import TranscriptAnalyzer, RateLimiter, AnalysisCache, AnalysisManifest, GeminiContextCache, FakeAnalysisModel
+from transcript_analyzer.manifest import DONE, ERROR, content_hash
+from prompt_registry import get_registry
 
 def main():
     """
-    Find and analyze all call transcripts from a specific date directory
+    Find and analyze new or changed call transcripts for a date or a range of dates
     """
     # Parse command line arguments
-    parser = argparse.ArgumentParser(description='Analyze all transcripts for a specific date.')
-    parser.add_argument('--date', type=str, help='Date directory to analyze (format: YYYY-MM-DD). Default is today in IST.')
+    parser = argparse.ArgumentParser(description='Analyze new or changed transcripts for a date or date range.')
+    parser.add_argument('--date', type=str, help='Single date to analyze (format: YYYY-MM-DD). Default is today in IST.')
+    parser.add_argument('--since', type=str, help='First date of a range to analyze (format: YYYY-MM-DD, inclusive)')
+    parser.add_argument('--until', type=str, help='Last date of a range to analyze (format: YYYY-MM-DD, inclusive). Default is today in IST.')
     parser.add_argument('--transcripts-dir', type=str, default='transcripts', help='Base directory containing transcript folders')
+    parser.add_argument('--concurrency', type=int, default=1, help='Number of transcripts to analyze concurrently (default: 1)')
+    parser.add_argument('--rpm', type=float, default=float(os.environ.get("ANALYSIS_RPM", "0")), help='Max model requests per minute (0 = unlimited)')
+    parser.add_argument('--tpm', type=float, default=float(os.environ.get("ANALYSIS_TPM", "0")), help='Max model tokens per minute (0 = unlimited)')
+    parser.add_argument('--no-cache', action='store_true', help='Always call the model, ignoring cached results')
+    parser.add_argument('--context-cache', action='store_true', help='Cache the static analysis prefix server-side with Gemini context caching (needs google-genai)')
+    parser.add_argument('--max-transcript-tokens', type=int, default=int(os.environ.get("ANALYSIS_MAX_TRANSCRIPT_TOKENS", "12000")), help='Transcripts longer than this are analyzed in chunks and merged')
+    parser.add_argument('--batch-tokens', type=int, default=int(os.environ.get("ANALYSIS_BATCH_TOKENS", "0")), help='Pack short transcripts into shared requests of up to this many tokens (0 = one request per call)')
+    parser.add_argument('--max-batch-call-tokens', type=int, default=int(os.environ.get("ANALYSIS_MAX_BATCH_CALL_TOKENS", "2000")), help='Only transcripts up to this many tokens are batched')
+    parser.add_argument('--fake-model', action='store_true', help='Use an offline fake model instead of Gemini (for testing)')
     args = parser.parse_args()
 
     # Load environment variables
@@ -21,99 +36,193 @@ def main():
     
     # Get Google API key from environment
     google_api_key = os.environ.get("GOOGLE_API_KEY")
-    if not google_api_key:
+    if not google_api_key and not args.fake_model:
         print("Error: GOOGLE_API_KEY environment variable not set")
         sys.exit(1)
     
-    # Get current prompt from prompt.txt
-    try:
-        with open("prompt.txt", "r", encoding="utf-8") as f:
-            current_prompt = f.read()
-    except FileNotFoundError:
-        current_prompt = "You are a helpful AI assistant."
-        print("Warning: prompt.txt not found, using default prompt")
+    # Get current prompt version from prompt.txt
+    prompt = get_registry().get()
+    print(f"Using prompt version: {prompt.version}")
     
     # Define IST timezone (UTC+5:30)
     ist_timezone = timezone(timedelta(hours=5, minutes=30))
     
-    # Determine which date to process
+    # Determine which dates to process, defaulting to today's date in IST
+    today = datetime.now(timezone.utc).astimezone(ist_timezone).strftime("%Y-%m-%d")
     if args.date:
-        target_date = args.date
+        since = until = args.date
     else:
-        # Default to today's date in IST
-        target_date = datetime.now(timezone.utc).astimezone(ist_timezone).strftime("%Y-%m-%d")
+        until = args.until or today
+        since = args.since or until
     
-    print(f"Analyzing all transcripts for date: {target_date}")
+    print(f"Analyzing new or changed transcripts from {since} to {until}")
     
     # Initialize the analyzer
-    analyzer = TranscriptAnalyzer(google_api_key)
+    rate_limiter = RateLimiter(args.rpm, args.tpm) if (args.rpm or args.tpm) else None
+    cache = None
+    if not args.no_cache:
+        cache = AnalysisCache(
+            os.environ.get("ANALYSIS_CACHE_PATH", os.path.join(args.transcripts_dir, "analysis_cache.db")),
+            max_entries=int(os.environ.get("ANALYSIS_CACHE_MAX_ENTRIES", "10000")),
+            max_age=float(os.environ.get("ANALYSIS_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600,
+        )
+    analyzer = TranscriptAnalyzer(
+        google_api_key,
+        results_dir=args.transcripts_dir,
+        rate_limiter=rate_limiter,
+        cache=cache,
+        model=FakeAnalysisModel() if args.fake_model else None,
+        max_transcript_tokens=args.max_transcript_tokens,
+    )
+    if args.context_cache and not args.fake_model:
+        analyzer.context_cache = GeminiContextCache(google_api_key, analyzer.model_name)
+    
+    manifest = AnalysisManifest(analyzer.store.path)
     
-    # Find and analyze transcripts for the specified date
-    analyzed_files = analyze_date_directory(
+    # Find and analyze transcripts for the specified dates
+    analyzed_calls = analyze_date_range(
         analyzer, 
+        manifest,
         args.transcripts_dir, 
-        target_date, 
-        current_prompt
+        since,
+        until,
+        prompt.text,
+        prompt.version,
+        concurrency=args.concurrency,
+        batch_tokens=args.batch_tokens,
+        max_batch_call_tokens=args.max_batch_call_tokens
+    )
+    
+    print(f"Analysis completed. Processed {len(analyzed_calls)} call(s).")
+    for call_id in analyzed_calls:
+        print(f" - {call_id}")
+    
+    if cache:
+        stats = cache.stats()
+        print(f"Result cache: {stats['hits']} hit(s), {stats['misses']} miss(es), hit rate {stats['hit_rate']:.0%}, {stats['entries']} entries")
+    
+    stats = analyzer.stats.snapshot()
+    print(
+        f"Model: {stats['requests']} request(s), {stats['input_tokens']} input token(s) "
+        f"({stats['cached_input_tokens']} cached), {stats['output_tokens']} output token(s)"
+    )
+    print(
+        f"Output validation: {stats['parse_failures']} invalid replies re-asked, "
+        f"{stats['reask_failures']} still invalid, {stats['repaired']} repaired locally"
     )
+    if stats['batches']:
+        print(
+            f"Batching: {stats['batched_calls']} call(s) in {stats['batches']} batched request(s), "
+            f"{stats['batch_fallbacks']} re-analyzed individually"
+        )
+
+def import_legacy_transcripts(analyzer, manifest, transcripts_dir, since, until):
+    """Import new or changed legacy .txt transcripts in the range into the transcript store"""
+    def import_file(path):
+        call = analyzer.store.import_text_transcript(path, force=True)
+        # Re-imports keep the same saved_at, so make sure the change gets analyzed
+        manifest.invalidate(call["call_id"])
+        return call["call_id"]
     
-    print(f"Analysis completed. Processed {len(analyzed_files)} transcript(s).")
-    for file in analyzed_files:
-        print(f" - {file}")
+    imported = manifest.sync_legacy_files(transcripts_dir, since, until, import_file)
+    if imported:
+        print(f"Imported {imported} legacy transcript file(s)")
 
-def analyze_date_directory(analyzer, transcripts_dir, target_date, current_prompt):
-    """Analyze all transcripts in a specific date directory."""
-    analyzed_files = []
+def analyze_date_range(analyzer, manifest, transcripts_dir, since, until, current_prompt, prompt_version=None, concurrency=1,
+                       batch_tokens=0, max_batch_call_tokens=2000):
+    """Analyze stored calls in [since, until] that are new, changed or previously failed."""
+    analyzed_calls = []
     
     # Check if transcripts directory exists
     if not os.path.exists(transcripts_dir):
         print(f"Error: Base transcripts directory '{transcripts_dir}' not found")
-        return analyzed_files
+        return analyzed_calls
     
-    # Path to the specific date directory
-    date_path = os.path.join(transcripts_dir, target_date)
+    import_legacy_transcripts(analyzer, manifest, transcripts_dir, since, until)
     
-    if not os.path.exists(date_path):
-        print(f"Error: Date directory '{date_path}' not found")
-        return analyzed_files
+    candidates = manifest.pending_calls(since, until)
+    if not candidates:
+        print(f"No new or changed transcripts from {since} to {until}")
+        return analyzed_calls
     
-    print(f"Processing directory: {date_path}")
-    
-    # List transcript files in the date directory
-    for filename in os.listdir(date_path):
-        if not filename.endswith('.txt') or filename == '.gitkeep':
+    # Work out what actually needs the model; calls are keyed by id for bookkeeping
+    pending = {}
+    hashes = {}
+    for call in candidates:
+        call_id = call["call_id"]
+        hashes[call_id] = content_hash(analyzer.store.get_turns(call_id))
+        
+        # Re-saved but identical content: nothing new to analyze
+        if call["analyzed_hash"] == hashes[call_id]:
+            manifest.mark(call, DONE, hashes[call_id], prompt_version)
             continue
         
-        filepath = os.path.join(date_path, filename)
+        # Analyzed before the manifest existed (results log is loaded once per date)
+        if call["last_status"] is None and call_id in analyzer.results.analyzed_ids(call["date"]):
+            print(f"Skipping already analyzed call: {call_id}")
+            manifest.mark(call, DONE, hashes[call_id], prompt_version)
+            continue
         
-        try:
-            # Check if this file has already been analyzed
-            json_path = os.path.join(date_path, "call_analysis.json")
-            filename_without_ext = os.path.splitext(filename)[0]
-            
-            # If analysis exists, check if it already contains this file
-            already_analyzed = False
-            if os.path.exists(json_path):
-                import json
-                with open(json_path, 'r') as f:
-                    try:
-                        analysis_data = json.load(f)
-                        if filename_without_ext in analysis_data:
-                            already_analyzed = True
-                    except json.JSONDecodeError:
-                        print(f"Warning: Could not parse JSON in {json_path}")
-            
-            # Skip if already analyzed
-            if already_analyzed:
-                print(f"Skipping already analyzed file: {filepath}")
-                continue
-            
-            print(f"Analyzing transcript: {filepath}")
-            analyzer.analyze_transcript(filepath, current_prompt)
-            analyzed_files.append(filepath)
-        except Exception as e:
-            print(f"Error analyzing {filepath}: {str(e)}")
-    
-    return analyzed_files
+        pending[call_id] = call
+    
+    print(f"Processing {len(pending)} call(s) from {since} to {until}")
+    
+    def record(call_id, error=None):
+        call = pending[call_id]
+        if error is None:
+            manifest.mark(call, DONE, hashes[call_id], prompt_version)
+            analyzed_calls.append(call_id)
+        else:
+            manifest.mark(call, ERROR, hashes[call_id], prompt_version, error=str(error))
+    
+    if concurrency > 1 or batch_tokens > 0:
+        asyncio.run(
+            analyze_calls_concurrently(
+                analyzer, list(pending), current_prompt, prompt_version, concurrency, record,
+                batch_tokens=batch_tokens, max_batch_call_tokens=max_batch_call_tokens,
+            )
+        )
+    else:
+        for call_id in pending:
+            try:
+                print(f"Analyzing call: {call_id}")
+                analyzer.analyze_call(call_id, current_prompt, prompt_version)
+                record(call_id)
+            except Exception as e:
+                print(f"Error analyzing {call_id}: {str(e)}")
+                record(call_id, e)
+    
+    # Fold each touched day's append-only log into its aggregated call_analysis.json view
+    for date in sorted({pending[call_id]["date"] for call_id in analyzed_calls}):
+        print(f"Compacted results to {analyzer.results.compact(date)}")
+    
+    return analyzed_calls
+
+async def analyze_calls_concurrently(analyzer, call_ids, current_prompt, prompt_version, concurrency, record,
+                                     batch_tokens=0, max_batch_call_tokens=2000):
+    """Analyze calls concurrently, recording and printing progress as each one finishes"""
+    total = len(call_ids)
+    started = time.monotonic()
+    if batch_tokens > 0:
+        print(f"Analyzing {total} call(s) with concurrency {concurrency}, batching short calls up to {batch_tokens} tokens")
+        results = analyzer.aanalyze_calls_batched(
+            call_ids, current_prompt, prompt_version, max_concurrency=concurrency,
+            batch_tokens=batch_tokens, max_call_tokens=max_batch_call_tokens,
+        )
+    else:
+        print(f"Analyzing {total} call(s) with concurrency {concurrency}")
+        results = analyzer.aanalyze_calls(call_ids, current_prompt, prompt_version, max_concurrency=concurrency)
+    
+    done = 0
+    async for call_id, result in results:
+        done += 1
+        elapsed = time.monotonic() - started
+        if isinstance(result, Exception):
+            print(f"[{done}/{total}] Error analyzing {call_id}: {str(result)} ({elapsed:.0f}s)")
+            record(call_id, result)
+        else:
+            print(f"[{done}/{total}] Analyzed {call_id} ({elapsed:.0f}s)")
+            record(call_id)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,5 +1,5 @@
 from flask import Flask, jsonify, render_template, request
-import requests
+import http_client
 import os
 from dotenv import load_dotenv
 import threading
@@ -8,165 +8,457 @@ import os
 import time
 import wave
 import io
+import fcntl
+import re
+import socket
 import subprocess
-from flask_socketio import SocketIO
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask_socketio import SocketIO, emit, join_room
+from prompt_registry import get_registry
+from voice_cache import CatalogCache
+from worker_pool import WorkerPool, RetryableError
+from job_queue import JobQueue
+from transcript_store import get_store, message_to_row
+from call_registry import LiveCall, get_call_registry
+from broadcaster import CoalescingBroadcaster
+from call_pool import WarmCallPool
+from call_profiles import get_call_profiles
+from admission import AdmissionController, AdmissionRejected
+from socketio_manager import socketio_options
+import audio_transcoder
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
 load_dotenv()
-socketio = SocketIO(app, cors_allowed_origins="*")
+# With several workers, SOCKETIO_MESSAGE_QUEUE (e.g. redis://host:6379/0, or local:// for the
+# in-process stand-in) relays emits so every worker reaches every connected client
+socketio = SocketIO(
+    app,
+    cors_allowed_origins="*",
+    **socketio_options(os.getenv("SOCKETIO_MESSAGE_QUEUE"), os.getenv("SOCKETIO_CHANNEL", "flask-socketio")),
+)
+# Websocket-only lets any worker accept any connection, without sticky sessions
+SOCKETIO_TRANSPORTS = os.getenv("SOCKETIO_TRANSPORTS", "polling,websocket").split(",")
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
 
-# Global variable to track ongoing calls
-ongoing_calls = 0
+# System prompt is loaded once and hot-reloaded when prompt.txt changes
+prompt_registry = get_registry()
+prompt_registry.start_watching()
+
+# Named call profiles (voice, prompt, temperature, model, tools) and weighted experiments
+call_profiles = get_call_profiles(prompt_registry)
+call_profiles.start_watching()
+
+# Structured transcript store shared with the analyzer
+transcript_store = get_store()
+
+# Live calls keyed by callId, fed by the call webhooks and reconciled against Ultravox
+call_registry = get_call_registry()
+
+# Live updates only go to authenticated admin sockets, coalesced into short windows
+ADMIN_ROOM = "admins"
+broadcaster = CoalescingBroadcaster(socketio, window=float(os.getenv("BROADCAST_WINDOW", "0.5")))
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', socketio_transports=SOCKETIO_TRANSPORTS)
 
-# Helper function to broadcast call count updates
+# Helper functions to broadcast call count and call state updates to admins
 def broadcast_call_count():
-    socketio.emit('call_count_update', {'count': ongoing_calls})
+    broadcaster.publish('call_count_update', {'count': call_registry.count()}, room=ADMIN_ROOM)
 
-@app.route('/api/get-join-url', methods=['POST'])
-def get_join_url():
+def call_state(call, state):
+    return {
+        "state": state,
+        "startedAt": call.started_at if call else None,
+        "voice": call.voice if call else None,
+        "promptVersion": call.prompt_version if call else None,
+    }
+
+def broadcast_call_state(call_id, call, state):
+    broadcaster.publish_delta('call_state_update', call_id, call_state(call, state), room=ADMIN_ROOM)
+
+def is_admin_socket(auth):
+    # Only admins get a socket; the password is checked like /api/verify-admin
+    admin_password = os.getenv("ADMIN_PASSWORD")
+    return bool(admin_password) and (auth or {}).get('password') == admin_password
+
+def call_state_snapshot():
+    return {
+        "count": call_registry.count(),
+        "calls": {call.call_id: call_state(call, "live") for call in call_registry.active()},
+    }
+
+@socketio.on('connect')
+def handle_connect(auth):
+    if not is_admin_socket(auth):
+        return False
+    join_room(ADMIN_ROOM)
+    emit('call_state_snapshot', call_state_snapshot())
+
+@app.route('/api/broadcast-stats', methods=['GET'])
+def get_broadcast_stats():
+    return jsonify(broadcaster.stats())
+
+class UltravoxCallError(Exception):
+    """Create-call request to Ultravox failed"""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def ultravox_headers():
     api_key = os.getenv("ULTRAVOX_API_KEY")
     if not api_key:
-        return jsonify({"error": "Ultravox API key not found"}), 500
-        
-    url = "https://api.ultravox.ai/api/calls"
+        raise UltravoxCallError("Ultravox API key not found")
+    return {
+        "X-API-Key": api_key,
+        "Content-Type": "application/json"
+    }
+
+def create_ultravox_call(body):
+    """Create an Ultravox call from a JSON request body and return the response (callId, joinUrl, ...)"""
+    headers = ultravox_headers()
+    response = http_client.request("POST", f"{http_client.ULTRAVOX_BASE_URL}/calls", data=body.encode("utf-8"), headers=headers)
+    return ultravox_call_from_response(response)
+
+async def acreate_ultravox_call(body):
+    """``create_ultravox_call`` for the event loop (asgi.py), on the async HTTP client"""
+    headers = ultravox_headers()
+    response = await http_client.arequest("POST", f"{http_client.ULTRAVOX_BASE_URL}/calls", data=body.encode("utf-8"), headers=headers)
+    return ultravox_call_from_response(response)
+
+def ultravox_call_from_response(response):
+    """Check a create-call response and return its body"""
+    # Check response status - 201 is success (Created)
+    if response.status_code not in [200, 201]:
+        print(f"Ultravox API error: {response.status_code}, Response: {response.text}")
+        raise UltravoxCallError(f"Ultravox API returned status code {response.status_code}", response.status_code)
+
+    data = response.json()
+
+    # Validate response contains joinUrl
+    if "joinUrl" not in data:
+        print(f"Unexpected Ultravox API response: {data}")
+        raise UltravoxCallError("Ultravox API response missing joinUrl")
+    return data
+
+def select_call_template(data):
+    """Pick the call template for a request body: a named profile or experiment, else the default.
+
+    Raises KeyError for an unknown profile name.
+    """
+    profile, experiment = call_profiles.select(data.get('profile'), data.get('variant'))
+    return call_profiles.template(profile, experiment)
+
+# Speculative mode keeps a few calls per (profile, prompt version, voice) created
+# ahead of "Start Call", so the create-call round trip is off the critical path.
+# Ultravox ends a call nobody joins within joinTimeout; pooled calls are handed
+# out only until SPECULATIVE_CALL_MARGIN seconds before that.
+SPECULATIVE_CALLS = os.getenv("SPECULATIVE_CALLS", "false").lower() == "true"
+SPECULATIVE_JOIN_TIMEOUT = int(os.getenv("SPECULATIVE_JOIN_TIMEOUT", "300"))
+SPECULATIVE_CALL_MARGIN = float(os.getenv("SPECULATIVE_CALL_MARGIN", "30"))
+
+def known_voice(voice_id):
+    """Whether a voice id is in the Ultravox voice catalog (served from its cache)"""
+    try:
+        voices = ultravox_voice_cache.get().value
+    except Exception as e:
+        print(f"Error checking voice {voice_id}: {str(e)}")
+        return False
+    return any(voice["id"] == voice_id for voice in voices)
+
+def call_pool_key(template, voice_id):
+    """Pool key for a template and the caller's voice, or None for a voice not in the catalog.
+
+    Keys come from request bodies, so only known voices may get calls created for them.
+    """
+    if voice_id and not template.voice and not known_voice(voice_id):
+        return None
+    return f"{template.profile}|{template.experiment or ''}|{template.prompt_version}|{template.voice_for(voice_id)}"
+
+def create_speculative_call(key):
+    profile_name, experiment, prompt_version, voice_id = key.split("|", 3)
+    template = call_profiles.template(call_profiles.profiles[profile_name], experiment or None)
+    if template.prompt_version != prompt_version:
+        # Prompt changed since the key was requested; don't create stale calls
+        return None
+    return create_ultravox_call(template.body(voice_id, joinTimeout=f"{SPECULATIVE_JOIN_TIMEOUT}s"))
+
+call_pool = WarmCallPool(
+    create_speculative_call,
+    hold_seconds=SPECULATIVE_JOIN_TIMEOUT - SPECULATIVE_CALL_MARGIN,
+    max_per_key=int(os.getenv("SPECULATIVE_POOL_MAX", "3")),
+    max_keys=int(os.getenv("SPECULATIVE_POOL_KEYS", "10")),
+    demand_window=float(os.getenv("SPECULATIVE_DEMAND_WINDOW", "300")),
+    max_creating=int(os.getenv("SPECULATIVE_MAX_CREATING", "6")),
+)
+if SPECULATIVE_CALLS:
+    call_pool.start_reaper()
+
+def call_assignment(template):
+    # Sent back by the page so later requests stay on the same experiment variant
+    return {"profile": template.profile, "experiment": template.experiment, "promptVersion": template.prompt_version}
+
+def unknown_profile(data):
+    return {"error": f"Unknown call profile: {data.get('profile')}"}, 400
+
+def handle_prewarm_call(data, client):
+    """Start pre-creating calls for a prewarm request body; returns (response body, status, headers)"""
+    try:
+        template = select_call_template(data)
+    except KeyError:
+        return (*unknown_profile(data), [])
+    if not SPECULATIVE_CALLS:
+        return {"enabled": False, **call_assignment(template)}, 200, []
+    # Prewarming spends upstream calls too, so it counts against the client's call rate
+    try:
+        admission.check_rate(client)
+    except AdmissionRejected as e:
+        return admission_rejected(e)
+    key = call_pool_key(template, data.get('voiceId'))
+    if key is None:
+        return {"error": f"Unknown voice: {data.get('voiceId')}"}, 400, []
+    ready = call_pool.prewarm(key)
+    return {"enabled": True, "ready": ready, **call_assignment(template)}, 202, []
+
+@app.route('/api/prewarm-call', methods=['POST'])
+def prewarm_call():
+    body, status, headers = handle_prewarm_call(request.get_json(silent=True) or {}, client_id())
+    return jsonify(body), status, headers
+
+@app.route('/api/call-pool-stats', methods=['GET'])
+def get_call_pool_stats():
+    return jsonify({"enabled": SPECULATIVE_CALLS, **call_pool.stats()})
+
+@app.route('/api/call-profiles', methods=['GET'])
+def get_call_profiles_info():
+    return jsonify(call_profiles.describe())
+
+# New calls are admitted against the live call count so spikes queue briefly or get
+# 429/503 with Retry-After instead of running past the Ultravox concurrency quota
+admission = AdmissionController(
+    call_registry.count,
+    max_concurrent=int(os.getenv("MAX_CONCURRENT_CALLS", "0")),
+    rate=float(os.getenv("CALL_RATE_PER_CLIENT", "0")),
+    burst=float(os.getenv("CALL_RATE_BURST", "3")),
+    queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", "20")),
+    queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+    reservation_ttl=float(os.getenv("ADMISSION_RESERVATION_TTL", "60")),
+    retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", "5")),
+)
+# Retry-After for requests failed fast by an open upstream circuit breaker
+BREAKER_RETRY_AFTER = int(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "false").lower() == "true"
+
+def client_key(remote_addr, forwarded_for=None):
+    """Client key for rate limiting; X-Forwarded-For is only trusted behind a proxy.
+
+    Only the last hop is used: it was added by our proxy, anything before it
+    came from the client and can be spoofed.
+    """
+    if ADMISSION_TRUST_FORWARDED and forwarded_for:
+        hop = forwarded_for.split(",")[-1].strip()
+        if hop:
+            return hop
+    return remote_addr or "unknown"
+
+def client_id():
+    return client_key(request.remote_addr, ",".join(request.headers.getlist("X-Forwarded-For")))
+
+def retry_later(status, message, retry_after):
+    """(response body, status, headers) telling the client when to retry"""
+    return {"error": message, "retryAfter": retry_after}, status, [("Retry-After", str(retry_after))]
+
+@app.route('/api/upstream-metrics', methods=['GET'])
+def get_upstream_metrics():
+    return jsonify(http_client.metrics())
+
+@app.route('/api/admission-stats', methods=['GET'])
+def get_admission_stats():
+    return jsonify({"live": call_registry.count(), **admission.stats()})
+
+# The get-join-url steps below are shared by the Flask route and the ASGI one in
+# asgi.py; responses are (body, status, headers) tuples
+
+def join_url_template(data):
+    """Template for a get-join-url request body; returns (template, None) or (None, error response)"""
+    if not os.getenv("ULTRAVOX_API_KEY"):
+        return None, ({"error": "Ultravox API key not found"}, 500, [])
+    try:
+        # Profile or experiment variant; its payload is pre-built per prompt version
+        return select_call_template(data), None
+    except KeyError:
+        return None, (*unknown_profile(data), [])
+
+def admission_rejected(e):
+    print(f"Call request rejected ({e.status}): {e.reason}")
+    return retry_later(e.status, e.reason, e.retry_after)
+
+def warm_join_url(template, voice_id, ticket):
+    """Response body for a pre-created call, if speculative mode has one ready"""
+    key = call_pool_key(template, voice_id) if SPECULATIVE_CALLS else None
+    if key is None:
+        return None
+    warm_call = call_pool.take(key)
+    if not warm_call:
+        return None
+    admission.attach(ticket, warm_call.call_id)
+    return {"joinUrl": warm_call.join_url, "speculative": True, **call_assignment(template)}
+
+def new_join_url(template, call, ticket):
+    """Response body for a call just created under an admission ticket"""
+    admission.attach(ticket, call.get("callId"))
+    return {"joinUrl": call["joinUrl"], **call_assignment(template)}
+
+def join_url_failure(e, ticket):
+    """Give back the slot of a failed call creation; returns the error response"""
+    admission.cancel(ticket)
+    print(f"Error getting join URL: {str(e)}")
+    if isinstance(e, http_client.CircuitOpenError):
+        return retry_later(503, "Call service temporarily unavailable, try again shortly", BREAKER_RETRY_AFTER)
+    if isinstance(e, UltravoxCallError) and e.status_code == 429:
+        # Upstream quota hit despite admission control (e.g. calls made elsewhere)
+        return retry_later(503, "Call capacity reached, try again shortly", int(admission.retry_after))
+    return {"error": str(e)}, 500, []
+
+@app.route('/api/get-join-url', methods=['POST'])
+def get_join_url():
+    data = request.get_json(silent=True) or {}
+    template, error = join_url_template(data)
+    if error:
+        body, status, headers = error
+        return jsonify(body), status, headers
     
+    # Wait for a call slot (bounded), or tell the client when to retry
     try:
-        # Read system prompt
-        try:
-            with open("prompt.txt", "r", encoding="utf-8") as f:
-                system_prompt = f.read()
-        except FileNotFoundError:
-            system_prompt = "You are a helpful AI assistant."
-            print("Warning: prompt.txt not found, using default prompt")
-        
-        # Get selected voice
-        voice_id = request.json.get('voiceId')
-        if not voice_id:
-            voice_id = "Chinmay-English-Indian"  # Default fallback
-        
-        # Create base payload
-        payload = {
-            "systemPrompt": system_prompt,
-            "temperature": 0.1,
-            "model": "fixie-ai/ultravox",
-            "voice": "87edb04c-06d4-47c2-bd94-683bc47e8fbe",
-            "medium": {"webRtc": {}}
-        }
-        
-        headers = {
-            "X-API-Key": api_key,
-            "Content-Type": "application/json"
-        }
-        
-        # Make the API request
-        response = requests.request("POST", url, json=payload, headers=headers)
-        
-        # Check response status - 201 is success (Created)
-        if response.status_code not in [200, 201]:
-            print(f"Ultravox API error: {response.status_code}, Response: {response.text}")
-            return jsonify({"error": f"Ultravox API returned status code {response.status_code}"}), 500
-            
-        data = response.json()
+        ticket = admission.admit(client_id())
+    except AdmissionRejected as e:
+        body, status, headers = admission_rejected(e)
+        return jsonify(body), status, headers
+    
+    try:
+        # Selected voice, unless the profile pins one
+        voice_id = data.get('voiceId')
         
-        # Validate response contains joinUrl
-        if "joinUrl" not in data:
-            print(f"Unexpected Ultravox API response: {data}")
-            return jsonify({"error": "Ultravox API response missing joinUrl"}), 500
-            
-        return jsonify({"joinUrl": data["joinUrl"]})
+        # Hand out a pre-created call if one is ready
+        body = warm_join_url(template, voice_id, ticket)
+        if body is None:
+            body = new_join_url(template, create_ultravox_call(template.body(voice_id)), ticket)
+        return jsonify(body)
     
     except Exception as e:
-        print(f"Error getting join URL: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        body, status, headers = join_url_failure(e, ticket)
+        return jsonify(body), status, headers
 
-@app.route('/api/elevenlabs-voices', methods=['GET'])
-def get_elevenlabs_voices():
-    elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY")
+def fetch_elevenlabs_voices():
+    """Fetch the ElevenLabs voice list from upstream"""
+    url = f"{http_client.ELEVENLABS_BASE_URL}/voices"
     
-    if not elevenlabs_api_key:
-        return jsonify({"error": "ElevenLabs API key not found"}), 500
+    headers = {
+        "xi-api-key": os.getenv("ELEVENLABS_API_KEY")
+    }
+    
+    response = http_client.get(url, headers=headers, hedge=True)
+    if response.status_code != 200:
+        raise RuntimeError(f"ElevenLabs API returned status code {response.status_code}")
+    
+    data = response.json()
+    
+    # Check if 'voices' is in the response
+    if "voices" not in data:
+        raise RuntimeError("Unexpected API response format - 'voices' key not found")
+    
+    voices = []
+    for voice in data["voices"]:
+        # Ensure the required keys exist
+        voice_id = voice.get("voice_id")
+        name = voice.get("name")
+        
+        if voice_id and name:
+            voices.append({"id": voice_id, "name": name})
     
-    url = "https://api.elevenlabs.io/v1/voices"
+    return voices
+
+def fetch_ultravox_voices():
+    """Fetch the Ultravox voice list from upstream"""
+    url = f"{http_client.ULTRAVOX_BASE_URL}/voices"
     
     headers = {
-        "xi-api-key": elevenlabs_api_key
+        "X-API-Key": os.getenv("ULTRAVOX_API_KEY")
     }
     
-    try:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            return jsonify({"error": f"ElevenLabs API returned status code {response.status_code}"}), 500
-        
-        data = response.json()
-        
-        # Check if 'voices' is in the response
-        if "voices" not in data:
-            return jsonify({"error": "Unexpected API response format - 'voices' key not found"}), 500
-        
-        voices = []
-        for voice in data["voices"]:
-            # Ensure the required keys exist
-            voice_id = voice.get("voice_id")
-            name = voice.get("name")
-            
-            if voice_id and name:
-                voices.append({"id": voice_id, "name": name})
+    response = http_client.get(url, headers=headers, hedge=True)
+    
+    if response.status_code not in [200, 201]:
+        print(f"Ultravox API error: {response.status_code}, Response: {response.text}")
+        raise RuntimeError(f"Failed to get voices: {response.status_code}")
         
-        return jsonify({"voices": voices})
+    data = response.json()
+    data = data.get("results", [])
+    
+    # Process the voices based on the response structure
+    voices = []
+    if isinstance(data, list):
+        for voice in data:
+            voice_id = voice.get("voiceId")
+            name = voice.get("name", "Unnamed Voice")
+            voices.append({"id": voice_id, "name": name})
+    
+    # Add default voices as fallback if needed
+    if not voices:
+        defaults = [
+            {"id": "Chinmay-English-Indian", "name": "Chinmay (Indian)"},
+            {"id": "Emma-English-US", "name": "Emma (US)"},
+            {"id": "Ryan-English-US", "name": "Ryan (US)"},
+            {"id": "Ana-English-US", "name": "Ana (US)"},
+            {"id": "Thomas-English-UK", "name": "Thomas (UK)"}
+        ]
+        voices.extend(defaults)
+    
+    return voices
+
+# Voice catalogs are cached server-side and revalidated in the background
+VOICE_CACHE_TTL = float(os.getenv("VOICE_CACHE_TTL", "300"))
+VOICE_CACHE_STALE_TTL = float(os.getenv("VOICE_CACHE_STALE_TTL", "3600"))
+elevenlabs_voice_cache = CatalogCache("elevenlabs-voices", fetch_elevenlabs_voices, VOICE_CACHE_TTL, VOICE_CACHE_STALE_TTL)
+ultravox_voice_cache = CatalogCache("ultravox-voices", fetch_ultravox_voices, VOICE_CACHE_TTL, VOICE_CACHE_STALE_TTL)
+
+def cached_voices_response(cache):
+    """Serve a voice catalog with ETag/Cache-Control so browsers can revalidate with a 304"""
+    entry = cache.get()
+    response = jsonify({"voices": entry.value})
+    response.set_etag(entry.etag)
+    max_age = max(0, int(cache.ttl - entry.age()))
+    response.headers["Cache-Control"] = f"public, max-age={max_age}, stale-while-revalidate={int(cache.stale_ttl)}"
+    return response.make_conditional(request)
+
+@app.route('/api/elevenlabs-voices', methods=['GET'])
+def get_elevenlabs_voices():
+    if not os.getenv("ELEVENLABS_API_KEY"):
+        return jsonify({"error": "ElevenLabs API key not found"}), 500
+    
+    try:
+        return cached_voices_response(elevenlabs_voice_cache)
     except Exception as e:
         print("Error fetching ElevenLabs voices:", str(e))
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/ultravox-voices', methods=['GET'])
 def get_ultravox_voices():
-    api_key = os.getenv("ULTRAVOX_API_KEY")
-    if not api_key:
+    if not os.getenv("ULTRAVOX_API_KEY"):
         return jsonify({"error": "Ultravox API key not found"}), 500
     
-    url = "https://api.ultravox.ai/api/voices"
-    
-    headers = {
-        "X-API-Key": api_key
-    }
-    
     try:
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code not in [200, 201]:
-            print(f"Ultravox API error: {response.status_code}, Response: {response.text}")
-            return jsonify({"error": f"Failed to get voices: {response.status_code}"}), 500
-            
-        data = response.json()
-        data = data.get("results", [])
-        
-        # Process the voices based on the response structure
-        voices = []
-        if isinstance(data, list):
-            for voice in data:
-                voice_id = voice.get("voiceId")
-                name = voice.get("name", "Unnamed Voice")
-                voices.append({"id": voice_id, "name": name})
-        
-        # Add default voices as fallback if needed
-        if not voices:
-            defaults = [
-                {"id": "Chinmay-English-Indian", "name": "Chinmay (Indian)"},
-                {"id": "Emma-English-US", "name": "Emma (US)"},
-                {"id": "Ryan-English-US", "name": "Ryan (US)"},
-                {"id": "Ana-English-US", "name": "Ana (US)"},
-                {"id": "Thomas-English-UK", "name": "Thomas (UK)"}
-            ]
-            voices.extend(defaults)
-        
-        return jsonify({"voices": voices})
+        return cached_voices_response(ultravox_voice_cache)
     except Exception as e:
         print(f"Error fetching Ultravox voices: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/voice-cache-stats', methods=['GET'])
+def get_voice_cache_stats():
+    return jsonify({cache.name: cache.stats() for cache in (elevenlabs_voice_cache, ultravox_voice_cache)})
+
 @app.route('/api/verify-admin', methods=['POST'])
 def verify_admin():
     # Get the admin password from .env file
@@ -184,76 +476,254 @@ def verify_admin():
     else:
         return jsonify({"success": False, "error": "Invalid password"}), 401
 
+FEEDBACK_DIR = "feedback"
+FEEDBACK_FORMAT = os.getenv("FEEDBACK_FORMAT", audio_transcoder.MP3)
+FEEDBACK_TRANSCODE_TIMEOUT = float(os.getenv("FEEDBACK_TRANSCODE_TIMEOUT", "300"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+FEEDBACK_ID_PATTERN = re.compile(r"^[\w-]+$")
+
+if not audio_transcoder.FFMPEG_PATH:
+    print("Warning: ffmpeg not found, feedback will be kept as WebM")
+
+def new_feedback_id():
+    """Collision-free feedback id that still sorts by time (IST)"""
+    ist_timezone = timezone(timedelta(hours=5, minutes=30))
+    current_time_ist = datetime.now(timezone.utc).astimezone(ist_timezone)
+    return f"{current_time_ist.strftime('%Y-%m-%d-%H-%M-%S')}-{uuid.uuid4().hex[:8]}"
+
+def feedback_file(feedback_id):
+    """Name of the saved feedback file, whichever format it ended up in"""
+    for extension in ("mp3", "ogg", "webm"):
+        path = os.path.join(FEEDBACK_DIR, f"{feedback_id}.{extension}")
+        if os.path.exists(path):
+            return os.path.basename(path)
+    return None
+
+def feedback_status(feedback_id):
+    job = feedback_jobs.get(feedback_id)
+    if job is None:
+        return None
+    status = {"done": "done", "dead": "failed"}.get(job["status"], "processing")
+    if status == "done" and not job["attempts"]:
+        # Saved while the transcoding queue was full, so never converted
+        status = "stored"
+    result = {"id": feedback_id, "status": status}
+    if status in ("done", "stored"):
+        result["file"] = feedback_file(feedback_id)
+    elif status == "failed":
+        result["error"] = job["error"]
+    return result
+
 @app.route('/api/upload-feedback', methods=['POST'])
 def upload_feedback():
     try:
-        # Check if audio file was uploaded
-        if 'audio' not in request.files:
+        # Accept the recording as a raw audio body (streamed) or as a multipart 'audio' file
+        if request.mimetype.startswith('audio/'):
+            stream = request.stream
+        elif 'audio' in request.files:
+            stream = request.files['audio'].stream
+        else:
             return jsonify({"success": False, "error": "No audio file provided"}), 400
         
-        audio_file = request.files['audio']
-        
         # Create directories if they don't exist
-        feedback_dir = "feedback"
-        if not os.path.exists(feedback_dir):
-            os.makedirs(feedback_dir)
-        
-        # Generate filename with timestamp and call ID
-        ist_offset = timedelta(hours=5, minutes=30)
-        ist_timezone = timezone(ist_offset)
-        current_time_ist = datetime.now(timezone.utc).astimezone(ist_timezone)
-        timestamp = current_time_ist.strftime("%Y-%m-%d-%H-%M")
-        filename = f"{timestamp}"
-        
-        # Save original WebM file
-        webm_path = os.path.join(feedback_dir, f"{filename}.webm")
-        audio_file.save(webm_path)
+        if not os.path.exists(FEEDBACK_DIR):
+            os.makedirs(FEEDBACK_DIR)
         
-        # Convert to MP3 using FFmpeg (if available)
-        mp3_path = os.path.join(feedback_dir, f"{filename}.mp3")
-        try:
-            # Check if FFmpeg is available
-            subprocess.run(["ffmpeg", "-version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=False)
-            
-            # Convert WebM to MP3
-            command = [
-                "ffmpeg",
-                "-i", webm_path,
-                "-vn",
-                "-ab", "128k",
-                "-ar", "44100",
-                "-f", "mp3",
-                mp3_path
-            ]
-            
-            process = subprocess.run(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
-            )
-            
-            # Remove the original WebM file after successful conversion
-            os.remove(webm_path)
-            
-            final_path = mp3_path
-        except (subprocess.SubprocessError, FileNotFoundError) as e:
-            # FFmpeg not available or conversion failed, keep the WebM file
-            print(f"FFmpeg conversion failed or not available: {str(e)}")
-            final_path = webm_path
+        # Step 1: Stream the upload to disk under a unique id
+        feedback_id = new_feedback_id()
+        webm_path = os.path.join(FEEDBACK_DIR, f"{feedback_id}.webm")
+        with open(webm_path, "wb") as f:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                f.write(chunk)
         
-        return jsonify({
-            "success": True,
-            "message": f"Feedback saved as {os.path.basename(final_path)}"
-        })
+        # Step 2: Hand it to the transcoding pool and return right away
+        return queue_feedback(feedback_id, webm_path)
         
     except Exception as e:
         print(f"Error saving feedback: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
+
+def queue_feedback(feedback_id, webm_path):
+    """Queue a saved recording for transcoding and build the upload response"""
+    if not feedback_pool.submit(feedback_id, webm_path, key=feedback_id):
+        # Queue full: the WebM is saved, it just won't be converted; record that so the status URL knows it
+        feedback_jobs.put_done([feedback_id, webm_path], key=feedback_id, note="Transcoding queue full, kept as WebM")
+        return jsonify({"success": True, "id": feedback_id, "status": "stored",
+                        "file": f"{feedback_id}.webm",
+                        "statusUrl": f"/api/feedback/{feedback_id}",
+                        "message": f"Feedback saved as {feedback_id}.webm"})
     
-@app.route('/api/save-transcript', methods=['POST'])
-def save_transcripts():
-    data = request.json
+    return jsonify({
+        "success": True,
+        "id": feedback_id,
+        "status": "processing",
+        "statusUrl": f"/api/feedback/{feedback_id}",
+        "message": "Feedback uploaded, processing"
+    }), 202
+
+@app.route('/api/feedback/<feedback_id>', methods=['GET'])
+def get_feedback_status(feedback_id):
+    status = feedback_status(feedback_id) if FEEDBACK_ID_PATTERN.match(feedback_id) else None
+    if status is None:
+        return jsonify({"error": "Unknown feedback id"}), 404
+    return jsonify(status)
+
+# Chunked, resumable uploads: the recorder streams timesliced chunks while recording.
+# Each session appends to feedback/<id>.part; the file size is the resume offset.
+FEEDBACK_SESSION_TTL = float(os.getenv("FEEDBACK_SESSION_TTL", str(24 * 3600)))
+FEEDBACK_MAX_BYTES = int(os.getenv("FEEDBACK_MAX_BYTES", str(200 * 1024 * 1024)))
+
+def feedback_part_path(feedback_id):
+    return os.path.join(FEEDBACK_DIR, f"{feedback_id}.part")
+
+def finalize_stale_feedback_sessions():
+    """Save sessions abandoned mid-recording (e.g. the tab was closed) as they are"""
+    cutoff = time.time() - FEEDBACK_SESSION_TTL
+    for entry in os.scandir(FEEDBACK_DIR):
+        if entry.name.endswith(".part") and entry.stat().st_mtime < cutoff:
+            feedback_id = entry.name[:-len(".part")]
+            webm_path = os.path.join(FEEDBACK_DIR, f"{feedback_id}.webm")
+            os.replace(entry.path, webm_path)
+            feedback_pool.submit(feedback_id, webm_path, key=feedback_id)
+            print(f"Saved abandoned feedback session {feedback_id}")
+
+def open_feedback_session(feedback_id):
+    """Open a session file for appending, locked against concurrent requests (any worker)"""
+    if not FEEDBACK_ID_PATTERN.match(feedback_id):
+        return None
+    try:
+        f = open(feedback_part_path(feedback_id), "r+b")
+    except FileNotFoundError:
+        return None
+    fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    # The session may have been completed or discarded while we waited for the lock
+    try:
+        current = os.stat(feedback_part_path(feedback_id))
+    except FileNotFoundError:
+        current = None
+    if current is None or current.st_ino != os.fstat(f.fileno()).st_ino:
+        f.close()
+        return None
+    return f
+
+@app.route('/api/feedback-sessions', methods=['POST'])
+def create_feedback_session():
+    if not os.path.exists(FEEDBACK_DIR):
+        os.makedirs(FEEDBACK_DIR)
+    finalize_stale_feedback_sessions()
+    
+    feedback_id = new_feedback_id()
+    open(feedback_part_path(feedback_id), "xb").close()
+    return jsonify({"id": feedback_id, "received": 0}), 201
+
+@app.route('/api/feedback-sessions/<feedback_id>', methods=['GET'])
+def get_feedback_session(feedback_id):
+    f = open_feedback_session(feedback_id)
+    if f is None:
+        # Already completed (or never existed)
+        return get_feedback_status(feedback_id)
+    with f:
+        return jsonify({"id": feedback_id, "status": "recording", "received": os.fstat(f.fileno()).st_size})
+
+@app.route('/api/feedback-sessions/<feedback_id>/chunks', methods=['PUT'])
+def append_feedback_chunk(feedback_id):
+    """Append the request body at ``offset``; bytes the server already has are skipped"""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"error": "offset is required"}), 400
+    
+    f = open_feedback_session(feedback_id)
+    if f is None:
+        return jsonify({"error": "Unknown or completed feedback session"}), 404
+    with f:
+        received = os.fstat(f.fileno()).st_size
+        if offset > received:
+            # A previous chunk was lost; the client resends from what we have
+            return jsonify({"error": "Offset beyond received data", "received": received}), 409
+        
+        # Skip the part of a retried chunk we already stored, then stream the rest
+        skip = received - offset
+        f.seek(received)
+        stream = request.stream
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if skip:
+                dropped = min(skip, len(chunk))
+                chunk, skip = chunk[dropped:], skip - dropped
+            received += len(chunk)
+            if received > FEEDBACK_MAX_BYTES:
+                return jsonify({"error": "Recording too large", "received": os.fstat(f.fileno()).st_size}), 413
+            f.write(chunk)
+        f.flush()
+        return jsonify({"id": feedback_id, "received": received})
+
+@app.route('/api/feedback-sessions/<feedback_id>/complete', methods=['POST'])
+def complete_feedback_session(feedback_id):
+    size = request.args.get('size', type=int)
+    f = open_feedback_session(feedback_id)
+    if f is None:
+        # Completing twice (a retried request) just reports the status
+        status = feedback_status(feedback_id) if FEEDBACK_ID_PATTERN.match(feedback_id) else None
+        if status is None:
+            return jsonify({"success": False, "error": "Unknown feedback session"}), 404
+        return jsonify({"success": True, **status})
+    with f:
+        received = os.fstat(f.fileno()).st_size
+        if size is not None and size != received:
+            return jsonify({"error": "Upload incomplete", "received": received}), 409
+        webm_path = os.path.join(FEEDBACK_DIR, f"{feedback_id}.webm")
+        os.replace(feedback_part_path(feedback_id), webm_path)
+    return queue_feedback(feedback_id, webm_path)
+
+@app.route('/api/feedback-sessions/<feedback_id>', methods=['DELETE'])
+def discard_feedback_session(feedback_id):
+    f = open_feedback_session(feedback_id)
+    if f is None:
+        return jsonify({"error": "Unknown or completed feedback session"}), 404
+    with f:
+        os.remove(feedback_part_path(feedback_id))
+    return "", 204
+
+def transcode_feedback(feedback_id, source_path):
+    if os.path.exists(source_path):
+        output_base = os.path.join(FEEDBACK_DIR, feedback_id)
+        try:
+            audio_transcoder.transcode(source_path, output_base, FEEDBACK_FORMAT, FEEDBACK_TRANSCODE_TIMEOUT)
+        except (subprocess.SubprocessError, OSError) as e:
+            # Conversion failed, keep the WebM file
+            print(f"FFmpeg conversion failed for feedback {feedback_id}: {str(e)}")
+    
+    file = feedback_file(feedback_id)
+    print(f"Feedback saved as {file}")
+    broadcaster.send('feedback_status', {"id": feedback_id, "status": "done", "file": file}, room=ADMIN_ROOM)
+
+# Completed jobs are purged from jobs.db after this long; see manage_jobs.py for dead letters
+JOB_RETENTION = float(os.getenv("JOB_RETENTION_DAYS", "7")) * 24 * 3600
+
+# Transcoding runs on its own bounded pool, off the request threads
+feedback_jobs = JobQueue(
+    "feedback",
+    path=os.getenv("JOB_QUEUE_PATH", "jobs.db"),
+    max_pending=int(os.getenv("FEEDBACK_QUEUE_SIZE", "100")),
+    visibility_timeout=FEEDBACK_TRANSCODE_TIMEOUT + 60,
+)
+feedback_pool = WorkerPool(
+    "feedback",
+    transcode_feedback,
+    feedback_jobs,
+    num_workers=int(os.getenv("FEEDBACK_WORKERS", "2")),
+    max_attempts=1,
+    retention=JOB_RETENTION,
+)
+feedback_pool.start()
+    
+def handle_save_transcript(data):
+    """Queue transcript capture for a call.ended webhook body; returns (response body, status)"""
     print(f"Webhook data: {data}")
     
     try:
@@ -266,180 +736,394 @@ def save_transcripts():
         if event_type == 'call.ended':
             call_id = call_data.get('callId')
             join_time = call_data.get('created')
+            call_metadata = {
+                "ended": call_data.get('ended'),
+                "endReason": call_data.get('endReason'),
+                "promptVersion": (call_data.get('metadata') or {}).get('promptVersion'),
+                "callProfile": (call_data.get('metadata') or {}).get('callProfile'),
+                "experiment": (call_data.get('metadata') or {}).get('experiment'),
+                "voice": call_data.get('voice'),
+                "model": call_data.get('model'),
+            }
+            if call_id and call_data.get('endReason') == 'unjoined':
+                # Nobody joined (e.g. a speculative call that was never handed out): no transcript to fetch
+                print(f"Call {call_id} ended unjoined, skipping transcript")
+                return {"status": "skipped", "reason": "unjoined"}, 200
             if call_id:
                 print(f"Call ended event for call ID: {call_id}")
-                # Process in background thread to avoid webhook timeout
-                threading.Thread(target=process_transcript, args=(call_id,join_time)).start()
-                return jsonify({"status": "transcript processing started"}), 200
+                # Hand off to the transcript worker pool to avoid webhook timeout
+                # Job is persisted before we acknowledge, so restarts don't lose it
+                if not transcript_pool.submit(call_id, join_time, call_metadata, key=call_id, delay=TRANSCRIPT_INITIAL_DELAY):
+                    print(f"Warning: transcript queue full, rejecting call ID: {call_id}")
+                    return {"status": "error", "message": "Transcript queue full"}, 503
+                return {"status": "transcript processing started"}, 200
             else:
                 print("Warning: call.ended event received but no callId found")
-                return jsonify({"status": "error", "message": "No callId in payload"}), 400
+                return {"status": "error", "message": "No callId in payload"}, 400
         else:
             # Just acknowledge receipt of other event types
-            return jsonify({"status": "acknowledged", "event": event_type}), 200
+            return {"status": "acknowledged", "event": event_type}, 200
     
     except Exception as e:
         print(f"Error processing webhook: {str(e)}")
-        return jsonify({"status": "error", "message": str(e)}), 500
-    
-def process_transcript(call_id,join_time):
+        return {"status": "error", "message": str(e)}, 500
+
+@app.route('/api/save-transcript', methods=['POST'])
+def save_transcripts():
+    body, status = handle_save_transcript(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+# Transcript fetching: pages are followed via the "next" cursor and stages run concurrently
+ULTRAVOX_PAGE_SIZE = int(os.getenv("ULTRAVOX_PAGE_SIZE", "100"))
+TRANSCRIPT_STAGE_CONCURRENCY = int(os.getenv("TRANSCRIPT_STAGE_CONCURRENCY", "4"))
+
+def iter_ultravox_pages(url, headers, retry_statuses=()):
+    """Yield the results of each page of a paginated Ultravox list endpoint"""
+    params = {"pageSize": ULTRAVOX_PAGE_SIZE}
+    while url:
+        response = http_client.get(url, headers=headers, params=params, hedge=True)
+        
+        if response.status_code != 200:
+            print(f"Error: Failed to get {url}. Status code: {response.status_code}")
+            print(f"Response: {response.text}")
+            if response.status_code in retry_statuses or response.status_code >= 500:
+                raise RetryableError(f"{url} returned {response.status_code}")
+            raise RuntimeError(f"Ultravox API returned status code {response.status_code}")
+        
+        data = response.json()
+        yield data.get("results", [])
+        
+        # "next" is a full URL that already carries the cursor and page size
+        url = data.get("next")
+        params = None
+
+def write_stage_messages(call_id, stage_index, stage_id, headers):
+    """Stream every page of a stage's messages into the transcript store as it arrives"""
+    messages_url = f"{http_client.ULTRAVOX_BASE_URL}/calls/{call_id}/stages/{stage_id}/messages"
+    count = 0
+    for page in iter_ultravox_pages(messages_url, headers):
+        rows = []
+        for msg in page:
+            row = message_to_row(msg, count)
+            count += 1
+            if row:
+                rows.append(row)
+        transcript_store.add_messages(call_id, stage_index, rows)
+    return count
+
+def process_transcript(call_id, join_time, call_metadata=None):
     print(f"Starting transcript processing for call ID: {call_id}")
-    
-    # Allow a short delay for call to fully complete on Ultravox side
-    time.sleep(3)
+    call_metadata = call_metadata or {}
     
     api_key = os.getenv("ULTRAVOX_API_KEY")
     if not api_key:
-        print("Error: Ultravox API key not found in environment variables")
-        return
+        # Dead-lettered; requeue with manage_jobs.py once the key is set
+        raise RuntimeError("Ultravox API key not found in environment variables")
     
     try:
-        # Step 1: Get the call stages
+        # Step 1: Get every call stage, following pagination
         print(f"Fetching stages for call: {call_id}")
-        stage_url = f"https://api.ultravox.ai/api/calls/{call_id}/stages"
+        stage_url = f"{http_client.ULTRAVOX_BASE_URL}/calls/{call_id}/stages"
         headers = {"X-API-Key": api_key}
         
-        stage_response = requests.get(stage_url, headers=headers)
-        
-        if stage_response.status_code != 200:
-            print(f"Error: Failed to get stages. Status code: {stage_response.status_code}")
-            print(f"Response: {stage_response.text}")
-            return
-        
-        stage_data = stage_response.json()
-        results = stage_data.get("results", [])
-        
-        if not results:
-            print(f"No stages found for call ID: {call_id}")
-            return
-        
-        # Get the first stage ID
-        stage_id = results[0].get("callStageId")
-        print(f"Using stage ID: {stage_id}")
+        # 404 means the call may not be finalized on Ultravox side yet
+        stage_ids = [
+            stage.get("callStageId")
+            for page in iter_ultravox_pages(stage_url, headers, retry_statuses=(404,))
+            for stage in page
+        ]
         
-        # Step 2: Get the conversation messages
-        print(f"Fetching messages for stage: {stage_id}")
-        messages_url = f"https://api.ultravox.ai/api/calls/{call_id}/stages/{stage_id}/messages"
+        if not stage_ids:
+            raise RetryableError(f"No stages found for call ID: {call_id}")
+        print(f"Found {len(stage_ids)} stage(s)")
         
-        messages_response = requests.get(messages_url, headers=headers)
-        
-        if messages_response.status_code != 200:
-            print(f"Error: Failed to get messages. Status code: {messages_response.status_code}")
-            print(f"Response: {messages_response.text}")
-            return
-        
-        messages_data = messages_response.json()
-        messages = messages_data.get("results", [])
-        print(f"Found {len(messages)} messages")
-        
-        # Step 3: Format the transcript
-        transcript_content = ""
-        for msg in messages:
-            role = msg.get('role')
-            text = msg.get('text', '')
-            
-            if not text:
-                continue
-            
-            if role == 'MESSAGE_ROLE_USER':
-                speaker = 'USER'
-            elif role == 'MESSAGE_ROLE_AGENT':
-                speaker = 'AGENT'
-            else:
-                continue
-            
-            transcript_content += f"{speaker}: \"{text}\"\n\n"
-        
-        # Step 4: Save to file with date-based directory structure
-        ist_offset = timedelta(hours=5, minutes=30)
-        ist_timezone = timezone(ist_offset)
-        current_time_ist = datetime.now(timezone.utc).astimezone(ist_timezone)
-        date_str = current_time_ist.strftime("%Y-%m-%d")
-        time_str = current_time_ist.strftime("%H-%M-%S")
-        
-        # Create directories if they don't exist
-        directory = f"transcripts/{date_str}"
-        if not os.path.exists("transcripts"):
-            os.makedirs("transcripts")
-            print("Created base directory: transcripts")
-        
-        if not os.path.exists(directory):
-            os.makedirs(directory)
-            print(f"Created date directory: {directory}")
+        # Step 2: Fetch all stages concurrently, each streaming pages into the store
+        transcript_store.begin_call(call_id)
+        with ThreadPoolExecutor(max_workers=min(TRANSCRIPT_STAGE_CONCURRENCY, len(stage_ids))) as executor:
+            futures = [
+                executor.submit(write_stage_messages, call_id, stage_index, stage_id, headers)
+                for stage_index, stage_id in enumerate(stage_ids)
+            ]
+            counts = [future.result() for future in futures]
+        print(f"Found {sum(counts)} messages")
         
-        # Save file with timestamp and call ID in filename
-        output_file = f"{directory}/{time_str}_{call_id}.txt"
+        # Step 3: Publish the call with its metadata
+        call = transcript_store.finalize_call(
+            call_id,
+            created=join_time,
+            ended=call_metadata.get("ended"),
+            prompt_version=call_metadata.get("promptVersion"),
+            metadata=call_metadata,
+        )
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(transcript_content)
+        print(f"Transcript successfully saved for call {call_id} ({call['message_count']} turns, {call['date']})")
         
-        print(f"Transcript successfully saved to {output_file}")
+        # Step 4: Hand the saved transcript to the analysis stage; capture never waits on it
+        if AUTO_ANALYZE and call["message_count"]:
+            if not analysis_pool.submit(call_id, key=f"{call_id}:{call['saved_at']}"):
+                print(f"Analysis queue full, leaving call {call_id} for the daily run")
         
+    except http_client.RequestException as e:
+        raise RetryableError(str(e))
+    # Anything else propagates, so the worker pool dead-letters the job instead of acking it
+
+# Durable queue + bounded pool for transcript fetching; readiness is polled with exponential backoff
+TRANSCRIPT_INITIAL_DELAY = float(os.getenv("TRANSCRIPT_INITIAL_DELAY", "1"))
+transcript_jobs = JobQueue(
+    "transcripts",
+    path=os.getenv("JOB_QUEUE_PATH", "jobs.db"),
+    max_pending=int(os.getenv("TRANSCRIPT_QUEUE_SIZE", "1000")),
+    visibility_timeout=float(os.getenv("TRANSCRIPT_VISIBILITY_TIMEOUT", "120")),
+)
+transcript_pool = WorkerPool(
+    "transcripts",
+    process_transcript,
+    transcript_jobs,
+    num_workers=int(os.getenv("TRANSCRIPT_WORKERS", "4")),
+    max_attempts=int(os.getenv("TRANSCRIPT_MAX_ATTEMPTS", "6")),
+    base_delay=float(os.getenv("TRANSCRIPT_RETRY_BASE_DELAY", "1")),
+    max_delay=float(os.getenv("TRANSCRIPT_RETRY_MAX_DELAY", "30")),
+    retention=JOB_RETENTION,
+)
+
+# Optional analysis stage chained after transcript capture, on its own small, low-priority pool
+AUTO_ANALYZE = os.getenv("AUTO_ANALYZE", "false").lower() == "true"
+ANALYSIS_YIELD_TIMEOUT = float(os.getenv("ANALYSIS_YIELD_TIMEOUT", "30"))
+if AUTO_ANALYZE and not os.getenv("GOOGLE_API_KEY"):
+    print("Warning: AUTO_ANALYZE is set but GOOGLE_API_KEY is missing, auto-analysis disabled")
+    AUTO_ANALYZE = False
+
+_analyzer = None
+_analyzer_lock = threading.Lock()
+
+def get_analyzer():
+    """Warm TranscriptAnalyzer and analysis manifest, shared by all analysis jobs"""
+    global _analyzer
+    with _analyzer_lock:
+        if _analyzer is None:
+            # Imported lazily: the LLM stack is only needed when auto-analysis is on
+            from transcript_analyzer import TranscriptAnalyzer, RateLimiter, AnalysisCache, AnalysisManifest
+            rpm = float(os.getenv("ANALYSIS_RPM", "0"))
+            tpm = float(os.getenv("ANALYSIS_TPM", "0"))
+            analyzer = TranscriptAnalyzer(
+                os.getenv("GOOGLE_API_KEY"),
+                store=transcript_store,
+                rate_limiter=RateLimiter(rpm, tpm) if (rpm or tpm) else None,
+                cache=AnalysisCache(os.getenv("ANALYSIS_CACHE_PATH", "transcripts/analysis_cache.db")),
+            )
+            _analyzer = (analyzer, AnalysisManifest(transcript_store.path))
+        return _analyzer
+
+def analyze_saved_call(call_id):
+    from transcript_analyzer import AnalysisParseError
+    from transcript_analyzer.manifest import DONE, ERROR, content_hash
+    
+    # Step 1: Give way while every transcript worker is busy
+    deadline = time.monotonic() + ANALYSIS_YIELD_TIMEOUT
+    while transcript_pool.stats()["in_flight"] >= transcript_pool.num_workers and time.monotonic() < deadline:
+        time.sleep(1)
+    
+    # Step 2: Analyze against the prompt version the call ran with
+    analyzer, manifest = get_analyzer()
+    call = transcript_store.get_call(call_id)
+    if call is None:
+        print(f"Call {call_id} no longer in the transcript store, skipping analysis")
+        return
+    ran_with = call["metadata"].get("promptVersion")
+    prompt = call_profiles.prompt_for(call["metadata"].get("callProfile"), ran_with)
+    if ran_with and prompt.version != ran_with:
+        print(f"Prompt version {ran_with} of call {call_id} is no longer loaded, analyzing against {prompt.version}")
+    turns_hash = content_hash(transcript_store.get_turns(call_id))
+    try:
+        analysis = analyzer.analyze_call(call_id, prompt.text, prompt.version)
+    except AnalysisParseError as e:
+        # Recorded as failed so the daily run picks the call up if the retries don't fix it
+        manifest.mark(call, ERROR, turns_hash, prompt.version, error=str(e))
+        raise RetryableError(str(e))
     except Exception as e:
-        import traceback
-        print(f"Error processing transcript: {str(e)}")
-        print(traceback.format_exc())
+        # Model/network failures; once attempts run out the daily run picks the call up
+        raise RetryableError(str(e))
+    
+    # Step 3: Record it so the daily run skips this call, and push it to the admin dashboard
+    manifest.mark(call, DONE, turns_hash, prompt.version)
+    broadcaster.send('call_analysis', {
+        "callId": call_id,
+        "date": call["date"],
+        "promptVersion": prompt.version,
+        "analysis": analysis,
+    }, room=ADMIN_ROOM)
+    print(f"Analysis pushed for call {call_id}")
+
+analysis_jobs = JobQueue(
+    "analysis",
+    path=os.getenv("JOB_QUEUE_PATH", "jobs.db"),
+    max_pending=int(os.getenv("ANALYSIS_QUEUE_SIZE", "500")),
+    visibility_timeout=float(os.getenv("ANALYSIS_VISIBILITY_TIMEOUT", "600")),
+)
+analysis_pool = WorkerPool(
+    "analysis",
+    analyze_saved_call,
+    analysis_jobs,
+    num_workers=int(os.getenv("ANALYSIS_WORKERS", "1")),
+    max_attempts=int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("ANALYSIS_RETRY_BASE_DELAY", "30")),
+    max_delay=float(os.getenv("ANALYSIS_RETRY_MAX_DELAY", "600")),
+    poll_interval=5.0,
+    retention=JOB_RETENTION,
+)
+
+if AUTO_ANALYZE:
+    analysis_pool.start()
+transcript_pool.start()
 
 @app.route('/api/ongoing-calls', methods=['GET'])
 def get_ongoing_calls():
-    global ongoing_calls
-    print(f"[DEBUG] /api/ongoing-calls endpoint called. Current count: {ongoing_calls}")
-    return jsonify({"ongoing_calls": ongoing_calls})
+    return jsonify({"ongoing_calls": call_registry.count()})
 
-@app.route('/api/webhooks/call-started', methods=['POST'])
-def call_started_webhook():
-    print("[DEBUG] /api/webhooks/call-started endpoint called")
+def parse_timestamp(value):
+    """Epoch seconds for an Ultravox ISO timestamp, or None"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def live_call_from_ultravox(call_data):
+    return LiveCall(
+        call_id=call_data["callId"],
+        started_at=parse_timestamp(call_data.get("joined")) or parse_timestamp(call_data.get("created")) or time.time(),
+        voice=call_data.get("voice"),
+        prompt_version=(call_data.get("metadata") or {}).get("promptVersion"),
+    )
+
+CALL_RECONCILE_INTERVAL = float(os.getenv("CALL_RECONCILE_INTERVAL", "60"))
+CALL_RECONCILE_GRACE = float(os.getenv("CALL_RECONCILE_GRACE", "60"))
+CALL_MAX_DURATION = float(os.getenv("CALL_MAX_DURATION", str(2 * 3600)))
+
+def fetch_live_ultravox_calls(headers):
+    """Calls Ultravox reports as joined but not ended, scanning only recently created calls"""
+    live = {}
+    cutoff = time.time() - CALL_MAX_DURATION
+    for page in iter_ultravox_pages(f"{http_client.ULTRAVOX_BASE_URL}/calls", headers):
+        for call_data in page:
+            if call_data.get("joined") and not call_data.get("ended"):
+                call = live_call_from_ultravox(call_data)
+                live[call.call_id] = call
+        # Pages are newest first; stop once we're past the longest plausible call
+        created = [parse_timestamp(call_data.get("created")) for call_data in page]
+        if not page or all(ts is not None and ts < cutoff for ts in created):
+            break
+    return live
+
+def reconcile_calls():
+    api_key = os.getenv("ULTRAVOX_API_KEY")
+    if not api_key:
+        return
+    headers = {"X-API-Key": api_key}
+    
+    def is_ended(call_id):
+        response = http_client.get(f"{http_client.ULTRAVOX_BASE_URL}/calls/{call_id}", headers=headers, hedge=True)
+        if response.status_code == 404:
+            return True
+        response.raise_for_status()
+        return bool(response.json().get("ended"))
+    
+    added, removed = call_registry.reconcile(fetch_live_ultravox_calls(headers), is_ended, grace=CALL_RECONCILE_GRACE)
+    if added or removed:
+        print(f"Call registry reconciled: {added} missed start(s), {removed} missed end(s)")
+        admission.released()
+        broadcast_call_count()
+
+def reconcile_calls_periodically():
+    while True:
+        time.sleep(CALL_RECONCILE_INTERVAL)
+        # With several workers sharing the registry, only the lease holder reconciles
+        if not call_registry.acquire_lease("reconcile", WORKER_ID, ttl=CALL_RECONCILE_INTERVAL * 2):
+            continue
+        try:
+            reconcile_calls()
+        except Exception as e:
+            print(f"[ERROR] Reconciling call registry: {str(e)}")
+
+if CALL_RECONCILE_INTERVAL > 0:
+    threading.Thread(target=reconcile_calls_periodically, name="call-reconciler", daemon=True).start()
+
+def handle_call_started(data):
+    """Register a call from a call.started webhook body; returns (response body, status)"""
     try:
-        event_type = request.json.get('event')
-        call_data = request.json.get('call', {})
+        event_type = data.get('event')
+        call_data = data.get('call', {})
         call_id = call_data.get('callId', 'unknown')
         
         # Handle call.started event
         if event_type == 'call.started':
-            # Increment ongoing calls counter
-            global ongoing_calls
-            ongoing_calls += 1
-            print(f"[DEBUG] Call {call_id} started. Incremented count to: {ongoing_calls}")
+            # Register the call; duplicate or late deliveries are ignored
+            call = live_call_from_ultravox(call_data) if call_id != 'unknown' else None
+            registered = call is not None and call_registry.started(call)
+            # Now counted as live, so its admission reservation is no longer needed
+            admission.settle(call_id)
+            if not registered:
+                print(f"[DEBUG] Ignoring duplicate or out-of-order start for call {call_id}")
+                return {"status": "ignored", "message": "Call already registered or ended"}, 200
+            print(f"[DEBUG] Call {call_id} started. Live calls: {call_registry.count()}")
             
-            # Broadcast the updated count to all connected clients
+            # Broadcast the updated state to admins
             broadcast_call_count()
+            broadcast_call_state(call_id, call, "live")
             
-            return jsonify({"status": "success", "message": "Call count incremented"}), 200
+            return {"status": "success", "message": "Call registered"}, 200
         else:
             print(f"[DEBUG] Received {event_type} event instead of call.started")
-            return jsonify({"status": "acknowledged", "event": event_type}), 200
+            return {"status": "acknowledged", "event": event_type}, 200
     
     except Exception as e:
         print(f"[ERROR] Processing call started webhook: {str(e)}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return {"status": "error", "message": str(e)}, 500
 
-@app.route('/api/webhooks/call-ended', methods=['POST'])
-def call_ended_webhook():
-    print("[DEBUG] /api/webhooks/call-ended endpoint called")
+def handle_call_ended(data):
+    """Unregister a call from a call.ended webhook body; returns (response body, status)"""
     try:
-        event_type = request.json.get('event')
-        call_data = request.json.get('call', {})
+        event_type = data.get('event')
+        call_data = data.get('call', {})
         call_id = call_data.get('callId', 'unknown')
         
         # Handle call.ended event
         if event_type == 'call.ended':
-            # Decrement ongoing calls counter
-            global ongoing_calls
-            if ongoing_calls > 0:
-                ongoing_calls -= 1
-                print(f"[DEBUG] Call {call_id} ended. Decremented count to: {ongoing_calls}")
+            # Unregister the call; ending a call that isn't live is a no-op
+            call = call_registry.get(call_id)
+            # Also settles admitted calls that were never joined
+            admission.settle(call_id)
+            if call_registry.ended(call_id):
+                print(f"[DEBUG] Call {call_id} ended. Live calls: {call_registry.count()}")
                 
-                # Broadcast the updated count to all connected clients
+                # Let queued call requests take the freed slot, and update admins
+                admission.released()
                 broadcast_call_count()
+                broadcast_call_state(call_id, call, "ended")
+            else:
+                print(f"[DEBUG] Ignoring end for call {call_id} that isn't live")
                 
-            return jsonify({"status": "success", "message": "Call count decremented"}), 200
+            return {"status": "success", "message": "Call unregistered"}, 200
         else:
             print(f"[DEBUG] Received {event_type} event instead of call.ended")
-            return jsonify({"status": "acknowledged", "event": event_type}), 200
+            return {"status": "acknowledged", "event": event_type}, 200
     
     except Exception as e:
         print(f"[ERROR] Processing call ended webhook: {str(e)}")
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return {"status": "error", "message": str(e)}, 500
+
+@app.route('/api/webhooks/call-started', methods=['POST'])
+def call_started_webhook():
+    print("[DEBUG] /api/webhooks/call-started endpoint called")
+    body, status = handle_call_started(request.get_json(silent=True) or {})
+    return jsonify(body), status
+
+@app.route('/api/webhooks/call-ended', methods=['POST'])
+def call_ended_webhook():
+    print("[DEBUG] /api/webhooks/call-ended endpoint called")
+    body, status = handle_call_ended(request.get_json(silent=True) or {})
+    return jsonify(body), status
 
 if __name__ == '__main__':
     socketio.run(app, debug=True, port=8000, host='0.0.0.0')
\ No newline at end of file
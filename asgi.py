@@ -0,0 +1,285 @@
+"""Async serving mode: one event loop serves the hot routes and Socket.IO.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+This needs an ASGI server and httpx, from the "async" extra
+(pip install -e ".[async]" installs uvicorn and httpx).
+Join URLs, prewarming and the call webhooks are handled natively on the
+loop. Call creation awaits httpx, and admission waits hold no thread.
+Socket.IO runs on a python-socketio AsyncServer on the same loop, and the
+shared broadcaster emits through it. Blocking work goes to a thread pool:
+SQLite-backed registries, the transcript job queue, and every other route,
+which is served by the Flask app through a small WSGI bridge. ffmpeg,
+transcript fetching and analysis already run on their worker pools.
+Multi-worker setups work as in wsgi.py, with SOCKETIO_MESSAGE_QUEUE
+pointing at Redis.
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+import socketio
+
+import app as web
+import http_client
+from admission import AdmissionRejected
+from call_registry import MemoryBackend
+from socketio_manager import AsyncServerEmitter, async_socketio_options
+
+# Threads for blocking work: the Flask routes, SQLite, the job queue
+executor = ThreadPoolExecutor(max_workers=int(os.getenv("ASGI_BLOCKING_THREADS", "32")), thread_name_prefix="asgi-blocking")
+# Request bodies for Flask routes stay in memory up to this size, then spill to disk
+WSGI_SPOOL_SIZE = 1024 * 1024
+MAX_JSON_BODY = 1024 * 1024
+
+# A memory registry is only dict operations, cheap enough to run on the loop
+REGISTRY_IN_MEMORY = isinstance(web.call_registry.backend, MemoryBackend)
+
+sio = socketio.AsyncServer(
+    async_mode="asgi",
+    cors_allowed_origins="*",
+    **async_socketio_options(os.getenv("SOCKETIO_MESSAGE_QUEUE"), os.getenv("SOCKETIO_CHANNEL", "flask-socketio")),
+)
+
+
+async def run_blocking(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def registry_work(fn, *args):
+    """Run something that touches the call registry, off the loop unless it's in memory"""
+    if REGISTRY_IN_MEMORY:
+        return fn(*args)
+    return await run_blocking(fn, *args)
+
+
+def bind_loop(loop):
+    """Send the shared broadcaster's emits through the AsyncServer (idempotent)"""
+    if not isinstance(web.broadcaster.socketio, AsyncServerEmitter):
+        web.broadcaster.socketio = AsyncServerEmitter(sio, loop)
+
+
+@sio.event
+async def connect(sid, environ, auth):
+    if not web.is_admin_socket(auth):
+        return False
+    await sio.enter_room(sid, web.ADMIN_ROOM)
+    await sio.emit("call_state_snapshot", await registry_work(web.call_state_snapshot), to=sid)
+
+
+# Native routes
+
+async def read_body(receive, limit=MAX_JSON_BODY):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get("body", b""))
+        if len(body) > limit:
+            return None
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+async def send_json(send, body, status=200, headers=()):
+    payload = json.dumps(body).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+        + [(name.lower().encode("latin-1"), str(value).encode("latin-1")) for name, value in headers],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+def client_id(scope):
+    forwarded_for = ",".join(value.decode("latin-1") for name, value in scope.get("headers", []) if name == b"x-forwarded-for")
+    client = scope.get("client")
+    return web.client_key(client[0] if client else None, forwarded_for)
+
+
+async def get_join_url(scope, data, send):
+    template, error = web.join_url_template(data)
+    if error:
+        return await send_json(send, *error)
+
+    # Wait for a call slot (bounded) without holding a thread, or tell the client when to retry
+    try:
+        ticket = await web.admission.aadmit(client_id(scope), None if REGISTRY_IN_MEMORY else executor)
+    except AdmissionRejected as e:
+        return await send_json(send, *web.admission_rejected(e))
+
+    try:
+        voice_id = data.get("voiceId")
+        # Attaching the call settles its admission reservation, which counts live calls in the registry;
+        # a pool lookup may also fetch the voice catalog
+        pool_work = run_blocking if web.SPECULATIVE_CALLS else registry_work
+        body = await pool_work(web.warm_join_url, template, voice_id, ticket)
+        if body is None:
+            call = await web.acreate_ultravox_call(template.body(voice_id))
+            body = await registry_work(web.new_join_url, template, call, ticket)
+        return await send_json(send, body)
+
+    except asyncio.CancelledError:
+        # The client went away; nobody will join the call, so free its slot now rather than at reservation_ttl
+        if REGISTRY_IN_MEMORY:
+            web.admission.cancel(ticket)
+        else:
+            asyncio.get_running_loop().run_in_executor(executor, web.admission.cancel, ticket)
+        raise
+    except Exception as e:
+        return await send_json(send, *await registry_work(web.join_url_failure, e, ticket))
+
+
+async def prewarm_call(scope, data, send):
+    # Checking the voice may fetch the voice catalog
+    await send_json(send, *await run_blocking(web.handle_prewarm_call, data, client_id(scope)))
+
+
+async def get_ongoing_calls(scope, data, send):
+    return await send_json(send, {"ongoing_calls": await registry_work(web.call_registry.count)})
+
+
+async def call_started_webhook(scope, data, send):
+    print("[DEBUG] /api/webhooks/call-started endpoint called")
+    await send_json(send, *await registry_work(web.handle_call_started, data))
+
+
+async def call_ended_webhook(scope, data, send):
+    print("[DEBUG] /api/webhooks/call-ended endpoint called")
+    await send_json(send, *await registry_work(web.handle_call_ended, data))
+
+
+async def save_transcript(scope, data, send):
+    # Persists a job to the SQLite queue
+    await send_json(send, *await run_blocking(web.handle_save_transcript, data))
+
+
+ROUTES = {
+    ("POST", "/api/get-join-url"): get_join_url,
+    ("POST", "/api/prewarm-call"): prewarm_call,
+    ("GET", "/api/ongoing-calls"): get_ongoing_calls,
+    ("POST", "/api/webhooks/call-started"): call_started_webhook,
+    ("POST", "/api/webhooks/call-ended"): call_ended_webhook,
+    ("POST", "/api/save-transcript"): save_transcript,
+}
+
+
+# Everything else: the Flask app on the thread pool
+
+def wsgi_environ(scope, body):
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": quote(scope.get("root_path", "")),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": (scope.get("server") or ("localhost", 80))[0],
+        "SERVER_PORT": str((scope.get("server") or ("localhost", 80))[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def start_wsgi(environ):
+    """Call the Flask app up to its first chunk, so the status and headers are known"""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+        return lambda data: started.setdefault("written", []).append(data)
+
+    result = web.app(environ, start_response)
+    iterator = iter(result)
+    first = next(iterator, b"")
+    first = b"".join(started.pop("written", [])) + first
+    return started["status"], started["headers"], first, result, iterator
+
+
+async def wsgi_bridge(scope, receive, send):
+    # Spool the request body; once it's past memory size, disk writes go to the pool
+    body = tempfile.SpooledTemporaryFile(max_size=WSGI_SPOOL_SIZE)
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            body.close()
+            return
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > WSGI_SPOOL_SIZE:
+            await run_blocking(body.write, chunk)
+        else:
+            body.write(chunk)
+        if not message.get("more_body"):
+            break
+    body.seek(0)
+
+    try:
+        status, headers, first, result, iterator = await run_blocking(start_wsgi, wsgi_environ(scope, body))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        chunk = first
+        while chunk is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await run_blocking(next, iterator, None)
+        await send({"type": "http.response.body", "body": b""})
+        if hasattr(result, "close"):
+            await run_blocking(result.close)
+    finally:
+        body.close()
+
+
+async def http_app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                bind_loop(asyncio.get_running_loop())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await http_client.aclose()
+                executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    # For servers that skip lifespan
+    bind_loop(asyncio.get_running_loop())
+
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        return await wsgi_bridge(scope, receive, send)
+
+    raw = await read_body(receive)
+    if raw is None:
+        return await send_json(send, {"error": "Request body too large"}, 413)
+    try:
+        data = json.loads(raw) if raw else {}
+    except ValueError:
+        data = {}
+    await handler(scope, data if isinstance(data, dict) else {}, send)
+
+
+# Socket.IO on /socket.io/, everything else to the routes above
+application = socketio.ASGIApp(sio, other_asgi_app=http_app)
@@ -0,0 +1,42 @@
+"""Feedback audio transcoding with ffmpeg, located once at import."""
+import os
+import shutil
+import subprocess
+from typing import Optional
+
+FFMPEG_PATH = shutil.which(os.getenv("FFMPEG_BINARY", "ffmpeg"))
+
+# Output format: "mp3" re-encodes; "opus" keeps the recorder's Opus stream and only remuxes it
+MP3 = "mp3"
+OPUS = "opus"
+
+
+def transcode(source_path: str, output_base: str, output_format: str = MP3, timeout: float = 300,
+              ffmpeg: Optional[str] = FFMPEG_PATH) -> str:
+    """Convert a recorded WebM file and return the path that should be kept.
+
+    On success the source is removed. Without ffmpeg the WebM is kept as-is.
+    A failed conversion raises ``subprocess.SubprocessError``, and the source
+    is left in place.
+    """
+    if not ffmpeg:
+        return source_path
+
+    if output_format == OPUS:
+        # Copy the Opus packets into an Ogg container: no decoding, almost no CPU
+        output_path = f"{output_base}.ogg"
+        codec_args = ["-c:a", "copy"]
+    else:
+        output_path = f"{output_base}.mp3"
+        codec_args = ["-ab", "128k", "-ar", "44100", "-f", "mp3"]
+
+    command = [ffmpeg, "-nostdin", "-loglevel", "error", "-y", "-i", source_path, "-vn", *codec_args, output_path]
+    try:
+        subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, timeout=timeout)
+    except subprocess.SubprocessError:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    os.remove(source_path)
+    return output_path
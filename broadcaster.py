@@ -0,0 +1,91 @@
+"""Coalescing Socket.IO broadcaster: bursts of updates become one emit per window."""
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+
+class CoalescingBroadcaster:
+    """Buffers updates for ``window`` seconds and emits only what's needed.
+
+    ``publish`` keeps just the latest payload per (event, room), and skips it
+    entirely if it equals what was last sent. ``publish_delta`` merges keyed
+    changes into one ``{"changes": {...}}`` payload, latest value per key.
+    ``send`` emits immediately. Emits sent and updates suppressed are counted.
+    """
+
+    def __init__(self, socketio, window: float = 0.5):
+        self.socketio = socketio
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._deltas: Dict[Tuple[str, Optional[str]], Dict[str, Any]] = {}
+        self._last_sent: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._flush_scheduled = False
+
+        self.emitted = 0
+        self.suppressed = 0
+
+    def publish(self, event: str, data: Any, room: Optional[str] = None):
+        """Queue the latest state for an event; earlier unsent states are dropped"""
+        key = (event, room)
+        with self._lock:
+            if key in self._pending:
+                self.suppressed += 1
+            self._pending[key] = data
+            self._schedule()
+
+    def publish_delta(self, event: str, item_key: str, change: Any, room: Optional[str] = None):
+        """Queue a change to one item; changes to the same item within a window collapse"""
+        key = (event, room)
+        with self._lock:
+            changes = self._deltas.setdefault(key, {})
+            if item_key in changes:
+                self.suppressed += 1
+            changes[item_key] = change
+            self._schedule()
+
+    def send(self, event: str, data: Any, room: Optional[str] = None, **kwargs):
+        """Emit right away, bypassing coalescing"""
+        self.socketio.emit(event, data, to=room, **kwargs)
+        with self._lock:
+            self.emitted += 1
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            deltas, self._deltas = self._deltas, {}
+            self._flush_scheduled = False
+
+            emits = []
+            for key, data in pending.items():
+                if self._last_sent.get(key) == data:
+                    self.suppressed += 1
+                    continue
+                self._last_sent[key] = data
+                emits.append((key, data))
+            emits.extend((key, {"changes": changes}) for key, changes in deltas.items())
+            self.emitted += len(emits)
+
+        for (event, room), data in emits:
+            try:
+                self.socketio.emit(event, data, to=room)
+            except Exception as e:
+                print(f"Error broadcasting {event}: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "emitted": self.emitted,
+                "suppressed": self.suppressed,
+                "pending": len(self._pending) + sum(len(changes) for changes in self._deltas.values()),
+            }
+
+    def _schedule(self):
+        # Caller holds the lock
+        if self._flush_scheduled:
+            return
+        self._flush_scheduled = True
+        self.socketio.start_background_task(self._flush_later)
+
+    def _flush_later(self):
+        self.socketio.sleep(self.window)
+        self.flush()
@@ -0,0 +1,211 @@
+"""Warm pool of pre-created calls, so starting a call doesn't wait on the create-call round trip."""
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Hashable, Optional
+
+
+@dataclass(frozen=True)
+class WarmCall:
+    call_id: str
+    join_url: str
+    created_at: float
+    expires_at: float
+
+
+class WarmCallPool:
+    """Pre-created calls per key (e.g. voice and prompt version), each held until ``hold_seconds``.
+
+    ``create(key)`` makes one call upstream and returns its ``{"callId",
+    "joinUrl"}`` (or None to skip). ``prewarm(key)`` signals interest and
+    ``take(key)`` hands out a ready call (a hit) or None (a miss). Either way
+    the key is topped up in the background to a target size that follows
+    recent demand: the number of takes in the last ``demand_window`` seconds,
+    at most ``max_per_key``, or 1 if the key was only prewarmed. Keys with no
+    prewarm or take in that window are dropped, so nothing is created for
+    them. Calls nearing expiry are reaped. Only the ``max_keys`` most
+    recently used keys are kept warm; a prewarm for a new key is refused
+    while that many are in use. At most ``max_creating`` creations are
+    queued or running at once, across all keys.
+    """
+
+    def __init__(
+        self,
+        create: Callable[[Hashable], Optional[Dict[str, Any]]],
+        hold_seconds: float = 240,
+        max_per_key: int = 3,
+        max_keys: int = 10,
+        demand_window: float = 300,
+        create_workers: int = 2,
+        max_creating: int = 6,
+    ):
+        self.create = create
+        self.hold_seconds = hold_seconds
+        self.max_per_key = max_per_key
+        self.max_keys = max_keys
+        self.demand_window = demand_window
+        self.max_creating = max_creating
+
+        self._lock = threading.Lock()
+        self._ready: "OrderedDict[Hashable, Deque[WarmCall]]" = OrderedDict()
+        self._takes: Dict[Hashable, Deque[float]] = {}
+        self._last_used: Dict[Hashable, float] = {}
+        self._creating: Dict[Hashable, int] = {}
+        self._executor = ThreadPoolExecutor(max_workers=create_workers, thread_name_prefix="call-pool")
+        self._reaper = None
+
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.reaped = 0
+        self.failed = 0
+        self.evicted = 0
+        self.refused = 0
+
+    def prewarm(self, key: Hashable) -> int:
+        """Mark a key as wanted and start filling it. Returns the calls ready now"""
+        with self._lock:
+            if key not in self._ready and len(self._ready) >= self.max_keys:
+                # Don't let a stream of new keys push out the ones in use
+                self.refused += 1
+                return 0
+            self._touch(key, time.time())
+            ready = len(self._ready[key])
+        self._fill(key)
+        return ready
+
+    def take(self, key: Hashable) -> Optional[WarmCall]:
+        now = time.time()
+        call = None
+        with self._lock:
+            self._touch(key, now)
+            self._takes.setdefault(key, deque()).append(now)
+            ready = self._ready[key]
+            while ready:
+                candidate = ready.popleft()
+                if candidate.expires_at > now:
+                    call = candidate
+                    break
+                self.reaped += 1
+            if call:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._fill(key)
+        return call
+
+    def reap(self) -> int:
+        """Drop expired calls and keys idle for ``demand_window``; returns how many calls"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for key, ready in list(self._ready.items()):
+                if self._last_used.get(key, 0) < now - self.demand_window:
+                    # Ready calls are left to expire unjoined
+                    self._drop(key)
+                    self.evicted += 1
+                    removed += len(ready)
+                    continue
+                fresh = deque(call for call in ready if call.expires_at > now)
+                removed += len(ready) - len(fresh)
+                self._ready[key] = fresh
+            self.reaped += removed
+        return removed
+
+    def start_reaper(self, interval: float = 15):
+        """Reap and top up every ``interval`` seconds on a daemon thread (idempotent)"""
+        if self._reaper is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                    with self._lock:
+                        keys = list(self._ready)
+                    for key in keys:
+                        self._fill(key)
+                except Exception as e:
+                    print(f"Error maintaining call pool: {str(e)}")
+
+        self._reaper = threading.Thread(target=run, name="call-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "created": self.created,
+                "reaped": self.reaped,
+                "failed": self.failed,
+                "evicted": self.evicted,
+                "refused": self.refused,
+                "creating": sum(self._creating.values()),
+                "ready": {str(key): len(ready) for key, ready in self._ready.items()},
+            }
+
+    def _touch(self, key: Hashable, now: float):
+        # Caller holds the lock. Most recently used keys stay; the rest are dropped
+        if key in self._ready:
+            self._ready.move_to_end(key)
+        else:
+            self._ready[key] = deque()
+        self._last_used[key] = now
+        while len(self._ready) > self.max_keys:
+            self.reaped += len(self._drop(next(iter(self._ready))))
+
+    def _drop(self, key: Hashable) -> Deque[WarmCall]:
+        # Caller holds the lock
+        self._takes.pop(key, None)
+        self._last_used.pop(key, None)
+        return self._ready.pop(key)
+
+    def _target(self, key: Hashable, now: float) -> int:
+        # Caller holds the lock. No recent prewarm or take: let the key drain
+        if self._last_used.get(key, 0) < now - self.demand_window:
+            return 0
+        takes = self._takes.get(key)
+        if takes:
+            while takes and takes[0] < now - self.demand_window:
+                takes.popleft()
+        return max(1, min(self.max_per_key, len(takes or ())))
+
+    def _fill(self, key: Hashable):
+        now = time.time()
+        with self._lock:
+            if key not in self._ready:
+                return
+            missing = self._target(key, now) - len(self._ready[key]) - self._creating.get(key, 0)
+            missing = min(missing, self.max_creating - sum(self._creating.values()))
+            if missing <= 0:
+                return
+            self._creating[key] = self._creating.get(key, 0) + missing
+        for _ in range(missing):
+            self._executor.submit(self._create_one, key)
+
+    def _create_one(self, key: Hashable):
+        try:
+            data = self.create(key)
+        except Exception as e:
+            print(f"Error pre-creating call for {key}: {str(e)}")
+            data = None
+            with self._lock:
+                self.failed += 1
+        now = time.time()
+        with self._lock:
+            self._creating[key] -= 1
+            if not data:
+                return
+            self.created += 1
+            if key not in self._ready:
+                # Key dropped meanwhile; let the call expire unused
+                self.reaped += 1
+                return
+            self._ready[key].append(WarmCall(data["callId"], data["joinUrl"], now, now + self.hold_seconds))
+
@@ -0,0 +1,229 @@
+"""Named call profiles and weighted experiments, compiled into pre-serialized create-call payloads."""
+import json
+import os
+import random
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from prompt_registry import CALL_MODEL, CALL_TEMPERATURE, CALL_VOICE, PromptRegistry, PromptVersion, get_registry
+
+DEFAULT_PROFILES_PATH = "call_profiles.json"
+DEFAULT_PROFILE = "default"
+
+PROFILE_FIELDS = {"voice", "prompt", "temperature", "model", "tools"}
+TOOL_KEYS = {"toolName", "toolId", "temporaryTool"}
+
+
+@dataclass(frozen=True)
+class CallProfile:
+    name: str
+    # None means use the voice the caller picked (or CALL_VOICE)
+    voice: Optional[str] = None
+    # Prompt file; None means the shared prompt.txt registry
+    prompt: Optional[str] = None
+    temperature: float = CALL_TEMPERATURE
+    model: str = CALL_MODEL
+    # Ultravox selectedTools entries
+    tools: Tuple[Dict[str, Any], ...] = field(default=(), hash=False)
+
+
+@dataclass(frozen=True)
+class Experiment:
+    name: str
+    variants: Tuple[str, ...]
+    weights: Tuple[float, ...]
+
+
+@dataclass(frozen=True)
+class CallTemplate:
+    """One profile's payload for one prompt version, serialized once.
+
+    Only the voice (and any per-call extras such as joinTimeout) are filled in
+    per request, by splicing them in front of the pre-serialized remainder.
+    """
+    profile: str
+    experiment: Optional[str]
+    prompt_version: str
+    voice: Optional[str]
+    _tail: str = field(repr=False)
+
+    def voice_for(self, voice: Optional[str] = None) -> str:
+        """The profile's pinned voice, else the caller's, else CALL_VOICE"""
+        return self.voice or voice or CALL_VOICE
+
+    def body(self, voice: Optional[str] = None, **extra) -> str:
+        """JSON request body; ``extra`` keys must not already be in the template"""
+        overrides = {"voice": self.voice_for(voice), **extra}
+        return "{" + "".join(f"{json.dumps(k)}: {json.dumps(v)}, " for k, v in overrides.items()) + self._tail
+
+    def payload(self, voice: Optional[str] = None, **extra) -> Dict[str, Any]:
+        return json.loads(self.body(voice, **extra))
+
+
+def _profile_from_config(name: str, config: Dict[str, Any]) -> CallProfile:
+    if not isinstance(config, dict):
+        raise ValueError(f"Call profile {name!r} must be an object")
+    unknown = set(config) - PROFILE_FIELDS
+    if unknown:
+        raise ValueError(f"Call profile {name!r} has unknown fields: {', '.join(sorted(unknown))}")
+
+    voice = config.get("voice")
+    if voice is not None and (not isinstance(voice, str) or not voice):
+        raise ValueError(f"Call profile {name!r}: voice must be a non-empty string")
+    prompt = config.get("prompt")
+    if prompt is not None and not os.path.exists(prompt):
+        raise ValueError(f"Call profile {name!r}: prompt file {prompt!r} not found")
+    temperature = config.get("temperature", CALL_TEMPERATURE)
+    if isinstance(temperature, bool) or not isinstance(temperature, (int, float)) or not 0 <= temperature <= 1:
+        raise ValueError(f"Call profile {name!r}: temperature must be a number between 0 and 1")
+    model = config.get("model", CALL_MODEL)
+    if not isinstance(model, str) or not model:
+        raise ValueError(f"Call profile {name!r}: model must be a non-empty string")
+    tools = config.get("tools", [])
+    if not isinstance(tools, list) or not all(isinstance(tool, dict) and TOOL_KEYS & set(tool) for tool in tools):
+        raise ValueError(f"Call profile {name!r}: tools must be a list of objects with one of {sorted(TOOL_KEYS)}")
+
+    return CallProfile(name, voice, prompt, float(temperature), model, tuple(tools))
+
+
+def _experiment_from_config(name: str, config: Dict[str, Any], profiles: Dict[str, CallProfile]) -> Experiment:
+    variants = config.get("variants") if isinstance(config, dict) else None
+    if not isinstance(variants, dict) or not variants:
+        raise ValueError(f"Experiment {name!r} needs a non-empty variants object (profile -> weight)")
+    for profile, weight in variants.items():
+        if profile not in profiles:
+            raise ValueError(f"Experiment {name!r} references unknown call profile {profile!r}")
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+            raise ValueError(f"Experiment {name!r}: weight for {profile!r} must be a positive number")
+    return Experiment(name, tuple(variants), tuple(float(weight) for weight in variants.values()))
+
+
+class CallProfiles:
+    """Validated profiles and experiments, with templates cached per prompt version.
+
+    ``select(name)`` resolves a profile or experiment name (or the configured
+    default) to a profile; experiments pick a variant by weight. ``template``
+    returns the pre-serialized payload for the profile's current prompt
+    version, rebuilt only when that prompt changes.
+    """
+
+    def __init__(
+        self,
+        profiles: Dict[str, CallProfile],
+        experiments: Optional[Dict[str, Experiment]] = None,
+        default: str = DEFAULT_PROFILE,
+        prompt_registry: Optional[PromptRegistry] = None,
+    ):
+        self.profiles = profiles
+        self.experiments = experiments or {}
+        if default not in self.profiles and default not in self.experiments:
+            raise ValueError(f"Default call profile {default!r} is not a profile or experiment")
+        overlap = set(self.profiles) & set(self.experiments)
+        if overlap:
+            raise ValueError(f"Names used for both a profile and an experiment: {', '.join(sorted(overlap))}")
+        self.default = default
+
+        self._lock = threading.Lock()
+        self._prompts: Dict[Optional[str], PromptRegistry] = {None: prompt_registry or get_registry()}
+        for profile in self.profiles.values():
+            if profile.prompt and profile.prompt not in self._prompts:
+                self._prompts[profile.prompt] = PromptRegistry(profile.prompt)
+        self._templates: Dict[Tuple[str, Optional[str]], CallTemplate] = {}
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_PROFILES_PATH, prompt_registry: Optional[PromptRegistry] = None) -> "CallProfiles":
+        """Load and validate a profiles file; a missing file gives just the default profile"""
+        if not os.path.exists(path):
+            return cls({DEFAULT_PROFILE: CallProfile(DEFAULT_PROFILE)}, prompt_registry=prompt_registry)
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+
+        profiles = {name: _profile_from_config(name, value) for name, value in (config.get("profiles") or {}).items()}
+        profiles.setdefault(DEFAULT_PROFILE, CallProfile(DEFAULT_PROFILE))
+        experiments = {
+            name: _experiment_from_config(name, value, profiles)
+            for name, value in (config.get("experiments") or {}).items()
+        }
+        return cls(profiles, experiments, config.get("default", DEFAULT_PROFILE), prompt_registry)
+
+    def start_watching(self):
+        """Hot-reload every profile prompt file, like the shared prompt"""
+        for registry in self._prompts.values():
+            registry.start_watching()
+
+    def select(self, name: Optional[str] = None, variant: Optional[str] = None) -> Tuple[CallProfile, Optional[str]]:
+        """Resolve ``name`` to ``(profile, experiment)``.
+
+        For an experiment, ``variant`` keeps an earlier assignment if it is
+        still one of its variants; otherwise one is drawn by weight.
+        Raises KeyError for unknown names.
+        """
+        name = name or self.default
+        experiment = self.experiments.get(name)
+        if experiment is None:
+            return self.profiles[name], None
+        if variant not in experiment.variants:
+            variant = random.choices(experiment.variants, weights=experiment.weights)[0]
+        return self.profiles[variant], experiment.name
+
+    def prompt(self, profile: CallProfile) -> PromptVersion:
+        return self._prompts[profile.prompt].get()
+
+    def prompt_for(self, profile_name: Optional[str], version: Optional[str] = None) -> PromptVersion:
+        """Prompt behind a profile name (falling back to the shared prompt).
+
+        With ``version``, that earlier version if this process still has it,
+        else the current one.
+        """
+        profile = self.profiles.get(profile_name)
+        registry = self._prompts[profile.prompt if profile else None]
+        return (version and registry.get_version(version)) or registry.get()
+
+    def template(self, profile: CallProfile, experiment: Optional[str] = None) -> CallTemplate:
+        prompt = self.prompt(profile)
+        key = (profile.name, experiment)
+        template = self._templates.get(key)
+        if template is not None and template.prompt_version == prompt.version:
+            return template
+
+        metadata = {"promptVersion": prompt.version, "callProfile": profile.name}
+        if experiment:
+            metadata["experiment"] = experiment
+        payload = {
+            **{k: v for k, v in prompt.call_payload.items() if k != "voice"},
+            "temperature": profile.temperature,
+            "model": profile.model,
+            "metadata": metadata,
+        }
+        if profile.tools:
+            payload["selectedTools"] = list(profile.tools)
+
+        template = CallTemplate(profile.name, experiment, prompt.version, profile.voice, json.dumps(payload)[1:])
+        with self._lock:
+            self._templates[key] = template
+        return template
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "default": self.default,
+            "profiles": {
+                name: {
+                    "voice": profile.voice,
+                    "prompt": profile.prompt,
+                    "promptVersion": self.prompt(profile).version,
+                    "temperature": profile.temperature,
+                    "model": profile.model,
+                    "tools": [tool.get("toolName") or tool.get("toolId") or "temporaryTool" for tool in profile.tools],
+                }
+                for name, profile in self.profiles.items()
+            },
+            "experiments": {
+                name: dict(zip(experiment.variants, experiment.weights)) for name, experiment in self.experiments.items()
+            },
+        }
+
+
+def get_call_profiles(prompt_registry: Optional[PromptRegistry] = None) -> CallProfiles:
+    """Profiles loaded from CALL_PROFILES_PATH (default call_profiles.json)"""
+    return CallProfiles.from_file(os.getenv("CALL_PROFILES_PATH", DEFAULT_PROFILES_PATH), prompt_registry)
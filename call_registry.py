@@ -0,0 +1,345 @@
+"""Registry of live calls keyed by callId, with pluggable storage backends."""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from local_redis import WatchError
+
+
+@dataclass(frozen=True)
+class LiveCall:
+    call_id: str
+    started_at: float
+    voice: Optional[str] = None
+    prompt_version: Optional[str] = None
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self))
+
+    @classmethod
+    def from_json(cls, data: str) -> "LiveCall":
+        return cls(**json.loads(data))
+
+
+class MemoryBackend:
+    """Process-local dicts; fine for a single worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, LiveCall] = {}
+        self._ended: Dict[str, float] = {}
+        self._next_prune = 0.0
+
+    def add(self, call: LiveCall, tombstone_ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            if call.call_id in self._calls or self._ended.get(call.call_id, 0) > now:
+                return False
+            self._calls[call.call_id] = call
+            return True
+
+    def remove(self, call_id: str, tombstone_ttl: float) -> Optional[LiveCall]:
+        now = time.time()
+        with self._lock:
+            self._ended[call_id] = now + tombstone_ttl
+            if now >= self._next_prune:
+                self._ended = {k: v for k, v in self._ended.items() if v > now}
+                self._next_prune = now + 60
+            return self._calls.pop(call_id, None)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def get(self, call_id: str) -> Optional[LiveCall]:
+        with self._lock:
+            return self._calls.get(call_id)
+
+    def all(self) -> List[LiveCall]:
+        with self._lock:
+            return list(self._calls.values())
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # Only one process can see this backend
+        return True
+
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS live_calls (
+    call_id TEXT PRIMARY KEY,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ended_calls (
+    call_id TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ended_calls_expires ON ended_calls (expires_at);
+CREATE TABLE IF NOT EXISTS live_call_count (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    count INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO live_call_count (id, count) VALUES (1, 0);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SQLiteBackend:
+    """SQLite file shared by every worker process on one host.
+
+    The live count is kept in its own row, updated in the same transaction
+    as the call rows, so reading it is a single-row lookup. Writes take the
+    database write lock before their checks (BEGIN IMMEDIATE), so two
+    processes handling the same webhook can't both act on what they read.
+    """
+
+    def __init__(self, path: str = "calls.db"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+
+    @contextmanager
+    def _write(self):
+        # sqlite3 only opens a transaction at the first write; start it before the reads
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
+
+    def add(self, call: LiveCall, tombstone_ttl: float) -> bool:
+        with self._write():
+            ended = self._conn.execute(
+                "SELECT 1 FROM ended_calls WHERE call_id = ? AND expires_at > ?", (call.call_id, time.time())
+            ).fetchone()
+            if ended:
+                return False
+            added = self._conn.execute(
+                "INSERT OR IGNORE INTO live_calls (call_id, record) VALUES (?, ?)", (call.call_id, call.to_json())
+            ).rowcount
+            if added:
+                self._conn.execute("UPDATE live_call_count SET count = count + 1 WHERE id = 1")
+            return bool(added)
+
+    def remove(self, call_id: str, tombstone_ttl: float) -> Optional[LiveCall]:
+        now = time.time()
+        with self._write():
+            row = self._conn.execute("SELECT record FROM live_calls WHERE call_id = ?", (call_id,)).fetchone()
+            if row and self._conn.execute("DELETE FROM live_calls WHERE call_id = ?", (call_id,)).rowcount == 1:
+                self._conn.execute("UPDATE live_call_count SET count = count - 1 WHERE id = 1")
+            else:
+                row = None
+            self._conn.execute("DELETE FROM ended_calls WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ended_calls (call_id, expires_at) VALUES (?, ?)", (call_id, now + tombstone_ttl)
+            )
+        return LiveCall.from_json(row[0]) if row else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT count FROM live_call_count WHERE id = 1").fetchone()[0]
+
+    def get(self, call_id: str) -> Optional[LiveCall]:
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM live_calls WHERE call_id = ?", (call_id,)).fetchone()
+        return LiveCall.from_json(row[0]) if row else None
+
+    def all(self) -> List[LiveCall]:
+        with self._lock:
+            rows = self._conn.execute("SELECT record FROM live_calls").fetchall()
+        return [LiveCall.from_json(row[0]) for row in rows]
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self._write():
+            row = self._conn.execute("SELECT owner, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            self._conn.execute(
+                "INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)", (name, owner, now + ttl)
+            )
+            return True
+
+
+class RedisBackend:
+    """Redis hash of live calls plus expiring tombstone keys; shared across hosts.
+
+    ``client`` is a ``redis.Redis`` created with ``decode_responses=True``,
+    or a ``LocalRedis`` stand-in.
+    """
+
+    def __init__(self, client, prefix: str = "calls"):
+        self.client = client
+        self._live_key = f"{prefix}:live"
+        self._ended_prefix = f"{prefix}:ended:"
+        self._lease_prefix = f"{prefix}:lease:"
+
+    def add(self, call: LiveCall, tombstone_ttl: float) -> bool:
+        ended_key = self._ended_prefix + call.call_id
+        # WATCH the tombstone so an end landing between the check and the write aborts the write
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(ended_key)
+                if pipe.exists(ended_key):
+                    return False
+                pipe.multi()
+                pipe.hsetnx(self._live_key, call.call_id, call.to_json())
+                return bool(pipe.execute()[0])
+            except WatchError:
+                # The call ended meanwhile
+                return False
+
+    def remove(self, call_id: str, tombstone_ttl: float) -> Optional[LiveCall]:
+        # Tombstone first so a racing duplicate start can't re-add the call
+        self.client.set(self._ended_prefix + call_id, "1", ex=int(tombstone_ttl))
+        record = self.client.hget(self._live_key, call_id)
+        if record is None or not self.client.hdel(self._live_key, call_id):
+            return None
+        return LiveCall.from_json(record)
+
+    def count(self) -> int:
+        return self.client.hlen(self._live_key)
+
+    def get(self, call_id: str) -> Optional[LiveCall]:
+        record = self.client.hget(self._live_key, call_id)
+        return LiveCall.from_json(record) if record else None
+
+    def all(self) -> List[LiveCall]:
+        return [LiveCall.from_json(record) for record in self.client.hgetall(self._live_key).values()]
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        key = self._lease_prefix + name
+        if self.client.set(key, owner, ex=int(ttl), nx=True):
+            return True
+        if self.client.get(key) == owner:
+            # Renew our own lease
+            self.client.set(key, owner, ex=int(ttl))
+            return True
+        return False
+
+
+class CallRegistry:
+    """Live calls keyed by callId, driven by the call started/ended webhooks.
+
+    Starting a call that is already live, or that has already ended (an
+    out-of-order delivery), is ignored. Ending a call that isn't live is a
+    no-op. Ended calls are remembered for ``tombstone_ttl`` seconds for this.
+    Deliveries therefore can't make the count drift, and ``reconcile``
+    repairs anything missed entirely.
+    """
+
+    def __init__(self, backend, tombstone_ttl: float = 6 * 3600):
+        self.backend = backend
+        self.tombstone_ttl = tombstone_ttl
+        self._lock = threading.Lock()
+        self.duplicates = 0
+        self.reconciled_added = 0
+        self.reconciled_removed = 0
+
+    def started(self, call: LiveCall) -> bool:
+        """Register a live call. Returns False if it was a duplicate or already ended"""
+        if self.backend.add(call, self.tombstone_ttl):
+            return True
+        with self._lock:
+            self.duplicates += 1
+        return False
+
+    def ended(self, call_id: str) -> bool:
+        """Remove a live call. Returns False if it wasn't live"""
+        if self.backend.remove(call_id, self.tombstone_ttl) is not None:
+            return True
+        with self._lock:
+            self.duplicates += 1
+        return False
+
+    def count(self) -> int:
+        return self.backend.count()
+
+    def get(self, call_id: str) -> Optional[LiveCall]:
+        return self.backend.get(call_id)
+
+    def active(self) -> List[LiveCall]:
+        return self.backend.all()
+
+    def reconcile(self, live: Dict[str, LiveCall], is_ended: Callable[[str], bool], grace: float = 60) -> Tuple[int, int]:
+        """Bring the registry in line with upstream.
+
+        ``live`` holds the calls upstream reports as in progress; any we missed
+        are added. Registered calls absent from it and older than ``grace``
+        seconds are removed if ``is_ended(call_id)`` confirms they're over.
+        Returns ``(added, removed)``.
+        """
+        added = sum(1 for call in live.values() if self.backend.add(call, self.tombstone_ttl))
+
+        removed = 0
+        cutoff = time.time() - grace
+        for call in self.backend.all():
+            if call.call_id in live or call.started_at > cutoff:
+                continue
+            try:
+                if is_ended(call.call_id) and self.backend.remove(call.call_id, self.tombstone_ttl) is not None:
+                    removed += 1
+            except Exception as e:
+                print(f"Error checking call {call.call_id} during reconciliation: {str(e)}")
+
+        with self._lock:
+            self.reconciled_added += added
+            self.reconciled_removed += removed
+        return added, removed
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew a named lease, so periodic work runs on one worker at a time"""
+        return self.backend.acquire_lease(name, owner, ttl)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "live": self.count(),
+                "duplicates": self.duplicates,
+                "reconciled_added": self.reconciled_added,
+                "reconciled_removed": self.reconciled_removed,
+            }
+
+
+def create_backend(kind: str, path: str = "calls.db", redis_url: Optional[str] = None, prefix: str = "calls"):
+    """Build a registry backend: ``memory``, ``sqlite`` or ``redis``.
+
+    A redis URL of ``local://`` uses the in-process LocalRedis stand-in.
+    """
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(path)
+    if kind == "redis":
+        if not redis_url or redis_url.startswith("local://"):
+            from local_redis import get_local_redis
+            return RedisBackend(get_local_redis(), prefix)
+        import redis
+        return RedisBackend(redis.Redis.from_url(redis_url, decode_responses=True), prefix)
+    raise ValueError(f"Unknown call registry backend: {kind}")
+
+
+def get_call_registry() -> CallRegistry:
+    """Registry configured from CALL_REGISTRY_BACKEND, CALL_REGISTRY_PATH and REDIS_URL"""
+    backend = create_backend(
+        os.getenv("CALL_REGISTRY_BACKEND", "memory"),
+        path=os.getenv("CALL_REGISTRY_PATH", "calls.db"),
+        redis_url=os.getenv("REDIS_URL"),
+    )
+    return CallRegistry(backend, tombstone_ttl=float(os.getenv("CALL_TOMBSTONE_TTL", str(6 * 3600))))
@@ -1,22 +1,18 @@
 import requests 
 from dotenv import load_dotenv
 import os
+from call_profiles import get_call_profiles
 
 load_dotenv()
 
 api_key = os.getenv("ULTRAVOX_API_KEY")
 url = "https://api.ultravox.ai/api/calls"
 
-with open("prompt.txt", "r", encoding="utf-8") as f:
-    system_prompt = f.read()
+# CALL_PROFILE names a profile or experiment from call_profiles.json
+profiles = get_call_profiles()
+template = profiles.template(*profiles.select(os.getenv("CALL_PROFILE")))
 
-payload = {
-    "systemPrompt": system_prompt,
-    "temperature": 0.1,
-    "model": "fixie-ai/ultravox",
-    "voice": "Chinmay-English-Indian",
-    "medium": {"webRtc": {}}
-}
+payload = template.payload("Chinmay-English-Indian")
 
 headers = {
     "X-API-Key": api_key,
@@ -25,4 +21,5 @@ headers = {
 
 response = requests.request("POST", url, json=payload, headers=headers)
 data = response.json() 
-print(data["joinUrl"])
\ No newline at end of file
+print(data["joinUrl"])
+print(f"Profile: {template.profile}, prompt version: {template.prompt_version}")
\ No newline at end of file
@@ -0,0 +1,457 @@
+"""Shared, pooled HTTP client for outbound Ultravox and ElevenLabs requests."""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+ULTRAVOX_BASE_URL = "https://api.ultravox.ai/api"
+ELEVENLABS_BASE_URL = "https://api.elevenlabs.io/v1"
+
+# Status codes worth retrying; POSTs are only retried on connection errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "DELETE"])
+
+# Re-exported so callers don't need to import requests themselves
+RequestException = requests.RequestException
+
+# Breaker and metrics names per upstream host; other hosts are named by hostname
+UPSTREAM_NAMES = {"api.ultravox.ai": "ultravox", "api.elevenlabs.io": "elevenlabs"}
+
+HEDGING_ENABLED = os.getenv("HTTP_HEDGING", "true").lower() == "true"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to every request"""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def _build_adapter(pool_size):
+    """Create an adapter with its own connection pool, timeouts and retry policy"""
+    timeout = (
+        float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+        float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+    )
+    retry = Retry(
+        total=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+        backoff_factor=float(os.getenv("HTTP_RETRY_BACKOFF", "0.3")),
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=RETRY_METHODS,
+        raise_on_status=False,
+    )
+    return TimeoutHTTPAdapter(
+        timeout=timeout,
+        max_retries=retry,
+        pool_connections=1,
+        pool_maxsize=pool_size,
+        pool_block=False,
+    )
+
+
+def _build_session():
+    session = requests.Session()
+
+    # Per-host pools so a burst against one upstream can't starve the other
+    session.mount(
+        "https://api.ultravox.ai/",
+        _build_adapter(int(os.getenv("ULTRAVOX_POOL_SIZE", "20"))),
+    )
+    session.mount(
+        "https://api.elevenlabs.io/",
+        _build_adapter(int(os.getenv("ELEVENLABS_POOL_SIZE", "5"))),
+    )
+    # Fallback for any other host
+    session.mount("https://", _build_adapter(int(os.getenv("HTTP_POOL_SIZE", "10"))))
+    return session
+
+
+def get_session():
+    """Return the process-wide session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+class CircuitOpenError(RequestException):
+    """Upstream's circuit breaker is open; the request was not sent"""
+
+
+class CircuitBreaker:
+    """Per-upstream breaker over the last ``window`` requests.
+
+    Trips open once at least ``min_requests`` were seen and the share of
+    failures (connection errors, timeouts, 429 and 5xx) reaches
+    ``failure_threshold``, or the share slower than ``slow_call_seconds``
+    reaches ``slow_threshold``. While open, requests fail fast with
+    CircuitOpenError. After ``open_seconds`` it goes half-open and lets
+    ``half_open_probes`` requests through: a success closes it, a failure
+    re-opens it. A probe that ends without an outcome (cancelled) gives its
+    slot back, and probes still unanswered after another ``open_seconds``
+    are written off so the breaker can't stay half-open for good. Also
+    tracks latency and hedging for the metrics endpoint.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name,
+        window=20,
+        min_requests=10,
+        failure_threshold=0.5,
+        slow_call_seconds=5.0,
+        slow_threshold=0.8,
+        open_seconds=30.0,
+        half_open_probes=1,
+    ):
+        self.name = name
+        self.min_requests = min_requests
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_threshold = slow_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._latencies = deque(maxlen=200)
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_at = 0.0
+        self._probes = 0
+
+        self.requests = 0
+        self.failures = 0
+        self.slow = 0
+        self.rejected = 0
+        self.opened = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def before(self):
+        """Raise CircuitOpenError unless a request may go out now"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._half_open_at = now
+                self._probes = 0
+            elif self.state == self.HALF_OPEN and now - self._half_open_at >= self.open_seconds:
+                # The probes never reported back; start a fresh round
+                self._half_open_at = now
+                self._probes = 0
+            if self.state == self.CLOSED:
+                return
+            if self.state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return
+            self.rejected += 1
+        raise CircuitOpenError(f"Circuit breaker for {self.name} is open")
+
+    def record(self, failed, elapsed):
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            self.requests += 1
+            self.failures += int(failed)
+            self.slow += int(slow)
+            self._latencies.append(elapsed)
+
+            if self.state == self.HALF_OPEN:
+                if failed or slow:
+                    self._trip()
+                else:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                    print(f"Circuit breaker for {self.name} closed")
+                return
+            if self.state == self.OPEN:
+                # A request sent before the breaker opened
+                return
+
+            self._outcomes.append((failed, slow))
+            count = len(self._outcomes)
+            if count < self.min_requests:
+                return
+            if (
+                sum(1 for f, _ in self._outcomes if f) / count >= self.failure_threshold
+                or sum(1 for _, s in self._outcomes if s) / count >= self.slow_threshold
+            ):
+                self._trip()
+
+    def release(self):
+        """A request ended without an outcome: hand back its half-open probe slot"""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _trip(self):
+        # Caller holds the lock
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+        print(f"Circuit breaker for {self.name} opened")
+
+    def latency(self, quantile):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        return latencies[min(len(latencies) - 1, int(quantile * len(latencies)))]
+
+    def hedge_delay(self, default):
+        """Wait this long for the first attempt before hedging: the observed p95, once known"""
+        with self._lock:
+            known = len(self._latencies) >= 20
+        return max(float(os.getenv("HTTP_HEDGE_MIN_DELAY", "0.1")), self.latency(0.95)) if known else default
+
+    def allow_hedge(self, budget):
+        """Hedge only while closed, and for at most ``budget`` of requests"""
+        with self._lock:
+            if self.state != self.CLOSED or self.hedges >= budget * max(self.requests, 1):
+                return False
+            self.hedges += 1
+            return True
+
+    def hedge_won(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def snapshot(self):
+        p50, p95 = self.latency(0.5), self.latency(0.95)
+        with self._lock:
+            return {
+                "state": self.state,
+                "requests": self.requests,
+                "failures": self.failures,
+                "slow": self.slow,
+                "rejected": self.rejected,
+                "opened": self.opened,
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "p50_ms": round(p50 * 1000) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000) if p95 is not None else None,
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_hedge_executor = None
+_async_client = None
+
+
+def get_breaker(url):
+    """Circuit breaker for the upstream a URL points at"""
+    host = urlsplit(url).hostname or ""
+    name = UPSTREAM_NAMES.get(host, host)
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                window=int(os.getenv("BREAKER_WINDOW", "20")),
+                min_requests=int(os.getenv("BREAKER_MIN_REQUESTS", "10")),
+                failure_threshold=float(os.getenv("BREAKER_FAILURE_THRESHOLD", "0.5")),
+                slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", "5")),
+                slow_threshold=float(os.getenv("BREAKER_SLOW_THRESHOLD", "0.8")),
+                open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", "30")),
+                half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1")),
+            )
+        return breaker
+
+
+def _get_hedge_executor():
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _breakers_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("HTTP_HEDGE_WORKERS", "32")), thread_name_prefix="http-hedge"
+                )
+    return _hedge_executor
+
+
+def _send(breaker, method, url, **kwargs):
+    start = time.monotonic()
+    try:
+        response = get_session().request(method, url, **kwargs)
+    except RequestException:
+        breaker.record(True, time.monotonic() - start)
+        raise
+    except BaseException:
+        # Not an upstream failure, but don't keep a half-open probe slot
+        breaker.release()
+        raise
+    breaker.record(response.status_code == 429 or response.status_code >= 500, time.monotonic() - start)
+    return response
+
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _hedged_send(breaker, method, url, **kwargs):
+    """Send, and if no reply within the hedge delay send a duplicate; the first reply wins"""
+    executor = _get_hedge_executor()
+    first = executor.submit(_send, breaker, method, url, **kwargs)
+    done, _ = wait([first], timeout=breaker.hedge_delay(float(os.getenv("HTTP_HEDGE_DELAY", "1"))))
+    if done or not breaker.allow_hedge(float(os.getenv("HTTP_HEDGE_BUDGET", "0.1"))):
+        return first.result()
+
+    second = executor.submit(_send, breaker, method, url, **kwargs)
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            if future is second:
+                breaker.hedge_won()
+            # Release the loser's connection once it finishes
+            for loser in pending:
+                loser.add_done_callback(_close_response)
+            return future.result()
+    raise error
+
+
+def request(method, url, hedge=False, **kwargs):
+    """Drop-in replacement for requests.request using the pooled session.
+
+    Fails fast with CircuitOpenError while the upstream's breaker is open.
+    ``hedge=True`` (GETs only, so the duplicate is harmless) sends a second
+    attempt if the first is slower than the upstream's recent p95.
+    """
+    breaker = get_breaker(url)
+    breaker.before()
+    if hedge and HEDGING_ENABLED and method.upper() == "GET":
+        return _hedged_send(breaker, method, url, **kwargs)
+    return _send(breaker, method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def _build_async_client():
+    # httpx is only needed for the async serving mode (asgi.py)
+    import httpx
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+            connect=float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05")),
+        ),
+        limits=httpx.Limits(max_connections=int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "200"))),
+        transport=httpx.AsyncHTTPTransport(retries=int(os.getenv("HTTP_MAX_RETRIES", "3"))),
+    )
+
+
+def get_async_client():
+    """Process-wide httpx.AsyncClient, for use from a single event loop"""
+    global _async_client
+    if _async_client is None:
+        _async_client = _build_async_client()
+    return _async_client
+
+
+async def aclose():
+    """Close the async client (on event loop shutdown)"""
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.aclose()
+
+
+async def _asend(breaker, method, url, **kwargs):
+    start = time.monotonic()
+    try:
+        response = await get_async_client().request(method, url, **kwargs)
+    except Exception:
+        breaker.record(True, time.monotonic() - start)
+        raise
+    except BaseException:
+        # Cancelled (client went away, or the losing hedge): no outcome to record
+        breaker.release()
+        raise
+    breaker.record(response.status_code == 429 or response.status_code >= 500, time.monotonic() - start)
+    return response
+
+
+async def _ahedged_send(breaker, method, url, **kwargs):
+    first = asyncio.ensure_future(_asend(breaker, method, url, **kwargs))
+    done, _ = await asyncio.wait([first], timeout=breaker.hedge_delay(float(os.getenv("HTTP_HEDGE_DELAY", "1"))))
+    if done or not breaker.allow_hedge(float(os.getenv("HTTP_HEDGE_BUDGET", "0.1"))):
+        return await first
+
+    second = asyncio.ensure_future(_asend(breaker, method, url, **kwargs))
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() is not None:
+                error = task.exception()
+                continue
+            if task is second:
+                breaker.hedge_won()
+            for loser in pending:
+                loser.cancel()
+            return task.result()
+    raise error
+
+
+async def arequest(method, url, hedge=False, **kwargs):
+    """``request`` for the event loop, on httpx with the same per-upstream breakers.
+
+    Takes the requests-style ``data``/``json``/``params``/``headers`` arguments
+    used in this app; the response has ``status_code``, ``text`` and ``json()``.
+    """
+    breaker = get_breaker(url)
+    breaker.before()
+    if isinstance(kwargs.get("data"), (bytes, str)):
+        kwargs["content"] = kwargs.pop("data")
+    if hedge and HEDGING_ENABLED and method.upper() == "GET":
+        return await _ahedged_send(breaker, method, url, **kwargs)
+    return await _asend(breaker, method, url, **kwargs)
+
+
+async def aget(url, **kwargs):
+    return await arequest("GET", url, **kwargs)
+
+
+async def apost(url, **kwargs):
+    return await arequest("POST", url, **kwargs)
+
+
+def metrics():
+    """Breaker state, request counts, latency and hedging per upstream"""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
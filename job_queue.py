@@ -0,0 +1,266 @@
+"""Durable SQLite-backed job queue with visibility timeouts and a dead-letter area."""
+import json
+import itertools
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    job_key TEXT,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    claimed_by TEXT,
+    claimed_until REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_key ON jobs (queue, job_key);
+CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (queue, status, available_at);
+"""
+
+
+@dataclass(frozen=True)
+class Job:
+    id: int
+    args: List[Any]
+    attempt: int
+    # Claim token; only its holder can ack, retry or dead-letter the job
+    claimed_by: str
+
+
+class JobQueue:
+    """A named queue stored in a SQLite file.
+
+    ``put`` commits the job before returning, so anything acknowledged to a
+    webhook survives a restart. A claimed job that isn't acked before its
+    visibility timeout expires becomes claimable again. Claims held by a
+    process on this host that has since died are released right away by
+    ``release_stale_claims``. Each claim gets its own token, so a worker whose
+    claim expired and was taken over can no longer ack or release the job.
+    """
+
+    def __init__(self, name: str, path: str = "jobs.db", max_pending: int = 1000, visibility_timeout: float = 120.0):
+        self.name = name
+        self.path = path
+        self.max_pending = max_pending
+        self.visibility_timeout = visibility_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._claims = itertools.count(1)
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def put(self, args, key: Optional[str] = None, delay: float = 0) -> bool:
+        """Durably enqueue a job. Returns False if the queue is full.
+
+        A job with a ``key`` that was already enqueued is ignored, so
+        duplicate webhook deliveries don't create duplicate work.
+        """
+        now = time.time()
+        with self._cond:
+            (pending,) = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status IN (?, ?)",
+                (self.name, PENDING, CLAIMED),
+            ).fetchone()
+            if pending >= self.max_pending:
+                return False
+            self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (queue, job_key, args, status, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.name, key, json.dumps(list(args)), PENDING, now + delay, now, now),
+            )
+            self._cond.notify()
+        return True
+
+    def put_done(self, args, key: Optional[str] = None, note: str = "") -> bool:
+        """Record a job that was handled without running (e.g. the queue was full), so ``get`` can report it.
+
+        The row is written as done with no attempts and ``note`` as its
+        error, and doesn't count against ``max_pending``. Returns False if
+        a job with ``key`` already exists.
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (queue, job_key, args, status, available_at, last_error, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.name, key, json.dumps(list(args)), DONE, now, note, now, now),
+            )
+        return cursor.rowcount > 0
+
+    def claim(self) -> Optional[Job]:
+        """Claim the next due job, or return None if nothing is ready"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, args, attempts FROM jobs WHERE queue = ? AND ("
+                    "(status = ? AND available_at <= ?) OR (status = ? AND claimed_until <= ?)"
+                    ") ORDER BY available_at LIMIT 1",
+                    (self.name, PENDING, now, CLAIMED, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job_id, args, attempts = row
+                claimed_by = f"{self.owner}:{next(self._claims)}"
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = ?, claimed_by = ?, claimed_until = ?, updated_at = ? WHERE id = ?",
+                    (CLAIMED, attempts + 1, claimed_by, now + self.visibility_timeout, now, job_id),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Job(id=job_id, args=json.loads(args), attempt=attempts + 1, claimed_by=claimed_by)
+
+    def ack(self, job: Job) -> bool:
+        """Mark a claimed job as done. Returns False if the claim was lost"""
+        return self._update(job, DONE)
+
+    def retry(self, job: Job, delay: float, error: str = "") -> bool:
+        """Release a claimed job to be retried after ``delay`` seconds. Returns False if the claim was lost"""
+        return self._update(job, PENDING, available_at=time.time() + delay, error=error)
+
+    def dead_letter(self, job: Job, error: str = "") -> bool:
+        """Move a claimed job to the dead-letter area. Returns False if the claim was lost"""
+        return self._update(job, DEAD, error=error)
+
+    def release_stale_claims(self) -> int:
+        """Make jobs claimed by dead processes on this host claimable now.
+
+        Claims from other hosts can't be checked and wait out the visibility timeout.
+        """
+        with self._lock:
+            owners = [row[0] for row in self._conn.execute(
+                "SELECT DISTINCT claimed_by FROM jobs WHERE queue = ? AND status = ?", (self.name, CLAIMED),
+            ).fetchall()]
+        stale = [owner for owner in owners if owner and _is_dead_owner(owner, self.owner)]
+        if not stale:
+            return 0
+        now = time.time()
+        released = 0
+        with self._cond:
+            for owner in stale:
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = ?, available_at = ?, claimed_by = NULL, claimed_until = NULL, updated_at = ? "
+                    "WHERE queue = ? AND status = ? AND claimed_by = ?",
+                    (PENDING, now, now, self.name, CLAIMED, owner),
+                )
+                released += cursor.rowcount
+            self._cond.notify_all()
+        return released
+
+    def requeue_dead(self) -> int:
+        """Move every dead-lettered job back to pending with a fresh attempt budget"""
+        now = time.time()
+        with self._cond:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, available_at = ?, updated_at = ? WHERE queue = ? AND status = ?",
+                (PENDING, now, now, self.name, DEAD),
+            )
+            self._cond.notify_all()
+        return cursor.rowcount
+
+    def dead_letters(self, limit: int = 100):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, job_key, args, attempts, last_error, updated_at FROM jobs "
+                "WHERE queue = ? AND status = ? ORDER BY updated_at DESC LIMIT ?",
+                (self.name, DEAD, limit),
+            ).fetchall()
+        return [
+            {"id": r[0], "key": r[1], "args": json.loads(r[2]), "attempts": r[3], "error": r[4], "updated_at": r[5]}
+            for r in rows
+        ]
+
+    def get(self, key: str) -> Optional[dict]:
+        """Current state of the job enqueued with ``key``, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, attempts, last_error, updated_at FROM jobs WHERE queue = ? AND job_key = ?",
+                (self.name, key),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "status": row[1], "attempts": row[2], "error": row[3], "updated_at": row[4]}
+
+    def wait(self, timeout: float):
+        """Block until a job may have been enqueued in this process, or timeout"""
+        with self._cond:
+            self._cond.wait(timeout)
+
+    def stats(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (self.name,)
+            ).fetchall()
+        counts = {PENDING: 0, CLAIMED: 0, DONE: 0, DEAD: 0}
+        counts.update(dict(rows))
+        return counts
+
+    def purge_done(self, older_than: float = 7 * 24 * 3600) -> int:
+        """Delete completed jobs older than ``older_than`` seconds"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE queue = ? AND status = ? AND updated_at < ?",
+                (self.name, DONE, time.time() - older_than),
+            )
+        return cursor.rowcount
+
+    def _update(self, job: Job, status: str, available_at: Optional[float] = None, error: Optional[str] = None) -> bool:
+        now = time.time()
+        with self._cond:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, available_at = COALESCE(?, available_at), "
+                "last_error = COALESCE(?, last_error), claimed_by = NULL, claimed_until = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND claimed_by = ?",
+                (status, available_at, error, now, job.id, CLAIMED, job.claimed_by),
+            )
+            if status == PENDING:
+                self._cond.notify()
+        return cursor.rowcount > 0
+
+
+def _is_dead_owner(claimed_by: str, owner: str) -> bool:
+    # claimed_by is "host:pid:instance:n"; only processes on this host can be checked
+    parts = claimed_by.rsplit(":", 3)
+    if len(parts) != 4 or not parts[1].isdigit() or parts[0] != owner.rsplit(":", 2)[0]:
+        return False
+    if ":".join(parts[:3]) == owner:
+        return False
+    pid = int(parts[1])
+    if pid == os.getpid():
+        # Same pid as ours but another instance: a previous run (e.g. pid 1 in a restarted container)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
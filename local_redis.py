@@ -0,0 +1,239 @@
+"""In-process stand-in for the small subset of Redis commands this app uses."""
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+try:
+    # Raise the real exception when redis is installed, so callers catch one type either way
+    from redis.exceptions import WatchError
+except ImportError:
+    class WatchError(Exception):
+        """A watched key changed before EXEC; the transaction was discarded"""
+
+
+class LocalRedis:
+    """Thread-safe, single-process imitation of a ``redis.Redis(decode_responses=True)`` client.
+
+    Only implements the commands our Redis-backed components call, with the
+    same return values, so they can run (and be tested) without a server.
+    State is per process: use a real Redis for anything multi-process.
+    """
+
+    def __init__(self):
+        # Re-entrant so a pipeline can run its queued commands under one hold
+        self._lock = threading.RLock()
+        # Write counter per key, for WATCH
+        self._versions: Dict[str, int] = {}
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._strings: Dict[str, Tuple[str, Optional[float]]] = {}
+        self._subscribers: Dict[str, Set["LocalPubSub"]] = {}
+
+    def _live_string(self, name: str) -> Optional[str]:
+        entry = self._strings.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._strings[name]
+            return None
+        return value
+
+    def _touch(self, name: str):
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    # Strings
+
+    def get(self, name: str) -> Optional[str]:
+        with self._lock:
+            return self._live_string(name)
+
+    def set(self, name: str, value, ex: Optional[float] = None, nx: bool = False) -> Optional[bool]:
+        with self._lock:
+            if nx and self._live_string(name) is not None:
+                return None
+            self._strings[name] = (str(value), time.time() + ex if ex else None)
+            self._touch(name)
+            return True
+
+    def incrby(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            value = int(self._live_string(name) or 0) + amount
+            self._strings[name] = (str(value), None)
+            self._touch(name)
+            return value
+
+    def exists(self, *names: str) -> int:
+        with self._lock:
+            return sum(1 for name in names if self._live_string(name) is not None or name in self._hashes)
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            removed = 0
+            for name in names:
+                removed += int(self._strings.pop(name, None) is not None)
+                removed += int(self._hashes.pop(name, None) is not None)
+                self._touch(name)
+            return removed
+
+    # Hashes
+
+    def hsetnx(self, name: str, key: str, value) -> int:
+        with self._lock:
+            fields = self._hashes.setdefault(name, {})
+            if key in fields:
+                return 0
+            fields[key] = str(value)
+            self._touch(name)
+            return 1
+
+    def hset(self, name: str, key: str, value) -> int:
+        with self._lock:
+            fields = self._hashes.setdefault(name, {})
+            added = int(key not in fields)
+            fields[key] = str(value)
+            self._touch(name)
+            return added
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self._lock:
+            return self._hashes.get(name, {}).get(key)
+
+    def hdel(self, name: str, *keys: str) -> int:
+        with self._lock:
+            fields = self._hashes.get(name, {})
+            removed = sum(1 for key in keys if fields.pop(key, None) is not None)
+            if name in self._hashes and not fields:
+                del self._hashes[name]
+            if removed:
+                self._touch(name)
+            return removed
+
+    def hlen(self, name: str) -> int:
+        with self._lock:
+            return len(self._hashes.get(name, {}))
+
+    def hgetall(self, name: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._hashes.get(name, {}))
+
+    # Transactions
+
+    def pipeline(self, transaction: bool = True) -> "LocalPipeline":
+        return LocalPipeline(self)
+
+    # Pub/sub
+
+    def publish(self, channel: str, message) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber._deliver(channel, message)
+        return len(subscribers)
+
+    def pubsub(self) -> "LocalPubSub":
+        return LocalPubSub(self)
+
+    def ping(self) -> bool:
+        return True
+
+
+class LocalPipeline:
+    """Handle returned by ``LocalRedis.pipeline()``, with redis-py's WATCH/MULTI/EXEC semantics.
+
+    After ``watch`` commands run immediately; after ``multi`` they are queued
+    and ``execute`` runs them atomically, raising WatchError instead if a
+    watched key was written in between.
+    """
+
+    def __init__(self, client: LocalRedis):
+        self.client = client
+        self._watched: Dict[str, int] = {}
+        self._immediate = False
+        self._commands: List[Tuple[str, tuple, dict]] = []
+
+    def __enter__(self) -> "LocalPipeline":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.reset()
+
+    def watch(self, *names: str):
+        with self.client._lock:
+            for name in names:
+                self._watched[name] = self.client._versions.get(name, 0)
+        self._immediate = True
+
+    def unwatch(self):
+        self._watched = {}
+
+    def multi(self):
+        self._immediate = False
+
+    def execute(self) -> List[Any]:
+        commands, watched = self._commands, self._watched
+        self.reset()
+        with self.client._lock:
+            if any(self.client._versions.get(name, 0) != version for name, version in watched.items()):
+                raise WatchError("Watched variable changed.")
+            return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+    def reset(self):
+        self._watched = {}
+        self._immediate = False
+        self._commands = []
+
+    def __getattr__(self, name: str):
+        command = getattr(self.client, name)
+
+        def call(*args, **kwargs):
+            if self._immediate:
+                return command(*args, **kwargs)
+            self._commands.append((name, args, kwargs))
+            return self
+
+        return call
+
+
+class LocalPubSub:
+    """Subscription handle returned by ``LocalRedis.pubsub()``"""
+
+    def __init__(self, client: LocalRedis):
+        self.client = client
+        self._messages: "queue.Queue" = queue.Queue()
+
+    def subscribe(self, *channels: str):
+        with self.client._lock:
+            for channel in channels:
+                self.client._subscribers.setdefault(channel, set()).add(self)
+
+    def unsubscribe(self, *channels: str):
+        with self.client._lock:
+            for channel in channels or list(self.client._subscribers):
+                self.client._subscribers.get(channel, set()).discard(self)
+
+    def _deliver(self, channel: str, message):
+        self._messages.put({"type": "message", "channel": channel, "data": message})
+
+    def get_message(self, timeout: float = 0) -> Optional[dict]:
+        try:
+            return self._messages.get(timeout=timeout) if timeout else self._messages.get_nowait()
+        except queue.Empty:
+            return None
+
+    def listen(self):
+        while True:
+            yield self._messages.get()
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_local_redis() -> LocalRedis:
+    """Process-wide LocalRedis, so every ``local://`` user sees the same data"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = LocalRedis()
+        return _shared
@@ -0,0 +1,55 @@
+"""Inspect and maintain the durable job queues in jobs.db.
+
+    python manage_jobs.py stats
+    python manage_jobs.py dead transcripts
+    python manage_jobs.py requeue transcripts
+    python manage_jobs.py purge --days 7
+
+Safe to run while the app is up; changes are picked up by its workers.
+"""
+import argparse
+import json
+import os
+
+from dotenv import load_dotenv
+
+from job_queue import JobQueue
+
+QUEUES = ["transcripts", "analysis", "feedback"]
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Inspect and maintain the background job queues.')
+    parser.add_argument('--path', type=str, default=os.getenv("JOB_QUEUE_PATH", "jobs.db"), help='Job queue database (default: JOB_QUEUE_PATH or jobs.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats', help='Job counts by status for every queue')
+    dead = commands.add_parser('dead', help='List dead-lettered jobs')
+    dead.add_argument('queue', choices=QUEUES)
+    dead.add_argument('--limit', type=int, default=100, help='Most recent jobs to show (default: 100)')
+    requeue = commands.add_parser('requeue', help='Move dead-lettered jobs back to pending with a fresh attempt budget')
+    requeue.add_argument('queue', choices=QUEUES)
+    purge = commands.add_parser('purge', help='Delete completed jobs')
+    purge.add_argument('--queue', choices=QUEUES, help='Only this queue (default: all)')
+    purge.add_argument('--days', type=float, default=float(os.getenv("JOB_RETENTION_DAYS", "7")), help='Keep jobs completed in the last N days')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"Error: job queue database '{args.path}' not found")
+        return
+
+    if args.command == 'stats':
+        for name in QUEUES:
+            print(f"{name}: {JobQueue(name, path=args.path).stats()}")
+    elif args.command == 'dead':
+        for job in JobQueue(args.queue, path=args.path).dead_letters(args.limit):
+            print(json.dumps(job))
+    elif args.command == 'requeue':
+        print(f"Requeued {JobQueue(args.queue, path=args.path).requeue_dead()} job(s) from {args.queue}")
+    elif args.command == 'purge':
+        for name in [args.queue] if args.queue else QUEUES:
+            print(f"Purged {JobQueue(name, path=args.path).purge_done(args.days * 24 * 3600)} completed job(s) from {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""In-memory, hot-reloading registry for the agent system prompt."""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+DEFAULT_PROMPT_PATH = "prompt.txt"
+DEFAULT_PROMPT = "You are a helpful AI assistant."
+# Earlier prompt versions kept in memory, so recent calls can be analyzed against the prompt they ran with
+PROMPT_HISTORY_SIZE = 20
+
+# Defaults for the Ultravox create-call payload
+CALL_TEMPERATURE = 0.1
+CALL_MODEL = "fixie-ai/ultravox"
+CALL_VOICE = "87edb04c-06d4-47c2-bd94-683bc47e8fbe"
+
+
+def build_call_payload(system_prompt: str, version: str) -> Dict[str, Any]:
+    """Build the create-call payload for a prompt version"""
+    return {
+        "systemPrompt": system_prompt,
+        "temperature": CALL_TEMPERATURE,
+        "model": CALL_MODEL,
+        "voice": CALL_VOICE,
+        "medium": {"webRtc": {}},
+        "metadata": {"promptVersion": version},
+    }
+
+
+@dataclass(frozen=True)
+class PromptVersion:
+    text: str
+    version: str
+    mtime: Optional[float]
+    loaded_at: float
+    call_payload: Dict[str, Any] = field(repr=False)
+
+
+def _hash_prompt(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+class PromptRegistry:
+    """Loads the prompt once and swaps in a new version when the file changes.
+
+    Readers only dereference ``self._current``, so the request path does no
+    file I/O; a daemon thread polls the file's mtime in the background.
+    The last few versions seen by this process can be looked up by version.
+    """
+
+    def __init__(self, path: str = DEFAULT_PROMPT_PATH, poll_interval: Optional[float] = None):
+        self.path = path
+        if poll_interval is None:
+            poll_interval = float(os.getenv("PROMPT_POLL_INTERVAL", "2"))
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._current = self._load()
+        self._history: "OrderedDict[str, PromptVersion]" = OrderedDict([(self._current.version, self._current)])
+
+    def _load(self) -> PromptVersion:
+        try:
+            mtime = os.path.getmtime(self.path)
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            print(f"Warning: {self.path} not found, using default prompt")
+            mtime = None
+            text = DEFAULT_PROMPT
+
+        version = _hash_prompt(text)
+        return PromptVersion(
+            text=text,
+            version=version,
+            mtime=mtime,
+            loaded_at=time.time(),
+            call_payload=build_call_payload(text, version),
+        )
+
+    def get(self) -> PromptVersion:
+        """Return the current prompt version"""
+        return self._current
+
+    def get_version(self, version: Optional[str]) -> Optional[PromptVersion]:
+        """A prompt version seen by this process, or None if unknown (e.g. from before a restart)"""
+        with self._lock:
+            return self._history.get(version)
+
+    def refresh(self) -> bool:
+        """Reload the prompt if the file changed. Returns True if a new version was swapped in"""
+        with self._lock:
+            try:
+                mtime = os.path.getmtime(self.path)
+            except FileNotFoundError:
+                mtime = None
+            if mtime == self._current.mtime:
+                return False
+
+            new = self._load()
+            if new.version == self._current.version:
+                # Touched but unchanged; remember the mtime so we stop re-reading
+                self._current = new
+                return False
+
+            old_version = self._current.version
+            self._current = new
+            self._history[new.version] = new
+            self._history.move_to_end(new.version)
+            while len(self._history) > PROMPT_HISTORY_SIZE:
+                self._history.popitem(last=False)
+            print(f"Prompt reloaded: {old_version} -> {new.version}")
+            return True
+
+    def start_watching(self):
+        """Start the background mtime poller (idempotent)"""
+        if self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, name="prompt-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error reloading prompt: {str(e)}")
+
+
+_default_registry = None
+_default_registry_lock = threading.Lock()
+
+
+def get_registry(path: str = DEFAULT_PROMPT_PATH) -> PromptRegistry:
+    """Return the shared registry for the default prompt file"""
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = PromptRegistry(path)
+    return _default_registry
@@ -0,0 +1,91 @@
+"""Socket.IO client managers that let several app workers serve one set of clients."""
+import asyncio
+import threading
+import time
+
+import socketio
+
+from local_redis import get_local_redis
+
+
+class LocalRedisManager(socketio.PubSubManager):
+    """PubSubManager over LocalRedis pub/sub.
+
+    Fans out between Socket.IO servers in the same process, which is enough
+    to exercise multi-worker behaviour in tests and development without a
+    Redis server.
+    """
+
+    name = "local-redis"
+
+    def __init__(self, client=None, channel: str = "flask-socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.redis = client or get_local_redis()
+
+    def _publish(self, data):
+        return self.redis.publish(self.channel, self.json.dumps(data))
+
+    def _listen(self):
+        pubsub = self.redis.pubsub()
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            if message["channel"] == self.channel and message["type"] == "message":
+                yield message["data"]
+
+
+def socketio_options(message_queue: str = None, channel: str = "flask-socketio") -> dict:
+    """Extra SocketIO() arguments for a message queue URL.
+
+    No URL keeps the default in-process manager (single worker). ``local://``
+    uses LocalRedisManager; anything else (``redis://``, ``amqp://``, ...) is
+    handed to Flask-SocketIO's own message queue support.
+    """
+    if not message_queue:
+        return {}
+    if message_queue.startswith("local://"):
+        return {"client_manager": LocalRedisManager(channel=channel)}
+    return {"message_queue": message_queue, "channel": channel}
+
+
+def async_socketio_options(message_queue: str = None, channel: str = "flask-socketio") -> dict:
+    """``socketio.AsyncServer()`` arguments for the same message queue URL (asgi.py).
+
+    ``local://`` only ever fans out within one process, which a single
+    AsyncServer already covers, so it keeps the default manager.
+    """
+    if not message_queue or message_queue.startswith("local://"):
+        return {}
+    if message_queue.startswith(("redis://", "rediss://")):
+        return {"client_manager": socketio.AsyncRedisManager(message_queue, channel=channel)}
+    return {"client_manager": socketio.AsyncAioPikaManager(message_queue, channel=channel)}
+
+
+class AsyncServerEmitter:
+    """The part of the Flask-SocketIO API that CoalescingBroadcaster uses, backed by an AsyncServer.
+
+    ``emit`` may be called from the server's event loop or from any worker
+    thread; either way the emit runs on the loop.
+    """
+
+    def __init__(self, server: socketio.AsyncServer, loop: asyncio.AbstractEventLoop):
+        self.server = server
+        self.loop = loop
+
+    def emit(self, event, data=None, to=None, **kwargs):
+        coroutine = self.server.emit(event, data, to=to, **kwargs)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            self.loop.create_task(coroutine)
+        else:
+            asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def start_background_task(self, target, *args, **kwargs):
+        thread = threading.Thread(target=target, args=args, kwargs=kwargs, daemon=True)
+        thread.start()
+        return thread
+
+    def sleep(self, seconds=0):
+        time.sleep(seconds)
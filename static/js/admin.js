@@ -20,16 +20,102 @@ document.addEventListener('DOMContentLoaded', () => {
     const recordingTime = document.getElementById('recording-time');
     const audioPreview = document.getElementById('audio-preview');
     
-    // Setup Socket.IO connection for real-time updates
-    const socket = io();
+    // Socket.IO connection for real-time updates, only opened in admin mode
+    let socket = null;
+    let liveCalls = {};
     
-    // Listen for call count updates from the server
-    socket.on('call_count_update', (data) => {
+    function setCallCount(count) {
         const ongoingCallsCount = document.getElementById('ongoing-calls-count');
         if (ongoingCallsCount) {
-            ongoingCallsCount.textContent = data.count;
+            ongoingCallsCount.textContent = count;
         }
-    });
+    }
+    
+    function renderLiveCalls() {
+        const list = document.getElementById('live-calls');
+        if (!list) {
+            return;
+        }
+        list.innerHTML = '';
+        Object.entries(liveCalls).forEach(([callId, call]) => {
+            const item = document.createElement('li');
+            const details = [call.voice, call.promptVersion && `prompt ${call.promptVersion}`].filter(Boolean).join(', ');
+            item.textContent = details ? `${callId} (${details})` : callId;
+            list.appendChild(item);
+        });
+    }
+    
+    function connectAdminSocket(password) {
+        if (socket) {
+            return;
+        }
+        // The server only admits sockets carrying the admin password
+        socket = io({ auth: { password }, transports: window.SOCKETIO_TRANSPORTS || ['polling', 'websocket'] });
+        
+        // Full state on (re)connect, then coalesced updates
+        socket.on('call_state_snapshot', (data) => {
+            setCallCount(data.count);
+            liveCalls = data.calls || {};
+            renderLiveCalls();
+        });
+        
+        socket.on('call_count_update', (data) => {
+            setCallCount(data.count);
+        });
+        
+        socket.on('call_state_update', (data) => {
+            Object.entries(data.changes || {}).forEach(([callId, change]) => {
+                if (change.state === 'live') {
+                    liveCalls[callId] = change;
+                } else {
+                    delete liveCalls[callId];
+                }
+            });
+            renderLiveCalls();
+        });
+        
+        socket.on('call_analysis', showCallAnalysis);
+    }
+    
+    function disconnectAdminSocket() {
+        if (socket) {
+            socket.disconnect();
+            socket = null;
+        }
+        liveCalls = {};
+        renderLiveCalls();
+    }
+    
+    // Show analyses of calls that just finished
+    function showCallAnalysis(data) {
+        const list = document.getElementById('recent-analyses');
+        if (!list || !isAdminMode) {
+            return;
+        }
+        
+        const analysis = data.analysis || {};
+        const item = document.createElement('li');
+        const title = document.createElement('strong');
+        title.textContent = `${data.callId} (prompt ${data.promptVersion})`;
+        item.appendChild(title);
+        
+        const summary = document.createElement('div');
+        if (analysis.error) {
+            summary.textContent = `Analysis failed: ${analysis.error}`;
+        } else {
+            const issues = analysis.issues || [];
+            summary.textContent = issues.length
+                ? `${issues.length} issue(s): ${issues.map(issue => issue.issue).join('; ')}`
+                : 'No issues found';
+        }
+        item.appendChild(summary);
+        
+        // Keep only the most recent few
+        list.prepend(item);
+        while (list.children.length > 10) {
+            list.removeChild(list.lastChild);
+        }
+    }
     
     // Audio recording variables
     let mediaRecorder = null;
@@ -39,6 +125,12 @@ document.addEventListener('DOMContentLoaded', () => {
     let audioBlob = null;
     let isAdminMode = false;
     
+    // Chunked upload state: chunks go up while recording, resuming from the server's offset
+    const FEEDBACK_TIMESLICE_MS = 1000;
+    let feedbackSessionId = null;
+    let uploadedBytes = 0;
+    let uploading = null;
+    
     // Show admin login modal
     adminModeBtn.addEventListener('click', () => {
         if (isAdminMode) {
@@ -55,6 +147,9 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Show feedback modal when feedback button is clicked
     feedbackBtn.addEventListener('click', () => {
+        // A recording that was never uploaded is discarded
+        discardFeedbackSession();
+        
         // Reset feedback modal state
         stopRecordingBtn.disabled = true;
         startRecordingBtn.disabled = false;
@@ -124,7 +219,7 @@ document.addEventListener('DOMContentLoaded', () => {
             
             if (data.success) {
                 // Password correct - enable admin mode
-                enableAdminMode();
+                enableAdminMode(password);
                 // Reset and close the modal
                 adminErrorMsg.textContent = '';
                 adminModal.style.display = 'none';
@@ -139,7 +234,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // Enable admin mode
-    function enableAdminMode() {
+    function enableAdminMode(password) {
         isAdminMode = true;
         adminModeBtn.classList.add('admin-mode-active');
         adminModeBtn.textContent = 'Exit Admin Mode';
@@ -150,16 +245,8 @@ document.addEventListener('DOMContentLoaded', () => {
         // Show admin stats on the main page
         document.getElementById('admin-stats').style.display = 'block';
         
-        // Get initial call count
-        fetch('/api/ongoing-calls')
-            .then(response => response.json())
-            .then(data => {
-                const ongoingCallsCount = document.getElementById('ongoing-calls-count');
-                if (ongoingCallsCount && data.ongoing_calls !== undefined) {
-                    ongoingCallsCount.textContent = data.ongoing_calls;
-                }
-            })
-            .catch(error => console.error('Error fetching initial call count:', error));
+        // Live updates; the socket sends the current state as soon as it connects
+        connectAdminSocket(password);
     }
     
     // Exit admin mode
@@ -171,8 +258,9 @@ document.addEventListener('DOMContentLoaded', () => {
         // Hide feedback button
         feedbackBtn.style.display = 'none';
         
-        // Hide admin stats
+        // Hide admin stats and stop live updates
         document.getElementById('admin-stats').style.display = 'none';
+        disconnectAdminSocket();
     }
     
     // Audio recording functionality
@@ -185,6 +273,13 @@ document.addEventListener('DOMContentLoaded', () => {
         try {
             audioChunks = [];
             
+            // Open an upload session; without one we fall back to a single upload at the end
+            try {
+                await startFeedbackSession();
+            } catch (error) {
+                console.warn('Chunked upload unavailable, will upload after recording:', error);
+            }
+            
             // Request microphone access
             const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
             
@@ -195,6 +290,8 @@ document.addEventListener('DOMContentLoaded', () => {
             mediaRecorder.ondataavailable = (e) => {
                 if (e.data.size > 0) {
                     audioChunks.push(e.data);
+                    // Failures here are retried by the next chunk or by the final upload
+                    flushChunks().catch(error => console.warn('Chunk upload failed, will retry:', error));
                 }
             };
             
@@ -229,8 +326,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 clearInterval(recordingTimer);
             };
             
-            // Start recording
-            mediaRecorder.start();
+            // Start recording, emitting a chunk every timeslice
+            mediaRecorder.start(FEEDBACK_TIMESLICE_MS);
             
             // Update UI
             startRecordingBtn.disabled = true;
@@ -263,6 +360,76 @@ document.addEventListener('DOMContentLoaded', () => {
         recordingTime.textContent = `${minutes}:${seconds}`;
     }
     
+    // Start a chunked upload session, discarding any unfinished one
+    async function startFeedbackSession() {
+        await discardFeedbackSession();
+        const response = await fetch('/api/feedback-sessions', { method: 'POST' });
+        if (!response.ok) {
+            throw new Error(`Could not start upload session (${response.status})`);
+        }
+        feedbackSessionId = (await response.json()).id;
+        uploadedBytes = 0;
+    }
+    
+    async function discardFeedbackSession() {
+        const sessionId = feedbackSessionId;
+        feedbackSessionId = null;
+        if (sessionId) {
+            try {
+                await fetch(`/api/feedback-sessions/${sessionId}`, { method: 'DELETE' });
+            } catch (error) {
+                console.warn('Could not discard upload session:', error);
+            }
+        }
+    }
+    
+    function recordedBytes() {
+        return audioChunks.reduce((total, chunk) => total + chunk.size, 0);
+    }
+    
+    // Send whatever the server doesn't have yet; one request at a time
+    function flushChunks() {
+        if (!uploading) {
+            uploading = sendPendingChunks().finally(() => {
+                uploading = null;
+            });
+        }
+        return uploading;
+    }
+    
+    async function sendPendingChunks() {
+        let attempt = 0;
+        while (feedbackSessionId && uploadedBytes < recordedBytes()) {
+            const sessionId = feedbackSessionId;
+            const pending = new Blob(audioChunks).slice(uploadedBytes);
+            try {
+                const response = await fetch(`/api/feedback-sessions/${sessionId}/chunks?offset=${uploadedBytes}`, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/octet-stream'
+                    },
+                    body: pending
+                });
+                const result = await response.json();
+                
+                // 409 means the server has less than we thought: resume from its offset
+                if (response.ok || response.status === 409) {
+                    if (sessionId === feedbackSessionId) {
+                        uploadedBytes = result.received;
+                    }
+                    attempt = 0;
+                    continue;
+                }
+                throw new Error(result.error || `Chunk upload failed (${response.status})`);
+            } catch (error) {
+                if (++attempt > 5) {
+                    throw error;
+                }
+                await new Promise(resolve => setTimeout(resolve, 500 * 2 ** attempt));
+            }
+        }
+    }
+    
     // Upload feedback recording
     async function uploadFeedback() {
         if (!audioBlob) {
@@ -277,29 +444,45 @@ document.addEventListener('DOMContentLoaded', () => {
                 callId = window.ultravoxSession.callId || 'unknown';
             }
             
-            // Create form data with audio file
-            const formData = new FormData();
-            formData.append('audio', audioBlob, 'feedback.webm');
-            formData.append('callId', callId);
-            
             // Update status
             recordingStatus.textContent = 'Uploading feedback...';
             uploadFeedbackBtn.disabled = true;
             
-            // Send to server
-            const response = await fetch('/api/upload-feedback', {
-                method: 'POST',
-                body: formData
-            });
+            let response;
+            if (feedbackSessionId) {
+                // Most of the recording is already on the server; send the rest and finalize
+                await flushChunks();
+                response = await fetch(`/api/feedback-sessions/${feedbackSessionId}/complete?size=${recordedBytes()}`, {
+                    method: 'POST'
+                });
+            } else {
+                // Send the recording as the raw request body so the server can stream it to disk
+                response = await fetch(`/api/upload-feedback?callId=${encodeURIComponent(callId)}`, {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': audioBlob.type || 'audio/webm'
+                    },
+                    body: audioBlob
+                });
+            }
             
             const result = await response.json();
+            if (response.status === 409) {
+                // Some bytes didn't arrive; pick up from the server's offset on the next try
+                uploadedBytes = result.received;
+            }
             
             if (result.success) {
+                // Conversion happens in the background; the file is already safe on the server
                 recordingStatus.textContent = 'Feedback uploaded successfully!';
+                if (result.status === 'processing') {
+                    watchFeedbackStatus(result.id);
+                }
                 
                 // Clear audio preview and reset
                 audioPreview.innerHTML = '';
                 audioBlob = null;
+                feedbackSessionId = null;
                 
                 // Close modal after short delay
                 setTimeout(() => {
@@ -315,6 +498,39 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
+    // Follow background processing of an uploaded recording: Socket.IO when connected, polling otherwise
+    function watchFeedbackStatus(feedbackId) {
+        let finished = false;
+        const report = (status) => {
+            if (finished || status.id !== feedbackId || status.status === 'processing') {
+                return;
+            }
+            finished = true;
+            if (socket) {
+                socket.off('feedback_status', report);
+            }
+            console.log(status.status === 'failed' ? `Feedback processing failed: ${status.error}` : `Feedback saved as ${status.file}`);
+        };
+        
+        if (socket) {
+            socket.on('feedback_status', report);
+        }
+        let polls = 0;
+        const poll = async () => {
+            if (finished || ++polls > 60) {
+                return;
+            }
+            try {
+                const response = await fetch(`/api/feedback/${encodeURIComponent(feedbackId)}`);
+                report(await response.json());
+            } catch (error) {
+                console.error('Error checking feedback status:', error);
+            }
+            setTimeout(poll, 2000);
+        };
+        setTimeout(poll, 2000);
+    }
+    
     // Handle closing the admin panel
     if (closeAdminPanelBtn) {
         closeAdminPanelBtn.addEventListener('click', () => {
@@ -13,6 +13,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let ultravoxSession = null;
     let lastTranscript = null;
     let settingsVisible = false;
+    // Call profile / experiment variant the server assigned; sent back so it sticks
+    let callAssignment = {};
 
     function updateStatus(message) {
         statusMessage.textContent = message;
@@ -43,12 +45,44 @@ document.addEventListener('DOMContentLoaded', () => {
         toggleSettingsBtn.textContent = settingsVisible ? 'Hide Options' : 'Show Options';
     });
     
-    refreshVoicesBtn.addEventListener('click', fetchUltravoxVoices);
+    // Explicit refresh revalidates with the server (cheap 304 if unchanged)
+    refreshVoicesBtn.addEventListener('click', () => fetchUltravoxVoices({ cache: 'no-cache' }));
     
-    async function fetchUltravoxVoices() {
+    function callRequestBody() {
+        return JSON.stringify({
+            voiceId: voiceSelect.value,
+            profile: callAssignment.experiment || callAssignment.profile,
+            variant: callAssignment.profile
+        });
+    }
+    
+    function rememberAssignment(data) {
+        if (data.profile) {
+            callAssignment = { profile: data.profile, experiment: data.experiment };
+        }
+    }
+    
+    // Ask the server to have a call ready for this voice (no-op unless speculative mode is on)
+    function prewarmCall() {
+        if (!voiceSelect.value) return;
+        fetch('/api/prewarm-call', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: callRequestBody()
+        })
+            .then(response => response.json())
+            .then(rememberAssignment)
+            .catch(error => console.warn('Failed to prewarm call:', error));
+    }
+    
+    voiceSelect.addEventListener('change', prewarmCall);
+    
+    async function fetchUltravoxVoices(fetchOptions = {}) {
         try {
             updateStatus('Loading Ultravox voices...');
-            const response = await fetch('/api/ultravox-voices');
+            const response = await fetch('/api/ultravox-voices', fetchOptions);
             const data = await response.json();
             
             if (data.error) {
@@ -73,6 +107,7 @@ document.addEventListener('DOMContentLoaded', () => {
             });
             
             updateStatus('Ready to start');
+            prewarmCall();
         } catch (error) {
             console.error('Failed to fetch voices:', error);
             updateStatus('Failed to load voices: ' + error.message);
@@ -86,28 +121,47 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    function backOff(message, seconds) {
+        let remaining = seconds;
+        updateStatus(`${message}. You can try again in ${remaining}s`);
+        const timer = setInterval(() => {
+            remaining -= 1;
+            if (remaining > 0) {
+                updateStatus(`${message}. You can try again in ${remaining}s`);
+                return;
+            }
+            clearInterval(timer);
+            startCallBtn.disabled = false;
+            updateStatus('Ready to start');
+        }, 1000);
+    }
+
     startCallBtn.addEventListener('click', async () => {
         updateStatus('Connecting to agent...');
         startCallBtn.disabled = true;
         
         try {
-            const selectedVoice = voiceSelect.value;
-            
             const response = await fetch('/api/get-join-url', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({
-                    voiceId: selectedVoice
-                })
+                body: callRequestBody()
             });
             
             const data = await response.json();
             
+            // Busy or rate limited: wait as long as the server asks before allowing a retry
+            if (response.status === 429 || response.status === 503) {
+                const retryAfter = parseInt(response.headers.get('Retry-After'), 10) || data.retryAfter || 5;
+                backOff(data.error || 'Service busy', retryAfter);
+                return;
+            }
+            
             if (data.error) {
                 throw new Error(data.error);
             }
+            rememberAssignment(data);
             
             const joinUrl = data.joinUrl;
             
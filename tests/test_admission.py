@@ -0,0 +1,225 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, TokenBucketLimiter
+
+
+def make_controller(live=None, **kwargs):
+    live = live if live is not None else [0]
+    options = dict(max_concurrent=1, queue_timeout=2, poll_interval=0.05)
+    options.update(kwargs)
+    return AdmissionController(lambda: live[0], **options)
+
+
+def test_admits_while_capacity_left():
+    controller = make_controller(max_concurrent=2)
+    controller.admit("a")
+    controller.admit("a")
+    assert controller.stats()["reserved"] == 2
+
+
+def test_live_calls_use_capacity():
+    controller = make_controller(live=[1], queue_timeout=0)
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit("a")
+    assert error.value.status == 503
+    assert controller.stats()["timed_out"] == 1
+
+
+def test_full_queue_rejects():
+    controller = make_controller(queue_size=0)
+    controller.admit("a")
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit("b")
+    assert error.value.status == 503
+    assert controller.stats()["rejected"] == 1
+
+
+def test_rate_limit():
+    controller = make_controller(max_concurrent=0, rate=1, burst=1)
+    controller.admit("a")
+    with pytest.raises(AdmissionRejected) as error:
+        controller.admit("a")
+    assert error.value.status == 429
+    assert error.value.retry_after > 0
+    # Other clients have their own bucket
+    controller.admit("b")
+
+
+def test_check_rate_spends_a_token_without_reserving():
+    controller = make_controller(rate=1, burst=1)
+    controller.check_rate("a")
+    assert controller.stats()["reserved"] == 0
+    with pytest.raises(AdmissionRejected):
+        controller.check_rate("a")
+
+
+def test_token_bucket_refills():
+    limiter = TokenBucketLimiter(rate=10, burst=1)
+    assert limiter.take("a", 0) == 0
+    assert limiter.take("a", 0) == pytest.approx(0.1)
+    assert limiter.take("a", 0.1) == 0
+
+
+def test_cancel_hands_slot_to_waiter():
+    controller = make_controller()
+    ticket = controller.admit("a")
+    granted = []
+    waiter = threading.Thread(target=lambda: granted.append(controller.admit("b")))
+    waiter.start()
+    time.sleep(0.1)
+    assert controller.stats()["waiting"] == 1
+    controller.cancel(ticket)
+    waiter.join(1)
+    assert granted and granted[0] != ticket
+    assert controller.stats()["waiting"] == 0
+
+
+def test_attach_then_settle_frees_slot():
+    controller = make_controller()
+    ticket = controller.admit("a")
+    controller.attach(ticket, "call-1")
+    controller.settle("call-1")
+    assert controller.stats()["reserved"] == 0
+
+
+def test_settle_before_attach():
+    controller = make_controller()
+    ticket = controller.admit("a")
+    # The call.started webhook beat the create response
+    controller.settle("call-1")
+    assert controller.stats()["reserved"] == 1
+    controller.attach(ticket, "call-1")
+    assert controller.stats()["reserved"] == 0
+
+
+def test_reservation_expires():
+    controller = make_controller(reservation_ttl=0.05)
+    controller.admit("a")
+    time.sleep(0.06)
+    controller.admit("b")
+    assert controller.stats()["reserved"] == 1
+
+
+def test_slots_go_round_robin_across_clients():
+    controller = make_controller(queue_size=10)
+    ticket = controller.admit("busy")
+    order = []
+
+    def wait(client):
+        ticket = controller.admit(client)
+        order.append(client)
+        controller.cancel(ticket)
+
+    threads = []
+    for client in ("busy", "busy", "other"):
+        thread = threading.Thread(target=wait, args=(client,))
+        thread.start()
+        threads.append(thread)
+        time.sleep(0.05)
+    controller.cancel(ticket)
+    for thread in threads:
+        thread.join(1)
+    assert order == ["busy", "other", "busy"]
+
+
+@pytest.fixture(params=[None, "executor"])
+def executor(request):
+    if request.param is None:
+        yield None
+        return
+    pool = ThreadPoolExecutor(2)
+    yield pool
+    pool.shutdown()
+
+
+def test_aadmit_waits_for_a_slot(executor):
+    controller = make_controller()
+
+    async def main():
+        ticket = await controller.aadmit("a", executor)
+        waiter = asyncio.ensure_future(controller.aadmit("b", executor))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        controller.cancel(ticket)
+        return ticket, await asyncio.wait_for(waiter, 1)
+
+    first, second = asyncio.run(main())
+    assert first != second
+    assert controller.stats()["reserved"] == 1
+
+
+def test_aadmit_times_out(executor):
+    controller = make_controller(queue_timeout=0.1)
+
+    async def main():
+        await controller.aadmit("a", executor)
+        with pytest.raises(AdmissionRejected):
+            await controller.aadmit("b", executor)
+
+    asyncio.run(main())
+    assert controller.stats()["waiting"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue(executor):
+    controller = make_controller()
+
+    async def main():
+        ticket = await controller.aadmit("a", executor)
+        waiter = asyncio.ensure_future(controller.aadmit("b", executor))
+        await asyncio.sleep(0.05)
+        assert controller.stats()["waiting"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.05)
+        assert controller.stats()["waiting"] == 0
+        controller.cancel(ticket)
+
+    asyncio.run(main())
+    assert controller.stats()["reserved"] == 0
+
+
+def test_cancelled_after_grant_gives_slot_back(executor):
+    controller = make_controller()
+
+    async def main():
+        ticket = await controller.aadmit("a", executor)
+        waiter = asyncio.ensure_future(controller.aadmit("b", executor))
+        await asyncio.sleep(0.05)
+        # The slot is granted, but the request is cancelled before it sees the ticket
+        controller.cancel(ticket)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert controller.stats()["reserved"] == 0
+    assert controller.stats()["waiting"] == 0
+
+
+def test_cancelled_while_start_is_pending():
+    controller = make_controller()
+    controller.admit("a")
+    gate = threading.Event()
+    executor = ThreadPoolExecutor(1)
+    # Hold the only executor thread, so _start is still pending when the request is cancelled
+    executor.submit(gate.wait)
+
+    async def main():
+        waiter = asyncio.ensure_future(controller.aadmit("b", executor))
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(main())
+    gate.set()
+    executor.shutdown(wait=True)
+    assert controller.stats()["waiting"] == 0
+    assert controller.stats()["reserved"] == 1
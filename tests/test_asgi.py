@@ -0,0 +1,43 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("socketio")
+pytest.importorskip("httpx")
+
+# app.py opens its job queue and starts worker pools on import
+os.environ.setdefault("JOB_QUEUE_PATH", os.path.join(tempfile.mkdtemp(), "jobs.db"))
+os.environ.setdefault("CALL_RECONCILE_INTERVAL", "0")
+
+import asgi  # noqa: E402
+from admission import AdmissionController  # noqa: E402
+
+
+async def discard(message):
+    pass
+
+
+def test_disconnect_during_call_creation_frees_the_slot(monkeypatch):
+    monkeypatch.setenv("ULTRAVOX_API_KEY", "test-key")
+    controller = AdmissionController(lambda: 0, max_concurrent=1)
+    monkeypatch.setattr(asgi.web, "admission", controller)
+
+    async def hang(body):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(asgi.web, "acreate_ultravox_call", hang)
+    scope = {"type": "http", "client": ("203.0.113.1", 1234), "headers": []}
+
+    async def main():
+        request = asyncio.ensure_future(asgi.get_join_url(scope, {}, discard))
+        await asyncio.sleep(0.05)
+        assert controller.stats()["reserved"] == 1
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert controller.stats()["reserved"] == 0
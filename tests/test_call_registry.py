@@ -0,0 +1,125 @@
+import threading
+import time
+
+import pytest
+
+from call_registry import CallRegistry, LiveCall, MemoryBackend, RedisBackend, SQLiteBackend
+from local_redis import LocalRedis
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "calls.db"))
+    return RedisBackend(LocalRedis())
+
+
+def call(call_id, started_at=None):
+    return LiveCall(call_id, time.time() if started_at is None else started_at)
+
+
+def test_start_and_end(backend):
+    registry = CallRegistry(backend)
+    assert registry.started(call("a"))
+    assert registry.count() == 1
+    assert registry.get("a").call_id == "a"
+    assert registry.ended("a")
+    assert registry.count() == 0
+    assert registry.get("a") is None
+
+
+def test_duplicate_deliveries_dont_drift(backend):
+    registry = CallRegistry(backend)
+    registry.started(call("a"))
+    assert not registry.started(call("a"))
+    registry.ended("a")
+    assert not registry.ended("a")
+    assert registry.count() == 0
+    assert registry.stats()["duplicates"] == 2
+
+
+def test_end_before_start_leaves_tombstone(backend):
+    registry = CallRegistry(backend)
+    assert not registry.ended("a")
+    # The started webhook arrives late; the call is already over
+    assert not registry.started(call("a"))
+    assert registry.count() == 0
+
+
+def test_tombstone_expires(backend):
+    registry = CallRegistry(backend, tombstone_ttl=1)
+    registry.ended("a")
+    time.sleep(1.1)
+    assert registry.started(call("a"))
+
+
+def test_reconcile(backend):
+    registry = CallRegistry(backend)
+    registry.started(call("stale", started_at=time.time() - 3600))
+    registry.started(call("recent"))
+    added, removed = registry.reconcile({"missed": call("missed")}, is_ended=lambda call_id: True, grace=60)
+    assert (added, removed) == (1, 1)
+    assert sorted(c.call_id for c in registry.active()) == ["missed", "recent"]
+
+
+def test_reconcile_keeps_calls_upstream_says_are_live(backend):
+    registry = CallRegistry(backend)
+    registry.started(call("old", started_at=time.time() - 3600))
+    assert registry.reconcile({}, is_ended=lambda call_id: False) == (0, 0)
+    assert registry.count() == 1
+
+
+def test_concurrent_starts_and_ends_keep_count_exact(backend):
+    registry = CallRegistry(backend)
+
+    def deliver(n):
+        for i in range(20):
+            registry.started(call(f"{n}-{i}"))
+            registry.started(call(f"{n}-{i}"))
+            registry.ended(f"{n}-{i}")
+            registry.ended(f"{n}-{i}")
+
+    threads = [threading.Thread(target=deliver, args=(n % 2,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.count() == 0
+    assert len(registry.active()) == 0
+
+
+def test_sqlite_count_shared_between_connections(tmp_path):
+    path = str(tmp_path / "calls.db")
+    first, second = CallRegistry(SQLiteBackend(path)), CallRegistry(SQLiteBackend(path))
+    assert first.started(call("a"))
+    assert not second.started(call("a"))
+    assert second.ended("a")
+    assert not first.ended("a")
+    assert first.count() == second.count() == 0
+
+
+def test_redis_add_aborts_when_call_ends_mid_check():
+    client = LocalRedis()
+    backend = RedisBackend(client)
+    real_exists = client.exists
+
+    def exists_then_end(*names):
+        result = real_exists(*names)
+        # The ended webhook lands between the tombstone check and the write
+        backend.remove("a", 60)
+        return result
+
+    client.exists = exists_then_end
+    assert not backend.add(call("a"), 60)
+    client.exists = real_exists
+    assert backend.count() == 0
+
+
+def test_lease(backend):
+    assert backend.acquire_lease("reconcile", "one", 60)
+    assert backend.acquire_lease("reconcile", "one", 60)
+    if isinstance(backend, MemoryBackend):
+        return
+    assert not backend.acquire_lease("reconcile", "two", 60)
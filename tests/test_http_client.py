@@ -0,0 +1,200 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import http_client
+from http_client import CircuitBreaker, CircuitOpenError
+
+
+def make_breaker(**kwargs):
+    options = dict(window=4, min_requests=4, failure_threshold=0.5, slow_call_seconds=1.0, open_seconds=0.05)
+    options.update(kwargs)
+    return CircuitBreaker("test", **options)
+
+
+def trip(breaker):
+    for _ in range(breaker.min_requests):
+        breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def wait_out(breaker):
+    time.sleep(breaker.open_seconds + 0.01)
+
+
+def test_stays_closed_below_min_requests():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before()
+
+
+def test_trips_on_failure_share():
+    breaker = make_breaker()
+    breaker.record(False, 0.01)
+    breaker.record(False, 0.01)
+    breaker.record(True, 0.01)
+    breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_trips_on_slow_share():
+    breaker = make_breaker(slow_threshold=0.75)
+    for _ in range(4):
+        breaker.record(False, 2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_success_closes():
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    breaker.before()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+    breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before()
+
+
+def test_half_open_failure_reopens():
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    breaker.before()
+    breaker.record(True, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.opened == 2
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+
+
+def test_slow_probe_reopens():
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    breaker.before()
+    breaker.record(False, 2.0)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_late_result_while_open_is_ignored():
+    breaker = make_breaker()
+    trip(breaker)
+    breaker.record(False, 0.01)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_released_probe_frees_the_slot():
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    breaker.before()
+    breaker.release()
+    breaker.before()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_release_while_closed_is_a_no_op():
+    breaker = make_breaker()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker._probes == 0
+
+
+def test_unanswered_probe_expires():
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    breaker.before()
+    with pytest.raises(CircuitOpenError):
+        breaker.before()
+    wait_out(breaker)
+    # The first probe never reported back; a new round starts
+    breaker.before()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_sync_send_releases_probe_on_unexpected_error(monkeypatch):
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    breaker.before()
+
+    def interrupted(*args, **kwargs):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(http_client, "get_session", lambda: SimpleNamespace(request=interrupted))
+    with pytest.raises(KeyboardInterrupt):
+        http_client._send(breaker, "GET", "https://example.com/")
+    breaker.before()
+
+
+def test_sync_send_records_request_errors(monkeypatch):
+    breaker = make_breaker()
+
+    def refused(*args, **kwargs):
+        raise http_client.requests.ConnectionError("refused")
+
+    monkeypatch.setattr(http_client, "get_session", lambda: SimpleNamespace(request=refused))
+    for _ in range(4):
+        with pytest.raises(http_client.RequestException):
+            http_client._send(breaker, "GET", "https://example.com/")
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_cancelled_async_probe_releases_slot(monkeypatch):
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    monkeypatch.setattr(http_client, "get_breaker", lambda url: breaker)
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(http_client, "get_async_client", lambda: SimpleNamespace(request=hang))
+
+    async def main():
+        task = asyncio.ensure_future(http_client.arequest("POST", "https://example.com/"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(CircuitOpenError):
+            breaker.before()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    breaker.before()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_async_failure_is_recorded(monkeypatch):
+    breaker = make_breaker()
+    trip(breaker)
+    wait_out(breaker)
+    monkeypatch.setattr(http_client, "get_breaker", lambda url: breaker)
+
+    async def fail(*args, **kwargs):
+        raise OSError("connection reset")
+
+    monkeypatch.setattr(http_client, "get_async_client", lambda: SimpleNamespace(request=fail))
+    with pytest.raises(OSError):
+        asyncio.run(http_client.arequest("POST", "https://example.com/"))
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_hedge_only_while_closed_and_within_budget():
+    breaker = make_breaker()
+    breaker.record(False, 0.01)
+    assert breaker.allow_hedge(1.0)
+    assert not breaker.allow_hedge(1.0)
+    trip(breaker)
+    assert not breaker.allow_hedge(1.0)
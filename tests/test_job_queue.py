@@ -0,0 +1,171 @@
+import os
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue
+from worker_pool import RetryableError, WorkerPool
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue("test", path=str(tmp_path / "jobs.db"), max_pending=3, visibility_timeout=60)
+
+
+def test_claim_ack(queue):
+    assert queue.put(["a", 1], key="k")
+    job = queue.claim()
+    assert job.args == ["a", 1]
+    assert job.attempt == 1
+    assert queue.claim() is None
+    assert queue.ack(job)
+    assert queue.get("k")["status"] == job_queue.DONE
+
+
+def test_duplicate_key_is_ignored(queue):
+    queue.put(["a"], key="k")
+    queue.put(["b"], key="k")
+    assert queue.claim().args == ["a"]
+    assert queue.claim() is None
+
+
+def test_full_queue_rejects(queue):
+    for i in range(3):
+        assert queue.put([i])
+    assert not queue.put([3])
+
+
+def test_delayed_job_waits(queue):
+    queue.put(["later"], delay=60)
+    assert queue.claim() is None
+
+
+def test_retry_releases_with_delay(queue):
+    queue.put(["a"], key="k")
+    job = queue.claim()
+    assert queue.retry(job, 60, "not ready")
+    assert queue.claim() is None
+    state = queue.get("k")
+    assert state["status"] == job_queue.PENDING
+    assert state["error"] == "not ready"
+
+
+def test_expired_claim_is_reclaimed_and_old_token_is_stale(tmp_path):
+    queue = JobQueue("test", path=str(tmp_path / "jobs.db"), visibility_timeout=0.05)
+    queue.put(["a"])
+    first = queue.claim()
+    assert queue.claim() is None
+    time.sleep(0.06)
+    second = queue.claim()
+    assert second.id == first.id
+    assert second.attempt == 2
+    # The first worker lost its claim; its result must not overwrite the new owner's
+    assert not queue.ack(first)
+    assert not queue.dead_letter(first, "late")
+    assert queue.ack(second)
+
+
+def test_dead_letter_and_requeue(queue):
+    queue.put(["a"], key="k")
+    job = queue.claim()
+    assert queue.dead_letter(job, "boom")
+    assert queue.claim() is None
+    assert [dead["error"] for dead in queue.dead_letters()] == ["boom"]
+    assert queue.requeue_dead() == 1
+    assert queue.claim().attempt == 1
+
+
+def test_release_stale_claims_from_dead_process(queue, monkeypatch):
+    queue.put(["a"])
+    queue.claim()
+    # Pretend the claim belongs to another process on this host that has exited
+    host = queue.owner.rsplit(":", 2)[0]
+    queue._conn.execute("UPDATE jobs SET claimed_by = ?", (f"{host}:999999:dead:1",))
+    monkeypatch.setattr(job_queue.os, "kill", lambda pid, sig: (_ for _ in ()).throw(ProcessLookupError()))
+    assert queue.release_stale_claims() == 1
+    assert queue.claim().args == ["a"]
+
+
+def test_live_claims_are_not_released(queue):
+    queue.put(["a"])
+    queue.claim()
+    assert queue.release_stale_claims() == 0
+
+
+def test_claims_from_other_hosts_are_not_released(queue):
+    queue.put(["a"])
+    queue.claim()
+    queue._conn.execute("UPDATE jobs SET claimed_by = ?", ("elsewhere:1:abcd:1",))
+    assert queue.release_stale_claims() == 0
+
+
+def test_put_done_records_without_queueing(queue):
+    for i in range(3):
+        queue.put([i])
+    assert queue.put_done(["x"], key="k", note="skipped")
+    state = queue.get("k")
+    assert state["status"] == job_queue.DONE
+    assert state["attempts"] == 0
+    assert state["error"] == "skipped"
+    assert not queue.put_done(["x"], key="k")
+
+
+def test_purge_done(queue):
+    queue.put(["a"])
+    queue.ack(queue.claim())
+    assert queue.purge_done(older_than=60) == 0
+    assert queue.purge_done(older_than=-1) == 1
+
+
+def run_one(pool):
+    job = pool.job_queue.claim()
+    pool._run(job)
+    return job
+
+
+def test_worker_retries_retryable_errors_then_dead_letters(queue):
+    def handler(value):
+        raise RetryableError("not yet")
+
+    pool = WorkerPool("test", handler, queue, max_attempts=2, base_delay=0, max_delay=0)
+    queue.put(["a"], key="k")
+    run_one(pool)
+    assert queue.get("k")["status"] == job_queue.PENDING
+    run_one(pool)
+    assert queue.get("k")["status"] == job_queue.DEAD
+    assert (pool.retried, pool.failed) == (1, 1)
+
+
+def test_worker_dead_letters_other_errors_right_away(queue):
+    def handler(value):
+        raise ValueError("bad input")
+
+    pool = WorkerPool("test", handler, queue, max_attempts=5)
+    queue.put(["a"], key="k")
+    run_one(pool)
+    state = queue.get("k")
+    assert state["status"] == job_queue.DEAD
+    assert state["error"] == "bad input"
+
+
+def test_worker_counts_lost_claims(tmp_path):
+    queue = JobQueue("test", path=str(tmp_path / "jobs.db"), visibility_timeout=0.05)
+
+    def handler(value):
+        time.sleep(0.06)
+        # Another worker takes over the expired claim meanwhile
+        assert queue.claim() is not None
+
+    pool = WorkerPool("test", handler, queue)
+    queue.put(["a"])
+    run_one(pool)
+    assert (pool.completed, pool.lost) == (0, 1)
+
+
+def test_queue_survives_reopen(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    JobQueue("test", path=path).put(["a"], key="k")
+    reopened = JobQueue("test", path=path)
+    assert reopened.claim().args == ["a"]
+    assert os.path.exists(path)
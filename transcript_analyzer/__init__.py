@@ -1 +1,8 @@
-from .analyzer import TranscriptAnalyzer
\ No newline at end of file
+from .analyzer import TranscriptAnalyzer
+from .results import AnalysisResultStore
+from .rate_limit import RateLimiter
+from .cache import AnalysisCache
+from .manifest import AnalysisManifest
+from .context_cache import GeminiContextCache
+from .fake_model import FakeAnalysisModel
+from .schema import CallAnalysis, AnalysisStats, AnalysisParseError
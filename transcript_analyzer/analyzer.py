@@ -1,5 +1,6 @@
-from typing import TypedDict, List, Dict, Any
-import re
+from typing import TypedDict, List, Dict, Any, Iterable
+import asyncio
+import time
 import json
 import os
 from dotenv import load_dotenv
@@ -7,49 +8,125 @@ from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import tool
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 
 # LangGraph imports
 from langgraph.graph import StateGraph, START, END
 from langgraph.prebuilt import create_react_agent
 from langgraph.func import entrypoint, task
 
+from transcript_store import TranscriptStore, get_store
+from .results import AnalysisResultStore
+from .cache import AnalysisCache, cache_key, normalize_turns
+from .context_cache import GeminiContextCache, is_missing_cache_error
+from .rate_limit import RateLimiter, estimate_tokens, is_rate_limit_error, rate_limit_backoff
+from .schema import BATCH_RESPONSE_SCHEMA, RESPONSE_SCHEMA, AnalysisParseError, AnalysisStats, validate_analysis, validate_batch
+
 load_dotenv()
 
+ANALYSIS_SYSTEM_MESSAGE = (
+    "You are an expert in financial sales conversation analysis. "
+    "Analyze this conversation transcript and provide a structured analysis with the following format:"
+    "\n\n"
+    "1. First identify 2-3 key strengths of the agent in the conversation\n"
+    "2. Then identify 2-3 specific issues where the agent could improve\n"
+    "3. For each issue, provide a specific example from the transcript\n"
+    "4. For each issue, provide a specific recommendation for improvement\n"
+    "\n"
+    "Keep your analysis concise and focused on the most important points. Format your response "
+    "as a clean JSON object with the following structure:"
+    "\n\n"
+    "{\n"
+    "  \"strengths\": [\"strength 1\", \"strength 2\"],\n"
+    "  \"issues\": [\n"
+    "    {\n"
+    "      \"issue\": \"Description of issue 1\",\n"
+    "      \"example\": \"Specific example from transcript\",\n"
+    "      \"recommendation\": \"How to improve\"\n"
+    "    },\n"
+    "    {\n"
+    "      \"issue\": \"Description of issue 2\",\n"
+    "      \"example\": \"Specific example from transcript\",\n"
+    "      \"recommendation\": \"How to improve\"\n"
+    "    }\n"
+    "  ]\n"
+    "}"
+    "\n\n"
+    "Focus on identifying issues in the conversation where the agent failed to properly address user needs. "
+    "Look for misunderstandings, missing context, or prompt limitations. "
+    "Pay special attention to opportunities to collect key information about the client's "
+    "investment preferences, risk tolerance, and financial goals. "
+    "The transcripts may be incomplete with breaks, so make reasonable inferences about context."
+)
+
 class ConversationState(TypedDict):
-    transcript: str
+    turns: List[Dict[str, Any]]
     messages: List[Dict[str, Any]]
     current_prompt: str
     analysis: Dict[str, Any]
+    # False when ``analysis`` is an error record for a reply that never validated
+    analysis_valid: bool
     active_agent: str
-    transcript_path: str
+    call_id: str
+    date: str
+    prompt_version: str
 
 class TranscriptAnalyzer:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        store: TranscriptStore = None,
+        results_dir: str = "transcripts",
+        rate_limiter: RateLimiter = None,
+        max_rate_limit_retries: int = 5,
+        cache: AnalysisCache = None,
+        model_name: str = "gemini-2.0-flash",
+        temperature: float = 0.2,
+        model=None,
+        context_cache: GeminiContextCache = None,
+        max_transcript_tokens: int = 12000,
+        chunk_overlap_turns: int = 2,
+    ):
         self.api_key = api_key
-        self.model = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            temperature=0.2,
-            google_api_key=api_key,
+        self.context_cache = context_cache
+        self.max_transcript_tokens = max_transcript_tokens
+        self.chunk_overlap_turns = chunk_overlap_turns
+        self._models = {}
+        self.cache = cache
+        self.model_name = model_name
+        self.temperature = temperature
+        self.rate_limiter = rate_limiter
+        self.stats = AnalysisStats()
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.store = store or get_store()
+        self.results_dir = results_dir
+        self.results = AnalysisResultStore(results_dir)
+        self._model_injected = model is not None
+        self.model = model or self._create_model()
+        self.app = self._build_graph()
+        
+    def _create_model(self, **kwargs):
+        # JSON mode constrained to the analysis schema
+        kwargs.setdefault("response_schema", RESPONSE_SCHEMA)
+        return ChatGoogleGenerativeAI(
+            model=self.model_name,
+            temperature=self.temperature,
+            google_api_key=self.api_key,
             max_tokens=None,
             timeout=None,
             max_retries=2,
+            response_mime_type="application/json",
+            **kwargs,
         )
-        self.app = self._build_graph()
         
     def _preprocess_transcript_func(self, state):
-        """Preprocess the transcript into a structured format"""
-        transcript = state["transcript"]
-        
-        # Parse transcript into structured conversation
-        structured_conversation = self._parse_transcript(transcript)
-        
-        # Format the structured conversation for analysis
-        formatted_transcript = self._format_conversation(structured_conversation)
+        """Format the stored turns for analysis"""
+        formatted_transcript = self._format_conversation(state["turns"])
         
         messages = [
             {
                 "role": "user",
-                "content": f"Please analyze this conversation transcript:\n\n{formatted_transcript}\n\nCurrent system prompt:\n\n{state['current_prompt']}"
+                "content": f"Please analyze this conversation transcript:\n\n{formatted_transcript}"
             }
         ]
         
@@ -59,46 +136,6 @@ class TranscriptAnalyzer:
             "analysis": {}
         }
     
-    def _parse_transcript(self, transcript):
-        """Parse the transcript format where lines alternate between USER and AGENT"""
-        conversation = []
-        current_speaker = None
-        current_message = ""
-        
-        lines = transcript.split("\n")
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check if this line indicates a speaker change
-            if line.startswith("USER:"):
-                # Save previous message if exists
-                if current_speaker and current_message:
-                    conversation.append({"role": current_speaker, "text": current_message.strip()})
-                
-                # Start new user message
-                current_speaker = "user"
-                current_message = line[6:].strip()
-            elif line.startswith("AGENT:"):
-                # Save previous message if exists
-                if current_speaker and current_message:
-                    conversation.append({"role": current_speaker, "text": current_message.strip()})
-                
-                # Start new agent message
-                current_speaker = "agent"
-                current_message = line[7:].strip()
-            else:
-                # Continue current message
-                if current_speaker:
-                    current_message += " " + line
-        
-        # Add the last message
-        if current_speaker and current_message:
-            conversation.append({"role": current_speaker, "text": current_message.strip()})
-            
-        return conversation
-    
     def _format_conversation(self, structured_conversation):
         """Format the structured conversation for better analysis"""
         formatted = ""
@@ -108,33 +145,13 @@ class TranscriptAnalyzer:
         return formatted
     
     def _save_analysis_results_func(self, state):
-        """Save analysis results to a JSON file"""
-        transcript_path = state["transcript_path"]
-        
-        # Extract the directory path and filename
-        directory = os.path.dirname(transcript_path)
-        filename = os.path.basename(transcript_path)
-        filename_without_ext = os.path.splitext(filename)[0]
-        
-        # Get the analysis data
+        """Append analysis results to the date's analysis log"""
+        # Get the analysis data, tagged with the prompt version it was run against
         analysis_data = state.get("analysis", {})
+        if state.get("prompt_version"):
+            analysis_data = {**analysis_data, "prompt_version": state["prompt_version"]}
         
-        # Path to the JSON file
-        json_path = os.path.join(directory, "call_analysis.json")
-        
-        # Create or update the JSON file
-        if os.path.exists(json_path):
-            with open(json_path, 'r') as f:
-                data = json.load(f)
-        else:
-            data = {}
-        
-        # Add or update the analysis for this transcript
-        data[filename_without_ext] = analysis_data
-        
-        # Save the updated JSON
-        with open(json_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        self.results.append(state["date"], state["call_id"], analysis_data)
         
         return state
 
@@ -142,7 +159,7 @@ class TranscriptAnalyzer:
         # Create the main workflow graph
         graph = StateGraph(ConversationState)
         graph.add_node("preprocess", self._preprocess_transcript_func)
-        graph.add_node("analyze", self._analyze_transcript)
+        graph.add_node("analyze", RunnableLambda(self._analyze_transcript, afunc=self._aanalyze_transcript))
         graph.add_node("save_results", self._save_analysis_results_func)
 
         graph.add_edge(START, "preprocess")
@@ -152,98 +169,455 @@ class TranscriptAnalyzer:
 
         return graph.compile()
     
-    def _analyze_transcript(self, state):
-        """Analyze the transcript using the LLM"""
-        system_message = {
-            "role": "system",
+    def _prefix_text(self, current_prompt):
+        """Static part of every request: analysis instructions plus the agent prompt.
+        
+        It is identical for every transcript in a batch and always sent first,
+        so the provider can serve it from its prefix cache.
+        """
+        return f"{ANALYSIS_SYSTEM_MESSAGE}\n\nCurrent system prompt:\n\n{current_prompt}"
+    
+    def _model_for(self, cached_content=None, batch=False):
+        """Model configured for this kind of request, created on first use"""
+        if self._model_injected or (cached_content is None and not batch):
+            return self.model
+        key = (cached_content, batch)
+        if key not in self._models:
+            kwargs = {"response_schema": BATCH_RESPONSE_SCHEMA} if batch else {}
+            if cached_content:
+                kwargs["cached_content"] = cached_content
+            self._models[key] = self._create_model(**kwargs)
+        return self._models[key]
+    
+    def _drop_cached_model(self, model):
+        """The model's cached content is gone: forget it, so the next request creates a new cache"""
+        for (name, _), cached in list(self._models.items()):
+            if cached is model and name:
+                print(f"Context cache {name} is gone, recreating it on the next request")
+                self.context_cache.invalidate(name)
+                self._models = {key: value for key, value in self._models.items() if key[0] != name}
+                return
+    
+    def _model_and_prefix(self, current_prompt, batch=False):
+        """Model to call and the messages to send ahead of the conversation"""
+        prefix = self._prefix_text(current_prompt)
+        if self.context_cache is not None:
+            name = self.context_cache.get(prefix)
+            if name:
+                # The prefix lives server-side; requests only carry the transcript
+                return self._model_for(name, batch), []
+        return self._model_for(batch=batch), [{"role": "system", "content": prefix}]
+    
+    def _chunk_turns(self, turns):
+        """Split turns into chunks of at most ~max_transcript_tokens, overlapping by a few turns"""
+        chunks, current, size = [], [], 0
+        for turn in turns:
+            tokens = estimate_tokens(turn["text"]) + 2
+            if current and size + tokens > self.max_transcript_tokens:
+                chunks.append(current)
+                current = current[-self.chunk_overlap_turns:] if self.chunk_overlap_turns else []
+                size = sum(estimate_tokens(t["text"]) + 2 for t in current)
+            current.append(turn)
+            size += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+    
+    def _chunk_messages(self, state):
+        """Per-chunk user messages for an over-long transcript, or None if it fits in one request"""
+        if estimate_tokens(state["messages"][0]["content"]) <= self.max_transcript_tokens:
+            return None
+        chunks = self._chunk_turns(state["turns"])
+        if len(chunks) < 2:
+            return None
+        return [
+            {
+                "role": "user",
+                "content": (
+                    f"Please analyze part {i} of {len(chunks)} of a conversation transcript. "
+                    f"Only report what this part shows:\n\n{self._format_conversation(chunk)}"
+                ),
+            }
+            for i, chunk in enumerate(chunks, start=1)
+        ]
+    
+    def _reduce_message(self, partial_analyses):
+        """Ask the model to merge per-chunk analyses into one"""
+        return {
+            "role": "user",
             "content": (
-                "You are an expert in financial sales conversation analysis. "
-                "Analyze this conversation transcript and provide a structured analysis with the following format:"
-                "\n\n"
-                "1. First identify 2-3 key strengths of the agent in the conversation\n"
-                "2. Then identify 2-3 specific issues where the agent could improve\n"
-                "3. For each issue, provide a specific example from the transcript\n"
-                "4. For each issue, provide a specific recommendation for improvement\n"
-                "\n"
-                "Keep your analysis concise and focused on the most important points. Format your response "
-                "as a clean JSON object with the following structure:"
-                "\n\n"
-                "{\n"
-                "  \"strengths\": [\"strength 1\", \"strength 2\"],\n"
-                "  \"issues\": [\n"
-                "    {\n"
-                "      \"issue\": \"Description of issue 1\",\n"
-                "      \"example\": \"Specific example from transcript\",\n"
-                "      \"recommendation\": \"How to improve\"\n"
-                "    },\n"
-                "    {\n"
-                "      \"issue\": \"Description of issue 2\",\n"
-                "      \"example\": \"Specific example from transcript\",\n"
-                "      \"recommendation\": \"How to improve\"\n"
-                "    }\n"
-                "  ]\n"
-                "}"
-                "\n\n"
-                "Focus on identifying issues in the conversation where the agent failed to properly address user needs. "
-                "Look for misunderstandings, missing context, or prompt limitations. "
-                "Pay special attention to opportunities to collect key information about the client's "
-                "investment preferences, risk tolerance, and financial goals. "
-                "The transcripts may be incomplete with breaks, so make reasonable inferences about context."
-            )
+                "The following are analyses of consecutive parts of one long conversation. "
+                "Merge them into a single analysis of the whole conversation with the same JSON structure, "
+                "keeping only the 2-3 most important strengths and issues:\n\n"
+                f"{json.dumps(partial_analyses, indent=2)}"
+            ),
         }
+    
+    def _batch_message(self, states):
+        """One request carrying several short transcripts, each tagged with its call id"""
+        transcripts = "\n".join(
+            f"=== CALL {state['call_id']} ===\n{self._format_conversation(state['turns'])}" for state in states
+        )
+        return {
+            "role": "user",
+            "content": (
+                f"Please analyze each of the following {len(states)} conversation transcripts separately. "
+                "They are unrelated calls, so never use one call as evidence about another. "
+                "Return an object with an \"analyses\" list holding one analysis per transcript, "
+                "each with the same structure plus the transcript's \"call_id\":\n\n"
+                f"{transcripts}"
+            ),
+        }
+    
+    def _plan_batches(self, states, batch_tokens, max_call_tokens, max_batch_size):
+        """Pack short transcripts into batches of at most ``batch_tokens``.
         
-        # Create a new list with the system message and existing messages
-        messages = [system_message] + state["messages"]
+        Returns ``(batches, singles)``; longer transcripts, and any left
+        alone in a batch of one, are analyzed individually.
+        """
+        batches, singles, current, size = [], [], [], 0
+        for state in states:
+            tokens = estimate_tokens(state["messages"][0]["content"])
+            if tokens > max_call_tokens:
+                singles.append(state)
+                continue
+            if current and (size + tokens > batch_tokens or len(current) >= max_batch_size):
+                batches.append(current)
+                current, size = [], 0
+            current.append(state)
+            size += tokens
+        if current:
+            batches.append(current)
+        singles.extend(batch[0] for batch in batches if len(batch) == 1)
+        return [batch for batch in batches if len(batch) > 1], singles
+    
+    def _estimate_tokens(self, messages):
+        return sum(estimate_tokens(m["content"]) for m in messages)
+    
+    def _record_usage(self, estimated, response):
+        usage = getattr(response, "usage_metadata", None) or {}
+        self.stats.add("requests")
+        self.stats.record_usage(usage)
+        if self.rate_limiter:
+            self.rate_limiter.record_usage(estimated, usage.get("total_tokens"))
+    
+    def _invoke_model(self, messages, model=None):
+        """Invoke the model, respecting rate limits and backing off on 429s"""
+        model = model or self.model
+        estimated = self._estimate_tokens(messages)
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(estimated)
+            try:
+                response = model.invoke(messages)
+                self._record_usage(estimated, response)
+                return response
+            except Exception as e:
+                if self.context_cache is not None and is_missing_cache_error(e):
+                    self._drop_cached_model(model)
+                    raise
+                attempt += 1
+                if not is_rate_limit_error(e) or attempt > self.max_rate_limit_retries:
+                    raise
+                delay = rate_limit_backoff(attempt)
+                print(f"Rate limited by model API, retrying in {delay:.1f}s (attempt {attempt}/{self.max_rate_limit_retries})")
+                time.sleep(delay)
+    
+    async def _ainvoke_model(self, messages, model=None):
+        """Async version of _invoke_model"""
+        model = model or self.model
+        estimated = self._estimate_tokens(messages)
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.aacquire(estimated)
+            try:
+                response = await model.ainvoke(messages)
+                self._record_usage(estimated, response)
+                return response
+            except Exception as e:
+                if self.context_cache is not None and is_missing_cache_error(e):
+                    self._drop_cached_model(model)
+                    raise
+                attempt += 1
+                if not is_rate_limit_error(e) or attempt > self.max_rate_limit_retries:
+                    raise
+                delay = rate_limit_backoff(attempt)
+                print(f"Rate limited by model API, retrying in {delay:.1f}s (attempt {attempt}/{self.max_rate_limit_retries})")
+                await asyncio.sleep(delay)
+    
+    def _check_response(self, content):
+        """Validate a model reply against the analysis schema, counting local repairs"""
+        analysis, error, repaired = validate_analysis(content)
+        if analysis is not None and repaired:
+            self.stats.add("repaired")
+        return analysis, error
+    
+    def _reask_messages(self, messages, content, error):
+        """Follow-up asking the model to fix its own invalid reply"""
+        return messages + [
+            {"role": "assistant", "content": content},
+            {
+                "role": "user",
+                "content": (
+                    "Your reply did not match the required JSON structure:\n\n"
+                    f"{error}\n\n"
+                    "Reply with only the corrected JSON object."
+                ),
+            },
+        ]
+    
+    def _failed_analysis(self, content, error):
+        return {
+            "error": "Failed to parse response as JSON",
+            "validation_error": error,
+            "raw_analysis": content
+        }
+    
+    def _complete(self, messages, model):
+        """Request an analysis, re-asking once if the reply doesn't validate.
         
-        # Invoke the model to analyze the transcript
-        response = self.model.invoke(messages)
+        Returns ``(analysis, valid)``; when both attempts fail the analysis is
+        an error record carrying the raw reply.
+        """
+        response = self._invoke_model(messages, model)
+        analysis, error = self._check_response(response.content)
+        if analysis is not None:
+            return analysis, True
         
-        # Try to parse the response as JSON
-        try:
-            # Try to find JSON in the response
-            content = response.content
-            # Look for JSON pattern (between curly braces)
-            json_match = re.search(r'(\{.*\})', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-                analysis_data = json.loads(json_str)
-            else:
-                # If no JSON pattern found, try parsing the whole content
-                analysis_data = json.loads(content)
-                
-        except json.JSONDecodeError:
-            # If parsing fails, use the raw text and note the issue
-            analysis_data = {
-                "error": "Failed to parse response as JSON",
-                "raw_analysis": response.content
-            }
+        self.stats.add("parse_failures")
+        self.stats.add("reasks")
+        retry = self._invoke_model(self._reask_messages(messages, response.content, error), model)
+        analysis, error = self._check_response(retry.content)
+        if analysis is not None:
+            return analysis, True
+        self.stats.add("reask_failures")
+        return self._failed_analysis(retry.content, error), False
+    
+    async def _acomplete(self, messages, model):
+        """Async version of _complete"""
+        response = await self._ainvoke_model(messages, model)
+        analysis, error = self._check_response(response.content)
+        if analysis is not None:
+            return analysis, True
         
-        # Add the model's response to the messages
-        new_message = {"role": "assistant", "content": response.content}
+        self.stats.add("parse_failures")
+        self.stats.add("reasks")
+        retry = await self._ainvoke_model(self._reask_messages(messages, response.content, error), model)
+        analysis, error = self._check_response(retry.content)
+        if analysis is not None:
+            return analysis, True
+        self.stats.add("reask_failures")
+        return self._failed_analysis(retry.content, error), False
+    
+    def _analysis_result(self, state, analysis_data, valid=True):
+        """Record the analysis on the state"""
+        # Add the model's (validated) response to the messages
+        new_message = {"role": "assistant", "content": json.dumps(analysis_data)}
         updated_messages = state["messages"] + [new_message]
         
         return {
             **state,
             "messages": updated_messages,
-            "analysis": analysis_data
+            "analysis": analysis_data,
+            "analysis_valid": valid
         }
+    
+    def _cache_key(self, state):
+        return cache_key(
+            normalize_turns(state["turns"]),
+            state["current_prompt"],
+            ANALYSIS_SYSTEM_MESSAGE,
+            self.model_name,
+            self.temperature,
+        )
+    
+    def _cached_analysis(self, key):
+        if self.cache is None:
+            return None
+        content = self.cache.get(key)
+        if content is None:
+            return None
+        # Entries written before schema validation may hold unusable raw text
+        analysis, _ = self._check_response(content)
+        return analysis
+    
+    def _cache_analysis(self, key, analysis):
+        if self.cache is not None:
+            self.cache.put(key, json.dumps(analysis))
+    
+    def _analyze_transcript(self, state):
+        """Analyze the transcript using the LLM"""
+        key = self._cache_key(state)
+        analysis = self._cached_analysis(key)
+        valid = True
+        if analysis is None:
+            model, prefix = self._model_and_prefix(state["current_prompt"])
+            chunk_messages = self._chunk_messages(state)
+            if chunk_messages is None:
+                analysis, valid = self._complete(prefix + state["messages"], model)
+            else:
+                # Map over chunks, then reduce the partial analyses
+                partials = [self._complete(prefix + [message], model)[0] for message in chunk_messages]
+                analysis, valid = self._complete(prefix + [self._reduce_message(partials)], model)
+            # Failed parses aren't cached, and callers get AnalysisParseError so the call is retried
+            if valid:
+                self._cache_analysis(key, analysis)
+        return self._analysis_result(state, analysis, valid)
+    
+    async def _aanalyze_uncached(self, state):
+        """Request an analysis for one transcript, chunking it if it's too long"""
+        model, prefix = self._model_and_prefix(state["current_prompt"])
+        chunk_messages = self._chunk_messages(state)
+        if chunk_messages is None:
+            return await self._acomplete(prefix + state["messages"], model)
+        # Map over chunks concurrently, then reduce the partial analyses
+        chunk_results = await asyncio.gather(
+            *(self._acomplete(prefix + [message], model) for message in chunk_messages)
+        )
+        partials = [partial for partial, _ in chunk_results]
+        return await self._acomplete(prefix + [self._reduce_message(partials)], model)
+    
+    async def _aanalyze_transcript(self, state):
+        """Analyze the transcript using the LLM without blocking the event loop"""
+        key = self._cache_key(state)
+        analysis = self._cached_analysis(key)
+        valid = True
+        if analysis is None:
+            analysis, valid = await self._aanalyze_uncached(state)
+            if valid:
+                self._cache_analysis(key, analysis)
+        return self._analysis_result(state, analysis, valid)
+    
+    def _finish(self, state, analysis, valid=True):
+        """Cache and save an analysis produced outside the graph; an invalid one is returned as AnalysisParseError"""
+        if valid:
+            self._cache_analysis(self._cache_key(state), analysis)
+        self._save_analysis_results_func(self._analysis_result(state, analysis, valid))
+        return state["call_id"], analysis if valid else AnalysisParseError(state["call_id"], analysis)
+    
+    async def _aanalyze_single(self, state):
+        analysis, valid = await self._aanalyze_uncached(state)
+        return [self._finish(state, analysis, valid)]
+    
+    async def _aanalyze_batch(self, states):
+        """Analyze several transcripts in one request.
+        
+        Calls missing from the reply, or all of them if it doesn't validate,
+        fall back to being analyzed individually.
+        """
+        model, prefix = self._model_and_prefix(states[0]["current_prompt"], batch=True)
+        response = await self._ainvoke_model(prefix + [self._batch_message(states)], model)
+        self.stats.add("batches")
+        self.stats.add("batched_calls", len(states))
+        analyses, error = validate_batch(response.content)
+        if error:
+            print(f"Warning: invalid batched analysis, analyzing {len(states)} call(s) individually: {error}")
+        
+        results = [self._finish(state, analyses[state["call_id"]]) for state in states if state["call_id"] in analyses]
+        missing = [state for state in states if state["call_id"] not in analyses]
+        if missing:
+            self.stats.add("batch_fallbacks", len(missing))
+            for single in await asyncio.gather(*(self._aanalyze_single(state) for state in missing)):
+                results.extend(single)
+        return results
 
-    def analyze_transcript(self, transcript_path: str, current_prompt: str) -> Dict[str, Any]:
-        with open(transcript_path, 'r', encoding='utf-8') as f:
-            transcript = f.read()
+    def _initial_state(self, call_id: str, current_prompt: str, prompt_version: str = None) -> ConversationState:
+        call = self.store.get_call(call_id)
+        if call is None:
+            raise ValueError(f"Call {call_id} not found in transcript store")
             
-        initial_state = {
-            "transcript": transcript,
+        return {
+            "turns": self.store.get_turns(call_id),
             "current_prompt": current_prompt,
             "messages": [],
             "analysis": {},
+            "analysis_valid": True,
             "active_agent": "",
-            "transcript_path": transcript_path
+            "call_id": call_id,
+            "date": call["date"],
+            "prompt_version": prompt_version or ""
         }
 
-        result = self.app.invoke(initial_state)
+    def analyze_call(self, call_id: str, current_prompt: str, prompt_version: str = None) -> Dict[str, Any]:
+        """Analyze a call from the transcript store.
+
+        Raises AnalysisParseError if the model's reply never validated (its error record is still saved).
+        """
+        result = self.app.invoke(self._initial_state(call_id, current_prompt, prompt_version))
+        if not result.get("analysis_valid", True):
+            raise AnalysisParseError(call_id, result["analysis"])
         return result["analysis"]
 
+    async def aanalyze_calls(self, call_ids: Iterable[str], current_prompt: str, prompt_version: str = None, max_concurrency: int = 4):
+        """Analyze many calls concurrently through the graph's async batch path.
+
+        Yields ``(call_id, analysis_or_exception)`` as each call finishes;
+        replies that never validated come back as AnalysisParseError.
+        """
+        call_ids = list(call_ids)
+        states = [self._initial_state(call_id, current_prompt, prompt_version) for call_id in call_ids]
+        async for index, result in self.app.abatch_as_completed(
+            states,
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True,
+        ):
+            if isinstance(result, Exception):
+                yield call_ids[index], result
+            elif not result.get("analysis_valid", True):
+                yield call_ids[index], AnalysisParseError(call_ids[index], result["analysis"])
+            else:
+                yield call_ids[index], result["analysis"]
+
+    async def aanalyze_calls_batched(
+        self,
+        call_ids: Iterable[str],
+        current_prompt: str,
+        prompt_version: str = None,
+        max_concurrency: int = 4,
+        batch_tokens: int = 8000,
+        max_call_tokens: int = 2000,
+        max_batch_size: int = 10,
+    ):
+        """Like aanalyze_calls, but packs short transcripts several to a request.
+        
+        Transcripts up to ``max_call_tokens`` are grouped into requests of at
+        most ``batch_tokens`` and ``max_batch_size`` calls, so the shared prefix
+        and round trip are paid once per batch. Every call still gets its own
+        cached and saved result. Yields ``(call_id, analysis_or_exception)``.
+        """
+        states = []
+        for call_id in call_ids:
+            state = self._preprocess_transcript_func(self._initial_state(call_id, current_prompt, prompt_version))
+            analysis = self._cached_analysis(self._cache_key(state))
+            if analysis is None:
+                states.append(state)
+            else:
+                self._save_analysis_results_func(self._analysis_result(state, analysis))
+                yield call_id, analysis
+        
+        batches, singles = self._plan_batches(states, batch_tokens, max_call_tokens, max_batch_size)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run(group, work):
+            async with semaphore:
+                try:
+                    return await work
+                except Exception as e:
+                    return [(state["call_id"], e) for state in group]
+        
+        tasks = [run(batch, self._aanalyze_batch(batch)) for batch in batches]
+        tasks += [run([state], self._aanalyze_single(state)) for state in singles]
+        for finished in asyncio.as_completed(tasks):
+            for call_id, result in await finished:
+                yield call_id, result
+
+    def analyze_transcript(self, transcript_path: str, current_prompt: str, prompt_version: str = None) -> Dict[str, Any]:
+        """Analyze a legacy .txt transcript, importing it into the store first"""
+        call = self.store.import_text_transcript(transcript_path)
+        return self.analyze_call(call["call_id"], current_prompt, prompt_version)
+
 if __name__ == "__main__":
     import os
     
@@ -269,4 +643,5 @@ if __name__ == "__main__":
     analyzer = TranscriptAnalyzer(api_key)
     result = analyzer.analyze_transcript(text_file_path, current_prompt)
     
-    print(f"Analysis completed and saved to {os.path.dirname(text_file_path)}/call_analysis.json")
\ No newline at end of file
+    date = os.path.basename(os.path.dirname(text_file_path))
+    print(f"Analysis completed and saved to {analyzer.results.compact(date)}")
\ No newline at end of file
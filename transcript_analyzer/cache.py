@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_results (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_results_last_used ON llm_results (last_used);
+"""
+
+
+def normalize_turns(turns: List[Dict[str, Any]]) -> str:
+    """Canonical text for a conversation: one line per turn, whitespace collapsed"""
+    return "\n".join(f"{turn['role']}:{' '.join(turn['text'].split())}" for turn in turns)
+
+
+def cache_key(transcript: str, prompt: str, system_message: str, model: str, temperature: float) -> str:
+    """Content address for one analysis request"""
+    payload = json.dumps(
+        {
+            "transcript": transcript,
+            "prompt": prompt,
+            "system_message": system_message,
+            "model": model,
+            "temperature": temperature,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Persistent cache of raw model responses, keyed by ``cache_key``.
+
+    Entries older than ``max_age`` seconds are dropped, and once the cache
+    holds more than ``max_entries`` the least recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str = "transcripts/analysis_cache.db",
+        max_entries: int = 10000,
+        max_age: float = 30 * 24 * 3600,
+        evict_every: int = 100,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.evict_every = evict_every
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self.evict()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, created_at FROM llm_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE llm_results SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, content: str):
+        now = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_results (key, content, created_at, last_used, size) VALUES (?, ?, ?, ?, ?)",
+                    (key, content, now, now, len(content)),
+                )
+            self._puts += 1
+            due = self._puts % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then the least recently used ones above ``max_entries``"""
+        with self._lock, self._conn:
+            removed = self._conn.execute(
+                "DELETE FROM llm_results WHERE created_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+            removed += self._conn.execute(
+                "DELETE FROM llm_results WHERE key IN ("
+                "SELECT key FROM llm_results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_results"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
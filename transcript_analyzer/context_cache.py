@@ -0,0 +1,94 @@
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+def is_missing_cache_error(error: Exception) -> bool:
+    """True when a request failed because its cached content expired or was deleted"""
+    message = str(error)
+    return "CachedContent" in message and ("not found" in message.lower() or "NOT_FOUND" in message or "403" in message)
+
+
+class GeminiContextCache:
+    """Explicit Gemini context caching for the static analysis prefix.
+
+    Creates one cached-content entry per distinct prefix (system message +
+    agent prompt) and returns its resource name, so a batch of analyses only
+    pays full price for the prefix once. Requires the optional ``google-genai``
+    package; when it's missing, or the API refuses (e.g. the prefix is below
+    the minimum cacheable size), ``get`` returns None and callers fall back to
+    sending the prefix inline, which still benefits from implicit caching.
+
+    Entries live for ``ttl_seconds`` on the server. Once less than
+    ``refresh_fraction`` of that is left, ``get`` extends the TTL (or creates
+    a new entry if that fails), and ``invalidate`` forgets an entry the API
+    reports missing.
+    """
+
+    def __init__(self, api_key: str, model_name: str, ttl_seconds: int = 3600, refresh_fraction: float = 0.1):
+        self.api_key = api_key
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.refresh_fraction = refresh_fraction
+        # Prefix hash -> (cache name, or None if caching failed; monotonic expiry)
+        self._names: Dict[str, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from google import genai
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    def get(self, prefix: str) -> Optional[str]:
+        key = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+        with self._lock:
+            now = time.monotonic()
+            if key in self._names:
+                name, expires_at = self._names[key]
+                if name is None or now < expires_at - self.ttl_seconds * self.refresh_fraction:
+                    return name
+                if self._extend(name):
+                    self._names[key] = (name, now + self.ttl_seconds)
+                    return name
+            name = self._create(prefix)
+            # Remember failures too, so we don't retry for every transcript
+            self._names[key] = (name, now + self.ttl_seconds)
+            return name
+
+    def invalidate(self, name: str):
+        """Forget a cache entry the API no longer has; the next ``get`` creates a new one"""
+        with self._lock:
+            self._names = {key: entry for key, entry in self._names.items() if entry[0] != name}
+
+    def _extend(self, name: str) -> bool:
+        try:
+            from google.genai import types
+            self._get_client().caches.update(
+                name=name,
+                config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s"),
+            )
+            return True
+        except Exception as e:
+            print(f"Warning: could not extend context cache {name}, creating a new one: {str(e)}")
+            return False
+
+    def _create(self, prefix: str) -> Optional[str]:
+        try:
+            from google.genai import types
+            cache = self._get_client().caches.create(
+                model=self.model_name,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=prefix,
+                    ttl=f"{self.ttl_seconds}s",
+                ),
+            )
+            print(f"Created context cache {cache.name} for analysis prefix")
+            return cache.name
+        except ImportError:
+            print("Warning: google-genai not installed, sending analysis prefix inline")
+        except Exception as e:
+            print(f"Warning: could not create context cache, sending analysis prefix inline: {str(e)}")
+        return None
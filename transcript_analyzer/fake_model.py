@@ -0,0 +1,74 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from langchain_core.messages import AIMessage
+
+from .rate_limit import estimate_tokens
+
+
+class FakeAnalysisModel:
+    """Offline stand-in for the chat model, for tests and dry runs.
+
+    It answers every request with a small, valid analysis JSON and reports
+    ``usage_metadata`` like the real model. To make prefix reuse observable,
+    the leading system message counts as ``cache_read`` input tokens whenever
+    the same prefix has been seen before. Pass a string as ``response`` to
+    reply with that raw text instead, e.g. to exercise output repair.
+    Batched requests get one copy of the analysis per call id.
+    """
+
+    def __init__(self, response: Optional[Union[Dict[str, Any], str]] = None):
+        self.response = response or {
+            "strengths": ["Clear greeting"],
+            "issues": [
+                {
+                    "issue": "Did not confirm the client's goals",
+                    "example": "n/a",
+                    "recommendation": "Ask about goals before pitching",
+                }
+            ],
+        }
+        self.calls: List[List[Dict[str, Any]]] = []
+        self._seen_prefixes = set()
+
+    def _respond(self, messages) -> AIMessage:
+        messages = [self._as_dict(m) for m in messages]
+        self.calls.append(messages)
+
+        prefix = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+        input_tokens = sum(estimate_tokens(m["content"]) for m in messages)
+        cache_read = estimate_tokens(prefix) if prefix and prefix in self._seen_prefixes else 0
+        if prefix:
+            self._seen_prefixes.add(prefix)
+
+        # Batched requests tag each transcript with its call id
+        call_ids = re.findall(r"^=== CALL (.+) ===$", messages[-1]["content"], re.MULTILINE) if messages else []
+        if isinstance(self.response, str):
+            content = self.response
+        elif call_ids:
+            content = json.dumps({"analyses": [{"call_id": call_id, **self.response} for call_id in call_ids]})
+        else:
+            content = json.dumps(self.response)
+        output_tokens = estimate_tokens(content)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+                "input_token_details": {"cache_read": cache_read},
+            },
+        )
+
+    def _as_dict(self, message) -> Dict[str, Any]:
+        if isinstance(message, dict):
+            return message
+        role = {"human": "user", "ai": "assistant"}.get(message.type, message.type)
+        return {"role": role, "content": message.content}
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        return self._respond(messages)
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        return self._respond(messages)
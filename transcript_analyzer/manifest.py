@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .cache import normalize_turns
+
+PENDING = "pending"
+DONE = "done"
+ERROR = "error"
+
+# Lives in the transcript store's database so pending work is a single indexed join
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_manifest (
+    call_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    content_hash TEXT,
+    prompt_version TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    analyzed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_manifest_date_status ON analysis_manifest (date, status);
+
+CREATE TABLE IF NOT EXISTS legacy_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    call_id TEXT
+);
+
+CREATE TABLE IF NOT EXISTS legacy_dirs (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL
+);
+"""
+
+
+def content_hash(turns: List[Dict[str, Any]]) -> str:
+    return hashlib.sha256(normalize_turns(turns).encode("utf-8")).hexdigest()
+
+
+class AnalysisManifest:
+    """Persistent record of what has been analyzed, so runs only touch new or changed calls.
+
+    Per call it keeps the stored transcript's ``saved_at`` and content hash,
+    the prompt version it was analyzed against and the analysis status.
+    Legacy ``.txt`` transcripts are tracked by path, size and mtime, and whole
+    date directories by mtime, so unchanged history is never re-listed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def pending_calls(self, since: str, until: str) -> List[Dict[str, Any]]:
+        """Calls in [since, until] never analyzed, re-saved since analysis, or previously failed"""
+        with self._lock:
+            rows = self._conn.execute(
+                # Only a successful analysis counts; a failed one is retried even if the content is unchanged
+                "SELECT c.call_id, c.date, c.saved_at, c.message_count, m.status AS last_status, "
+                "CASE WHEN m.status = ? THEN m.content_hash END AS analyzed_hash "
+                "FROM calls c LEFT JOIN analysis_manifest m ON m.call_id = c.call_id "
+                "WHERE c.date BETWEEN ? AND ? "
+                "AND (m.call_id IS NULL OR m.status != ? OR m.saved_at != c.saved_at) "
+                "ORDER BY c.saved_at",
+                (DONE, since, until, DONE),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark(self, call: Dict[str, Any], status: str, content_hash: Optional[str] = None,
+             prompt_version: Optional[str] = None, error: Optional[str] = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_manifest "
+                "(call_id, date, saved_at, content_hash, prompt_version, status, error, analyzed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (call["call_id"], call["date"], call["saved_at"], content_hash, prompt_version,
+                 status, error, time.time() if status == DONE else None),
+            )
+
+    def invalidate(self, call_id: str):
+        """Force a call to be re-analyzed on the next run"""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE analysis_manifest SET status = ? WHERE call_id = ?", (PENDING, call_id))
+
+    def counts(self, since: str, until: str) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM analysis_manifest WHERE date BETWEEN ? AND ? GROUP BY status",
+                (since, until),
+            ).fetchall()
+        return dict(rows)
+
+    # Legacy text transcripts
+
+    def sync_legacy_files(self, transcripts_dir: str, since: str, until: str, import_file: Callable[[str], str]) -> int:
+        """Import new or changed legacy .txt files in date directories within range.
+
+        ``import_file(path)`` imports one file and returns its call id. A date
+        directory whose mtime hasn't changed since its last clean sync is skipped
+        without being listed: nothing writes .txt transcripts any more, so new or
+        replaced files (added, copied or saved via rename) are what we look for.
+        Returns the number of files imported.
+        """
+        if not os.path.exists(transcripts_dir):
+            return 0
+
+        with self._lock:
+            known_dirs = dict(self._conn.execute("SELECT path, mtime FROM legacy_dirs").fetchall())
+            known_files = {
+                row["path"]: (row["size"], row["mtime"])
+                for row in self._conn.execute("SELECT path, size, mtime FROM legacy_files").fetchall()
+            }
+
+        imported = 0
+        for entry in os.scandir(transcripts_dir):
+            if not entry.is_dir() or not (since <= entry.name <= until):
+                continue
+            dir_mtime = entry.stat().st_mtime
+            if known_dirs.get(entry.path) == dir_mtime:
+                continue
+
+            clean = True
+            for file_entry in os.scandir(entry.path):
+                if not file_entry.name.endswith(".txt"):
+                    continue
+                stat = file_entry.stat()
+                if known_files.get(file_entry.path) == (stat.st_size, stat.st_mtime):
+                    continue
+                try:
+                    call_id = import_file(file_entry.path)
+                    self.record_legacy_file(file_entry.path, call_id)
+                    imported += 1
+                except Exception as e:
+                    clean = False
+                    print(f"Error importing {file_entry.path}: {str(e)}")
+
+            # Only skip this directory next time if everything in it was imported
+            if clean:
+                with self._lock, self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO legacy_dirs (path, mtime) VALUES (?, ?)", (entry.path, dir_mtime)
+                    )
+        return imported
+
+    def record_legacy_file(self, path: str, call_id: Optional[str]):
+        stat = os.stat(path)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO legacy_files (path, size, mtime, call_id) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, call_id),
+            )
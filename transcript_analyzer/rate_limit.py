@@ -0,0 +1,92 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute`` tokens per minute.
+
+    ``reserve`` always succeeds and returns how long the caller must wait
+    before using what it reserved, so callers are served in arrival order
+    even when a single request asks for more than the bucket holds.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """Give back (positive) or charge extra (negative) tokens after the fact"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for LLM calls (0 disables a limit)"""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def _reserve(self, tokens: int) -> float:
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(tokens))
+        return wait
+
+    def acquire(self, tokens: int):
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int):
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated: int, actual: Optional[int]):
+        """Reconcile the up-front token estimate with the usage the API reported"""
+        if self.tokens and actual is not None:
+            self.tokens.adjust(estimated - actual)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for 429 / quota-exhausted errors from the model provider"""
+    name = type(error).__name__
+    message = str(error)
+    return (
+        "ResourceExhausted" in name
+        or "RateLimit" in name
+        or "429" in message
+        or "RESOURCE_EXHAUSTED" in message
+    )
+
+
+def rate_limit_backoff(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    """Exponential backoff with jitter for the given (1-based) retry attempt"""
+    delay = min(cap, base * (2 ** (attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
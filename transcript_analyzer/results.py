@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Set
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+LOG_FILENAME = "call_analysis.jsonl"
+COMPACTED_FILENAME = "call_analysis.json"
+
+
+class AnalysisResultStore:
+    """Append-only analysis log, one JSONL file per date directory.
+
+    Each analysis is a single appended line, so saving is O(1) regardless of
+    how many calls a day has, and concurrent analyzers (threads or processes)
+    can't clobber each other. ``compact`` folds the log into the aggregated
+    ``call_analysis.json`` view, written atomically.
+    """
+
+    def __init__(self, base_dir: str = "transcripts"):
+        self.base_dir = base_dir
+        self._lock = threading.Lock()
+        self._analyzed: Dict[str, Set[str]] = {}
+
+    def _log_path(self, date: str) -> str:
+        return os.path.join(self.base_dir, date, LOG_FILENAME)
+
+    def _compacted_path(self, date: str) -> str:
+        return os.path.join(self.base_dir, date, COMPACTED_FILENAME)
+
+    def append(self, date: str, call_id: str, analysis: Dict[str, Any]):
+        """Append one call's analysis to the date's log"""
+        record = {"call_id": call_id, "analyzed_at": time.time(), "analysis": analysis}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+        directory = os.path.join(self.base_dir, date)
+        os.makedirs(directory, exist_ok=True)
+
+        with self._lock:
+            fd = os.open(self._log_path(date), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            if date in self._analyzed:
+                self._analyzed[date].add(call_id)
+
+    def iter_records(self, date: str):
+        """Yield every record in the date's log, oldest first"""
+        path = self._log_path(date)
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash; everything before it is intact
+                    print(f"Warning: skipping unreadable line in {path}")
+
+    def analyzed_ids(self, date: str) -> Set[str]:
+        """Call ids already analyzed for a date. Loaded once, then kept up to date by ``append``"""
+        with self._lock:
+            if date in self._analyzed:
+                return self._analyzed[date]
+
+        ids = {record["call_id"] for record in self.iter_records(date)}
+
+        # Entries from the old read-modify-write file still count as analyzed
+        compacted_path = self._compacted_path(date)
+        if os.path.exists(compacted_path):
+            try:
+                with open(compacted_path, "r") as f:
+                    ids.update(json.load(f).keys())
+            except json.JSONDecodeError:
+                print(f"Warning: Could not parse JSON in {compacted_path}")
+
+        with self._lock:
+            self._analyzed.setdefault(date, set()).update(ids)
+            return self._analyzed[date]
+
+    def is_analyzed(self, date: str, call_id: str) -> bool:
+        return call_id in self.analyzed_ids(date)
+
+    def compact(self, date: str) -> str:
+        """Write the aggregated ``call_analysis.json`` view (latest analysis per call)"""
+        compacted_path = self._compacted_path(date)
+        data = {}
+        if os.path.exists(compacted_path):
+            try:
+                with open(compacted_path, "r") as f:
+                    data = json.load(f)
+            except json.JSONDecodeError:
+                print(f"Warning: Could not parse JSON in {compacted_path}, rebuilding from log")
+
+        for record in self.iter_records(date):
+            data[record["call_id"]] = record["analysis"]
+
+        tmp_path = f"{compacted_path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, compacted_path)
+        return compacted_path
@@ -0,0 +1,184 @@
+import json
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError
+
+
+class Issue(BaseModel):
+    issue: str = Field(description="Description of the issue")
+    example: str = Field(description="Specific example from the transcript")
+    recommendation: str = Field(description="How to improve")
+
+
+class CallAnalysis(BaseModel):
+    strengths: List[str] = Field(description="2-3 key strengths of the agent")
+    issues: List[Issue] = Field(description="2-3 specific issues where the agent could improve")
+
+
+class BatchItem(CallAnalysis):
+    call_id: str = Field(description="Id of the call this analysis belongs to")
+
+
+class BatchAnalysis(BaseModel):
+    analyses: List[BatchItem]
+
+
+# The same shape in the OpenAPI subset Gemini's structured output accepts
+# (no $defs/$ref, which pydantic's generated schema uses for Issue)
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "strengths": {"type": "array", "items": {"type": "string"}},
+        "issues": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "issue": {"type": "string"},
+                    "example": {"type": "string"},
+                    "recommendation": {"type": "string"},
+                },
+                "required": ["issue", "example", "recommendation"],
+            },
+        },
+    },
+    "required": ["strengths", "issues"],
+}
+
+BATCH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "analyses": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"call_id": {"type": "string"}, **RESPONSE_SCHEMA["properties"]},
+                "required": ["call_id", "strengths", "issues"],
+            },
+        },
+    },
+    "required": ["analyses"],
+}
+
+
+def _extract_object(text: str) -> Optional[str]:
+    """Return the first balanced {...} block in text, ignoring braces inside strings"""
+    start = text.find("{")
+    while start != -1:
+        depth, in_string, escaped = 0, False, False
+        for i in range(start, len(text)):
+            char = text[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    return text[start:i + 1]
+        start = text.find("{", start + 1)
+    return None
+
+
+def _repair(text: str) -> str:
+    """Cheap local fixes for common model output problems"""
+    text = text.strip()
+    # Markdown code fences
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    extracted = _extract_object(text)
+    if extracted:
+        text = extracted
+    # Trailing commas before a closing bracket
+    return re.sub(r",\s*([}\]])", r"\1", text)
+
+
+def _validate(content: str, schema) -> Tuple[Optional[BaseModel], Optional[str], bool]:
+    error = None
+    for repaired, candidate in ((False, content), (True, None)):
+        if candidate is None:
+            candidate = _repair(content)
+        try:
+            return schema.model_validate(json.loads(candidate)), None, repaired
+        except json.JSONDecodeError as e:
+            error = f"Invalid JSON: {e}"
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc'])) or 'root'}: {err['msg']}" for err in e.errors())
+    return None, error, True
+
+
+class AnalysisParseError(ValueError):
+    """The model's reply didn't validate, even after a re-ask.
+
+    ``analysis`` is the error record (with the raw reply) that was saved for the call.
+    """
+
+    def __init__(self, call_id: str, analysis: Dict[str, Any]):
+        super().__init__(f"Invalid analysis for {call_id}: {analysis.get('validation_error')}")
+        self.call_id = call_id
+        self.analysis = analysis
+
+
+def validate_analysis(content: str) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+    """Validate model output against CallAnalysis.
+
+    Returns ``(analysis, error, repaired)``: the validated analysis (or None),
+    the last error message, and whether the local repair pass was needed.
+    """
+    analysis, error, repaired = _validate(content, CallAnalysis)
+    return (analysis.model_dump() if analysis else None), error, repaired
+
+
+def validate_batch(content: str) -> Tuple[Dict[str, Dict[str, Any]], Optional[str]]:
+    """Validate a batched reply, returning analyses keyed by call id and any error"""
+    batch, error, _ = _validate(content, BatchAnalysis)
+    if batch is None:
+        return {}, error
+    return {item.call_id: item.model_dump(exclude={"call_id"}) for item in batch.analyses}, None
+
+
+class AnalysisStats:
+    """Per-run counters for model usage and output validation"""
+
+    FIELDS = (
+        "requests",
+        "parse_failures",
+        "repaired",
+        "reasks",
+        "reask_failures",
+        "batches",
+        "batched_calls",
+        "batch_fallbacks",
+        "input_tokens",
+        "output_tokens",
+        "cached_input_tokens",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, field: str, amount: int = 1):
+        with self._lock:
+            self._counts[field] += amount
+
+    def record_usage(self, usage: Dict[str, Any]):
+        if not usage:
+            return
+        details = usage.get("input_token_details") or {}
+        with self._lock:
+            self._counts["input_tokens"] += usage.get("input_tokens", 0) or 0
+            self._counts["output_tokens"] += usage.get("output_tokens", 0) or 0
+            self._counts["cached_input_tokens"] += details.get("cache_read", 0) or 0
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
@@ -0,0 +1,267 @@
+"""Structured SQLite store for call transcripts, shared by the webhook writer and the analyzer."""
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+DEFAULT_STORE_PATH = "transcripts/transcripts.db"
+
+# Ultravox message roles we keep, mapped to the store's role names
+ROLE_MAP = {
+    "MESSAGE_ROLE_USER": "user",
+    "MESSAGE_ROLE_AGENT": "agent",
+}
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_id TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    created TEXT,
+    ended TEXT,
+    prompt_version TEXT,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_date ON calls (date);
+CREATE INDEX IF NOT EXISTS idx_calls_prompt_version ON calls (prompt_version);
+
+CREATE TABLE IF NOT EXISTS messages (
+    call_id TEXT NOT NULL,
+    stage_index INTEGER NOT NULL,
+    ordinal INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    medium TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    PRIMARY KEY (call_id, stage_index, ordinal)
+);
+"""
+
+
+def message_to_row(msg: Dict[str, Any], ordinal: int) -> Optional[Dict[str, Any]]:
+    """Convert an Ultravox message into a store row, or None to skip it"""
+    role = ROLE_MAP.get(msg.get("role"))
+    text = msg.get("text", "")
+    if not role or not text:
+        return None
+    timespan = msg.get("timespan") or {}
+    return {
+        "ordinal": msg.get("callStageMessageIndex", ordinal),
+        "role": role,
+        "text": text,
+        "medium": msg.get("medium"),
+        "start_time": timespan.get("start"),
+        "end_time": timespan.get("end"),
+    }
+
+
+class TranscriptStore:
+    """Calls and their ordered turns, indexed by call_id, date and prompt version.
+
+    Messages can be written page by page (and stage by stage, concurrently);
+    a call only becomes visible to readers once ``finalize_call`` writes its
+    row, so a half-fetched transcript is never analyzed.
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # Writer side
+
+    def begin_call(self, call_id: str):
+        """Discard anything left from a previous, unfinished attempt at this call"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM calls WHERE call_id = ?", (call_id,))
+            self._conn.execute("DELETE FROM messages WHERE call_id = ?", (call_id,))
+
+    def add_messages(self, call_id: str, stage_index: int, rows: List[Dict[str, Any]]):
+        """Append a page of message rows for one stage"""
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO messages (call_id, stage_index, ordinal, role, text, medium, start_time, end_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (call_id, stage_index, r["ordinal"], r["role"], r["text"], r["medium"], r["start_time"], r["end_time"])
+                    for r in rows
+                ],
+            )
+
+    def finalize_call(
+        self,
+        call_id: str,
+        created: Optional[str] = None,
+        ended: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        saved_at: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Write the call row, making the transcript visible to readers"""
+        saved_at = (saved_at or datetime.now(timezone.utc)).astimezone(IST)
+        with self._lock, self._conn:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM messages WHERE call_id = ?", (call_id,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO calls (call_id, date, saved_at, created, ended, prompt_version, message_count, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    call_id,
+                    saved_at.strftime("%Y-%m-%d"),
+                    saved_at.isoformat(),
+                    created,
+                    ended,
+                    prompt_version,
+                    count,
+                    json.dumps(metadata or {}),
+                ),
+            )
+        return self.get_call(call_id)
+
+    # Reader side
+
+    def get_call(self, call_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM calls WHERE call_id = ?", (call_id,)).fetchone()
+        return self._call_from_row(row) if row else None
+
+    def list_calls(
+        self,
+        date: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """List calls, optionally filtered by exact date, date range (inclusive) or prompt version"""
+        clauses, params = [], []
+        if date:
+            clauses.append("date = ?")
+            params.append(date)
+        if since:
+            clauses.append("date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("date <= ?")
+            params.append(until)
+        if prompt_version:
+            clauses.append("prompt_version = ?")
+            params.append(prompt_version)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM calls {where} ORDER BY saved_at", params).fetchall()
+        return [self._call_from_row(row) for row in rows]
+
+    def get_turns(self, call_id: str) -> List[Dict[str, Any]]:
+        """Return the call's turns in conversation order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, text, start_time, end_time FROM messages WHERE call_id = ? ORDER BY stage_index, ordinal",
+                (call_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def _call_from_row(self, row) -> Dict[str, Any]:
+        call = dict(row)
+        call["metadata"] = json.loads(call["metadata"] or "{}")
+        return call
+
+    # Legacy text transcripts
+
+    def import_text_transcript(self, transcript_path: str, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Import a legacy ``HH-MM-SS_<callId>.txt`` transcript, returning the stored call.
+
+        Already-imported calls are returned as-is without re-reading the file,
+        unless ``force`` is set (e.g. because the file changed).
+        """
+        filename = os.path.splitext(os.path.basename(transcript_path))[0]
+        match = re.match(r"^(\d{2}-\d{2}-\d{2})_(.+)$", filename)
+        call_id = match.group(2) if match else filename
+
+        existing = self.get_call(call_id)
+        if existing and not force:
+            return existing
+
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            turns = parse_text_transcript(f.read())
+
+        date = os.path.basename(os.path.dirname(transcript_path))
+        try:
+            time_part = match.group(1).replace("-", ":") if match else "00:00:00"
+            saved_at = datetime.fromisoformat(f"{date}T{time_part}").replace(tzinfo=IST)
+        except ValueError:
+            saved_at = datetime.fromtimestamp(os.path.getmtime(transcript_path), IST)
+
+        self.begin_call(call_id)
+        self.add_messages(
+            call_id,
+            0,
+            [
+                {"ordinal": i, "role": t["role"], "text": t["text"], "medium": None, "start_time": None, "end_time": None}
+                for i, t in enumerate(turns)
+            ],
+        )
+        return self.finalize_call(call_id, metadata={"imported_from": transcript_path}, saved_at=saved_at)
+
+
+def parse_text_transcript(transcript: str) -> List[Dict[str, str]]:
+    """Parse the legacy text format where lines alternate between USER and AGENT"""
+    conversation = []
+    current_speaker = None
+    current_parts = []
+
+    def finish():
+        text = " ".join(current_parts).strip()
+        # The writer wrapped each message in double quotes
+        if len(text) >= 2 and text[0] == text[-1] == '"':
+            text = text[1:-1]
+        conversation.append({"role": current_speaker, "text": text})
+
+    for line in transcript.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith("USER:") or line.startswith("AGENT:"):
+            # Save previous message if exists
+            if current_speaker and current_parts:
+                finish()
+            current_speaker = "user" if line.startswith("USER:") else "agent"
+            current_parts = [line.split(":", 1)[1].strip()]
+        elif current_speaker:
+            # Continue current message
+            current_parts.append(line)
+
+    # Add the last message
+    if current_speaker and current_parts:
+        finish()
+
+    return conversation
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store(path: Optional[str] = None) -> TranscriptStore:
+    """Return the shared store for this process"""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = TranscriptStore(path or os.getenv("TRANSCRIPT_STORE_PATH", DEFAULT_STORE_PATH))
+    return _default_store
@@ -0,0 +1,131 @@
+"""TTL cache with stale-while-revalidate and request coalescing for voice catalogs."""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    value: Any
+    etag: str
+    fetched_at: float
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+def _compute_etag(value: Any) -> str:
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+
+class CatalogCache:
+    """Caches the result of ``fetch`` for ``ttl`` seconds.
+
+    Entries older than ``ttl`` but younger than ``ttl + stale_ttl`` are still
+    served while a single background thread refreshes them. When nothing
+    usable is cached, concurrent callers share one upstream fetch.
+    """
+
+    def __init__(self, name: str, fetch: Callable[[], Any], ttl: float, stale_ttl: float):
+        self.name = name
+        self.fetch = fetch
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entry: Optional[CacheEntry] = None
+        self._lock = threading.Lock()
+        self._inflight: Optional[threading.Event] = None
+        self._inflight_error: Optional[Exception] = None
+        self._refreshing = False
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.upstream_fetches = 0
+
+    def get(self) -> CacheEntry:
+        """Return a cached entry, fetching or refreshing as needed"""
+        with self._lock:
+            entry = self._entry
+            if entry is not None:
+                age = entry.age()
+                if age < self.ttl:
+                    self.hits += 1
+                    return entry
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    if not self._refreshing:
+                        self._refreshing = True
+                        threading.Thread(
+                            target=self._background_refresh,
+                            name=f"{self.name}-refresh",
+                            daemon=True,
+                        ).start()
+                    return entry
+
+            self.misses += 1
+            if self._inflight is not None:
+                # Someone else is already fetching; wait for their result
+                event = self._inflight
+                leader = False
+            else:
+                event = self._inflight = threading.Event()
+                self._inflight_error = None
+                leader = True
+
+        if leader:
+            try:
+                self._store(self._fetch())
+            except Exception as e:
+                with self._lock:
+                    self._inflight_error = e
+                raise
+            finally:
+                with self._lock:
+                    self._inflight = None
+                event.set()
+            return self._entry
+
+        event.wait()
+        with self._lock:
+            if self._entry is None:
+                raise self._inflight_error or RuntimeError(f"{self.name} fetch failed")
+            return self._entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+
+    def stats(self):
+        with self._lock:
+            entry = self._entry
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "upstream_fetches": self.upstream_fetches,
+                "age": entry.age() if entry else None,
+            }
+
+    def _fetch(self) -> Any:
+        with self._lock:
+            self.upstream_fetches += 1
+        return self.fetch()
+
+    def _store(self, value: Any):
+        entry = CacheEntry(value=value, etag=_compute_etag(value), fetched_at=time.time())
+        with self._lock:
+            self._entry = entry
+
+    def _background_refresh(self):
+        try:
+            self._store(self._fetch())
+        except Exception as e:
+            # Keep serving the stale entry; the next stale hit retries
+            print(f"Error refreshing {self.name}: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
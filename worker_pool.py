@@ -0,0 +1,154 @@
+"""Fixed-size worker pool draining a durable job queue with a per-job retry budget."""
+import random
+import threading
+import time
+import traceback
+from typing import Callable
+
+from job_queue import JobQueue
+
+
+class RetryableError(Exception):
+    """Raised by a job handler when the job should be retried later"""
+
+
+class WorkerPool:
+    """Runs ``handler(*args)`` for jobs claimed from ``job_queue`` on ``num_workers`` threads.
+
+    A handler that raises RetryableError is released back to the queue with
+    exponential backoff (plus jitter) until ``max_attempts`` is used up, then
+    dead-lettered. Any other exception dead-letters the job immediately.
+    Completed jobs are purged from the queue once older than ``retention``
+    seconds (0 keeps them).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable,
+        job_queue: JobQueue,
+        num_workers: int = 4,
+        max_attempts: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        poll_interval: float = 1.0,
+        retention: float = 7 * 24 * 3600,
+        purge_interval: float = 3600,
+    ):
+        self.name = name
+        self.handler = handler
+        self.job_queue = job_queue
+        self.num_workers = num_workers
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.purge_interval = purge_interval
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._started = False
+
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+        self.lost = 0
+
+    def start(self):
+        """Start worker threads (idempotent). Unfinished jobs from a previous run are picked up"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # Jobs a crashed process had claimed would otherwise wait out the visibility timeout
+        released = self.job_queue.release_stale_claims()
+        pending = self.job_queue.stats()
+        if pending["pending"] or pending["claimed"]:
+            print(f"[{self.name}] Replaying {pending['pending'] + pending['claimed']} unfinished job(s), "
+                  f"{released} released from a dead worker")
+        for i in range(self.num_workers):
+            threading.Thread(target=self._work, name=f"{self.name}-worker-{i}", daemon=True).start()
+        if self.retention > 0:
+            threading.Thread(target=self._purge, name=f"{self.name}-purge", daemon=True).start()
+
+    def submit(self, *args, key: str = None, delay: float = 0) -> bool:
+        """Durably queue a job. Returns False if the queue is full"""
+        if not self.job_queue.put(args, key=key, delay=delay):
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "retried": self.retried,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "lost": self.lost,
+            }
+        stats["queue"] = self.job_queue.stats()
+        return stats
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.8, 1.2)
+
+    def _work(self):
+        while True:
+            try:
+                job = self.job_queue.claim()
+            except Exception as e:
+                print(f"[{self.name}] Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                self.job_queue.wait(self.poll_interval)
+                continue
+
+            with self._lock:
+                self._in_flight += 1
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    def _purge(self):
+        while True:
+            try:
+                purged = self.job_queue.purge_done(self.retention)
+                if purged:
+                    print(f"[{self.name}] Purged {purged} completed job(s)")
+            except Exception as e:
+                print(f"[{self.name}] Error purging completed jobs: {str(e)}")
+            time.sleep(self.purge_interval)
+
+    def _run(self, job):
+        try:
+            self.handler(*job.args)
+            self._settled(job, self.job_queue.ack(job), "completed")
+        except RetryableError as e:
+            if job.attempt < self.max_attempts:
+                delay = self._backoff(job.attempt)
+                print(f"[{self.name}] Attempt {job.attempt}/{self.max_attempts} for {job.args} not ready ({str(e)}), retrying in {delay:.1f}s")
+                self._settled(job, self.job_queue.retry(job, delay, str(e)), "retried")
+            else:
+                print(f"[{self.name}] Giving up on {job.args} after {job.attempt} attempts: {str(e)}")
+                self._settled(job, self.job_queue.dead_letter(job, str(e)), "failed")
+        except Exception as e:
+            print(f"[{self.name}] Job {job.args} failed: {str(e)}")
+            print(traceback.format_exc())
+            self._settled(job, self.job_queue.dead_letter(job, str(e)), "failed")
+
+    def _settled(self, job, kept_claim: bool, outcome: str):
+        # A claim that outlived the visibility timeout may have gone to another worker; its result stands
+        with self._lock:
+            if kept_claim:
+                setattr(self, outcome, getattr(self, outcome) + 1)
+                return
+            self.lost += 1
+        print(f"[{self.name}] Claim on job {job.id} expired before it finished; leaving it to its new owner")
@@ -0,0 +1,30 @@
+"""Production entry point for running several workers behind one address.
+
+Workers share call state and Socket.IO fan-out through Redis, e.g.:
+
+    SOCKETIO_MESSAGE_QUEUE=redis://localhost:6379/0 \
+    CALL_REGISTRY_BACKEND=redis REDIS_URL=redis://localhost:6379/0 \
+    SOCKETIO_TRANSPORTS=websocket \
+    gunicorn --workers 4 --threads 100 --bind 0.0.0.0:8000 wsgi:app
+
+This needs gunicorn, redis and simple-websocket installed. With websocket-only
+transport each connection lives on one worker, so no sticky sessions are
+needed. Any worker can take any webhook, since the registry is shared and
+emits are relayed to the workers holding the admin sockets. Only one worker
+holds the reconciliation lease at a time.
+
+Admission control is per worker: live calls come from the shared registry,
+but each worker only sees its own reservations (calls admitted but not yet
+started) and its own wait queue and rate limit buckets. With N workers a
+burst can be admitted up to N times over the free slots before the
+call.started webhooks land, and a client gets N times CALL_RATE_PER_CLIENT.
+Set MAX_CONCURRENT_CALLS with headroom under the Ultravox quota, and divide
+the rate by the worker count.
+
+Speculative calls (SPECULATIVE_CALLS) are pooled per worker too: every
+worker that sees a prewarm keeps its own calls ready, so the number of paid
+idle calls grows with the worker count. Lower SPECULATIVE_POOL_MAX to match.
+
+For an event-loop server instead of threads, see asgi.py.
+"""
+from app import app, socketio  # noqa: F401